@@ -0,0 +1,167 @@
+"""In-process caches for results derived from the catalogue and lists.
+
+Cached values are tagged with the catalogue generation they were computed
+at. Every write path that can change filter results (works, editions,
+relations, tags, disciplines, attachments, ingestion) publishes an
+invalidation event (see ``app.events``); the generation is bumped when the
+event is dispatched, locally after commit and in the other workers via
+``NOTIFY``, which makes all older entries unreachable without having to
+track what each one depends on.
+"""
+from __future__ import annotations
+
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import json
+import threading
+from typing import Hashable, Iterable, Iterator, List
+
+from app.events import subscribe
+from app.schemas import ListFilters
+
+CATALOG_ENTITIES = ("discipline", "tag", "work", "edition", "relation", "attachment")
+
+_generation_lock = threading.Lock()
+_catalog_generation = 0
+
+
+def catalog_generation() -> int:
+    return _catalog_generation
+
+
+def bump_catalog_generation() -> int:
+    global _catalog_generation
+    with _generation_lock:
+        _catalog_generation += 1
+        return _catalog_generation
+
+
+def filter_cache_key(filters: ListFilters) -> str:
+    """Stable hash of a filter set: list order, duplicates and query spacing/case are ignored."""
+    data = filters.model_dump(mode="json")
+    for key, value in data.items():
+        if isinstance(value, list):
+            data[key] = sorted(set(value))
+    if data.get("query"):
+        data["query"] = " ".join(data["query"].lower().split()) or None
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+@dataclass
+class _Entry:
+    generation: int
+    ids: array
+
+
+class FilterResultCache:
+    """LRU of edition-id sets, bounded by entry count and total ids held."""
+
+    def __init__(self, max_entries: int = 256, max_ids: int = 2_000_000) -> None:
+        self.max_entries = max_entries
+        self.max_ids = max_ids
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> array | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.generation != catalog_generation():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.ids
+
+    def put(self, key: str, generation: int, edition_ids: Iterable[int]) -> array:
+        ids = array("l", sorted(edition_ids))
+        if generation != catalog_generation() or len(ids) > self.max_ids:
+            return ids
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = _Entry(generation=generation, ids=ids)
+            self._size += len(ids)
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._size > self.max_ids
+            ):
+                self._discard(next(iter(self._entries)))
+        return ids
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.ids)
+
+
+filter_result_cache = FilterResultCache()
+
+
+class ExportCache:
+    """LRU of rendered list exports, bounded by total size.
+
+    Keys embed the list's content version, so entries never need to be
+    invalidated: outdated ones simply stop being requested and age out.
+    """
+
+    def __init__(
+        self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 8 * 1024 * 1024
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> bytes | None:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        if len(data) > self.max_entry_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def tee(self, key: Hashable, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Pass ``chunks`` through, caching them if the stream completes within size."""
+        parts: List[bytes] | None = []
+        size = 0
+        for chunk in chunks:
+            if parts is not None:
+                size += len(chunk)
+                if size > self.max_entry_bytes:
+                    parts = None
+                else:
+                    parts.append(chunk)
+            yield chunk
+        if parts is not None:
+            self.put(key, b"".join(parts))
+
+
+export_cache = ExportCache()
+
+
+def _on_catalog_change(entity: str, ids: list[int] | None) -> None:
+    bump_catalog_generation()
+
+
+subscribe(CATALOG_ENTITIES, _on_catalog_change)
@@ -0,0 +1,498 @@
+"""Catalogue filters and the upkeep that follows catalogue changes.
+
+``filter_predicates`` turns ``ListFilters`` into per-edition SQL
+predicates, shared by searches, list creation and list regeneration.
+After works or editions change, the writer calls, in its own transaction,
+``refresh_latest_in_force`` for the works' latest in-force edition,
+``maintain_dynamic_lists`` to bring dynamic lists and the search facet
+aggregate up to date, and ``bump_lists_containing`` so exports of the
+lists showing those editions are rebuilt. The API and the ingestion jobs
+(``app.ingestion.jobs``) both use these.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import (
+    Integer,
+    String,
+    and_,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    true,
+    union,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, REGCONFIG, aggregate_order_by
+from sqlalchemy.orm import Session
+
+from app.facets import refresh_edition_facets
+from app.list_index import WILDCARD
+from app.models import (
+    DocumentEdition,
+    DocumentWork,
+    EditionRelation,
+    ListFilterKey,
+    ListRegeneration,
+    LocalAttachment,
+    NormativeList,
+    NormativeListItem,
+    WorkDiscipline,
+    WorkTag,
+)
+from app.schemas import ListFilters
+from app.snapshots import frozen_lists
+
+
+SEARCH_CONFIGS = ("simple", "italian", "english")
+
+
+_TSQUERY_SPECIAL_CHARS = re.compile(r"[&|!():*<>'\\\s]+")
+
+
+def build_search_query(text: str | None):
+    """Turn free text into a prefix-matching tsquery over all search configs.
+
+    Every word must match (as a prefix, so results update while typing); a
+    word matches if any of the configurations used by the search document
+    recognises it. Returns ``None`` when the text has no searchable terms.
+    """
+    terms = [term for term in _TSQUERY_SPECIAL_CHARS.split(text or "") if term]
+    if not terms:
+        return None
+    expression = " & ".join(f"'{term}':*" for term in terms)
+    tsquery = None
+    for config in SEARCH_CONFIGS:
+        config_query = func.to_tsquery(literal(config).cast(REGCONFIG), expression)
+        tsquery = config_query if tsquery is None else tsquery.op("||")(config_query)
+    return tsquery
+
+
+def filter_predicates(filters: ListFilters) -> Dict[str, Any]:
+    """Per-edition SQL predicates for each active filter, keyed by filter name."""
+    predicates: Dict[str, Any] = {}
+    tsquery = build_search_query(filters.query)
+    if tsquery is not None:
+        predicates["query"] = DocumentWork.search_vector.op("@@")(tsquery)
+    if filters.authority:
+        predicates["authority"] = DocumentWork.authority.in_(filters.authority)
+    if filters.status:
+        predicates["status"] = DocumentEdition.status.in_(filters.status)
+    if filters.publication_date_from:
+        predicates["publication_date_from"] = (
+            DocumentEdition.publication_date >= filters.publication_date_from
+        )
+    if filters.publication_date_to:
+        predicates["publication_date_to"] = (
+            DocumentEdition.publication_date <= filters.publication_date_to
+        )
+    if filters.updated_from:
+        predicates["updated_from"] = DocumentEdition.updated_at >= filters.updated_from
+    if filters.updated_to:
+        predicates["updated_to"] = DocumentEdition.updated_at <= filters.updated_to
+    if filters.discipline_ids:
+        predicates["discipline"] = or_(
+            DocumentWork.primary_discipline_id.in_(filters.discipline_ids),
+            select(WorkDiscipline.work_id)
+            .where(
+                WorkDiscipline.work_id == DocumentWork.id,
+                WorkDiscipline.discipline_id.in_(filters.discipline_ids),
+            )
+            .exists(),
+        )
+    if filters.tag_ids:
+        predicates["tag"] = (
+            select(WorkTag.work_id)
+            .where(WorkTag.work_id == DocumentWork.id, WorkTag.tag_id.in_(filters.tag_ids))
+            .exists()
+        )
+    if filters.only_latest_in_force:
+        predicates["only_latest_in_force"] = (
+            DocumentEdition.id == DocumentWork.latest_in_force_edition_id
+        )
+    if filters.has_attachment is not None:
+        has_attachment = edition_has_attachment()
+        predicates["has_attachment"] = (
+            has_attachment if filters.has_attachment else ~has_attachment
+        )
+    if filters.has_official_link is not None:
+        has_official_link = DocumentEdition.source_canonical_url.is_not(None)
+        predicates["has_official_link"] = (
+            has_official_link if filters.has_official_link else ~has_official_link
+        )
+    return predicates
+
+
+def edition_has_attachment():
+    return (
+        select(LocalAttachment.id)
+        .where(LocalAttachment.edition_id == DocumentEdition.id)
+        .exists()
+    )
+
+
+def apply_filters(query, filters: ListFilters):
+    for predicate in filter_predicates(filters).values():
+        query = query.filter(predicate)
+    return query
+
+
+def refresh_latest_in_force(db: Session, work_ids: Sequence[int]) -> None:
+    """Recompute ``DocumentWork.latest_in_force_edition_id`` for ``work_ids``."""
+    if not work_ids:
+        return
+    db.flush()
+    latest = (
+        select(DocumentEdition.id)
+        .where(
+            DocumentEdition.work_id == DocumentWork.id,
+            DocumentEdition.status == "in_force",
+        )
+        .order_by(
+            DocumentEdition.publication_date.desc().nulls_last(),
+            DocumentEdition.id.desc(),
+        )
+        .limit(1)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(DocumentWork)
+        .where(
+            DocumentWork.id.in_(set(work_ids)),
+            DocumentWork.latest_in_force_edition_id.is_distinct_from(latest),
+        )
+        .values(latest_in_force_edition_id=latest, updated_at=DocumentWork.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def expand_with_related_editions(seed_ids, filters: ListFilters):
+    """Add editions reachable from ``seed_ids`` (a select of ids) via relations.
+
+    Relations are followed in both directions, up to ``related_max_depth``
+    hops, restricted to ``related_types`` and ``related_min_confidence`` when
+    given. The traversal is a recursive CTE evaluated by PostgreSQL.
+    """
+    if not filters.include_related:
+        return seed_ids
+    conditions = []
+    if filters.related_types:
+        conditions.append(EditionRelation.type.in_(filters.related_types))
+    if filters.related_min_confidence is not None:
+        conditions.append(EditionRelation.confidence >= filters.related_min_confidence)
+    edges = union_all(
+        select(
+            EditionRelation.from_edition_id.label("source_id"),
+            EditionRelation.to_edition_id.label("target_id"),
+        ).where(*conditions),
+        select(
+            EditionRelation.to_edition_id.label("source_id"),
+            EditionRelation.from_edition_id.label("target_id"),
+        ).where(*conditions),
+    ).cte("relation_edges")
+    seeds = seed_ids.cte("seed_editions")
+    related = select(
+        seeds.c.id.label("id"), literal(0, Integer).label("depth")
+    ).cte("related_editions", recursive=True)
+    related = related.union(
+        select(edges.c.target_id, related.c.depth + 1)
+        .select_from(related.join(edges, edges.c.source_id == related.c.id))
+        .where(related.c.depth < filters.related_max_depth)
+    )
+    return select(related.c.id).distinct()
+
+
+def select_matching_edition_ids(filters: ListFilters, work_id: int | None = None):
+    """Select the ids of editions matching ``filters``, evaluated in SQL."""
+    seed_ids = select(DocumentEdition.id).join(DocumentEdition.work)
+    if work_id is not None:
+        seed_ids = seed_ids.where(DocumentEdition.work_id == work_id)
+    seed_ids = apply_filters(seed_ids, filters)
+    return expand_with_related_editions(seed_ids, filters)
+
+
+def edition_id_in(edition_ids: Sequence[int], column=DocumentEdition.id):
+    """``column = ANY(:ids)`` bound as a single array parameter."""
+    return column == any_(
+        bindparam("edition_ids", list(edition_ids), type_=ARRAY(Integer), unique=True)
+    )
+
+
+def insert_list_items(
+    db: Session, list_id: int, edition_condition, reason: str = "auto"
+) -> List[int]:
+    """Insert an item for every edition matching ``edition_condition`` in one statement.
+
+    The work's primary and secondary disciplines are snapshotted in SQL.
+    Returns the edition ids of the inserted items.
+    """
+    secondary_ids = func.coalesce(
+        select(
+            func.jsonb_agg(
+                aggregate_order_by(WorkDiscipline.discipline_id, WorkDiscipline.discipline_id)
+            )
+        )
+        .where(WorkDiscipline.work_id == DocumentWork.id)
+        .scalar_subquery(),
+        literal([], JSONB),
+    )
+    rows = (
+        select(
+            literal(list_id),
+            DocumentEdition.id,
+            true(),
+            literal(reason),
+            DocumentWork.primary_discipline_id,
+            secondary_ids,
+        )
+        .join(DocumentEdition.work)
+        .where(edition_condition)
+    )
+    statement = (
+        insert(NormativeListItem)
+        .from_select(
+            [
+                NormativeListItem.list_id,
+                NormativeListItem.edition_id,
+                NormativeListItem.included,
+                NormativeListItem.reason,
+                NormativeListItem.primary_discipline_id_at_time,
+                NormativeListItem.secondary_discipline_ids_at_time,
+            ],
+            rows,
+        )
+        .returning(NormativeListItem.edition_id)
+    )
+    return list(db.scalars(statement))
+
+
+def bump_list_versions(db: Session, *conditions) -> None:
+    """Mark the content of lists matching ``conditions`` as changed (see ``export_list``)."""
+    db.flush()
+    db.execute(
+        update(NormativeList)
+        .where(*conditions)
+        .values(
+            content_version=NormativeList.content_version + 1,
+            content_updated_at=func.timezone("utc", func.now()),
+            updated_at=NormativeList.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bump_lists_containing(db: Session, edition_ids: Sequence[int]) -> None:
+    """Bump lists with items for ``edition_ids``, whose exports show edition/work data.
+
+    Frozen lists are skipped: they are served from their snapshot.
+    """
+    if not edition_ids:
+        return
+    bump_list_versions(
+        db,
+        ~frozen_lists(),
+        NormativeList.id.in_(
+            select(NormativeListItem.list_id).where(
+                edition_id_in(edition_ids, NormativeListItem.edition_id)
+            )
+        ),
+    )
+
+
+MANUAL_OVERRIDE_REASONS = ("manual_include", "manual_exclude")
+
+
+def already_listed(list_id: int):
+    """EXISTS an item of ``list_id`` for the edition in the enclosing query."""
+    return (
+        select(NormativeListItem.id)
+        .where(
+            NormativeListItem.list_id == list_id,
+            NormativeListItem.edition_id == DocumentEdition.id,
+        )
+        .exists()
+    )
+
+
+def regenerate_items(
+    db: Session, list_id: int, matching_ids: Sequence[int], reset_overrides: bool
+) -> ListRegeneration:
+    """Bring a list's items in line with ``matching_ids`` using set operations.
+
+    New matches are added as auto items and auto items that no longer match
+    are removed. Manual overrides are kept unless ``reset_overrides``, in
+    which case matching ones revert to auto and the rest are removed. The
+    returned ``ListRegeneration`` describes the changes and is not yet added
+    to the session.
+    """
+    item_matches = edition_id_in(matching_ids, NormativeListItem.edition_id)
+    in_list = NormativeListItem.list_id == list_id
+    is_override = NormativeListItem.reason.in_(MANUAL_OVERRIDE_REASONS)
+
+    removed = list(
+        db.scalars(
+            delete(NormativeListItem)
+            .where(in_list, NormativeListItem.reason == "auto", ~item_matches)
+            .returning(NormativeListItem.edition_id)
+            .execution_options(synchronize_session=False)
+        )
+    )
+
+    overrides_kept = overrides_reset = 0
+    if not reset_overrides:
+        overrides_kept = db.scalar(
+            select(func.count()).select_from(NormativeListItem).where(in_list, is_override)
+        )
+    else:
+        reset = db.execute(
+            update(NormativeListItem)
+            .where(in_list, is_override, item_matches)
+            .values(included=True, reason="auto")
+            .execution_options(synchronize_session=False)
+        )
+        dropped = list(
+            db.scalars(
+                delete(NormativeListItem)
+                .where(in_list, is_override, ~item_matches)
+                .returning(NormativeListItem.edition_id)
+                .execution_options(synchronize_session=False)
+            )
+        )
+        overrides_reset = reset.rowcount + len(dropped)
+        removed.extend(dropped)
+
+    added = insert_list_items(
+        db, list_id, and_(edition_id_in(matching_ids), ~already_listed(list_id))
+    )
+    return ListRegeneration(
+        list_id=list_id,
+        added_edition_ids=sorted(added),
+        removed_edition_ids=sorted(removed),
+        overrides_kept=overrides_kept,
+        overrides_reset=overrides_reset,
+    )
+
+
+def edition_index_keys(edition_ids: Sequence[int]):
+    """Select ``(dimension, value)`` reverse-index keys carried by ``edition_ids``."""
+    selected = edition_id_in(edition_ids)
+    by_work = select(DocumentWork.id).join(DocumentWork.editions).where(selected)
+    return union(
+        select(literal("status").label("dimension"), DocumentEdition.status.label("value"))
+        .where(selected),
+        select(literal("authority"), DocumentWork.authority)
+        .where(DocumentWork.id.in_(by_work)),
+        select(literal("discipline"), cast(DocumentWork.primary_discipline_id, String))
+        .where(DocumentWork.id.in_(by_work)),
+        select(literal("discipline"), cast(WorkDiscipline.discipline_id, String))
+        .where(WorkDiscipline.work_id.in_(by_work)),
+        select(literal("tag"), cast(WorkTag.tag_id, String))
+        .where(WorkTag.work_id.in_(by_work)),
+    )
+
+
+def maintain_dynamic_lists(
+    db: Session, edition_ids: Sequence[int], work_ids: Sequence[int] = ()
+) -> None:
+    """Apply catalogue changes to ``edition_ids``/``work_ids`` to the dynamic lists they affect.
+
+    Runs in the caller's transaction, after the change has been made. The
+    changed editions are widened to all editions of their works and of
+    ``work_ids`` (the latest in-force edition of a work depends on its
+    siblings, and work attributes apply to every edition); candidate lists are
+    the ones indexed under a key of those editions, wildcard-indexed lists
+    and lists already containing one of them. Lists that expand related
+    editions are regenerated in full; the others only re-evaluate the
+    changed editions. Manual overrides are never touched. The widened
+    editions are also recounted in the search facet aggregate.
+    """
+    if not edition_ids and not work_ids:
+        return
+    db.flush()
+    changed_work_ids = set(work_ids) | set(
+        db.scalars(select(DocumentEdition.work_id).where(edition_id_in(edition_ids)))
+    )
+    siblings = select(DocumentEdition.id).where(DocumentEdition.work_id.in_(changed_work_ids))
+    edition_ids = sorted(set(edition_ids) | set(db.scalars(siblings)))
+    if not edition_ids:
+        return
+    refresh_edition_facets(db, edition_ids)
+
+    keys = edition_index_keys(edition_ids).subquery()
+    candidate_ids = union(
+        select(ListFilterKey.list_id).join(
+            keys,
+            and_(ListFilterKey.dimension == keys.c.dimension, ListFilterKey.value == keys.c.value),
+        ),
+        select(ListFilterKey.list_id).where(ListFilterKey.dimension == WILDCARD),
+        select(NormativeListItem.list_id).where(
+            edition_id_in(edition_ids, NormativeListItem.edition_id)
+        ),
+    ).subquery()
+    candidates = (
+        db.query(NormativeList)
+        .filter(
+            NormativeList.id.in_(select(candidate_ids.c.list_id)),
+            NormativeList.regeneration_mode == "dynamic",
+            ~frozen_lists(),
+        )
+        .order_by(NormativeList.id)
+        .all()
+    )
+
+    for normative_list in candidates:
+        filters = ListFilters(**normative_list.source_filter_json)
+        if filters.include_related:
+            matching_ids = db.scalars(select_matching_edition_ids(filters)).all()
+            regeneration = regenerate_items(
+                db, normative_list.id, matching_ids, reset_overrides=False
+            )
+        else:
+            regeneration = apply_list_deltas(db, normative_list.id, filters, edition_ids)
+        if regeneration.added_edition_ids or regeneration.removed_edition_ids:
+            regeneration.source = "catalog"
+            db.add(regeneration)
+            bump_list_versions(db, NormativeList.id == normative_list.id)
+
+
+def apply_list_deltas(
+    db: Session, list_id: int, filters: ListFilters, edition_ids: Sequence[int]
+) -> ListRegeneration:
+    """Re-evaluate only ``edition_ids`` against ``filters`` and add/remove auto items."""
+    matching_ids = db.scalars(
+        apply_filters(
+            select(DocumentEdition.id)
+            .join(DocumentEdition.work)
+            .where(edition_id_in(edition_ids)),
+            filters,
+        )
+    ).all()
+    removed = db.scalars(
+        delete(NormativeListItem)
+        .where(
+            NormativeListItem.list_id == list_id,
+            NormativeListItem.reason == "auto",
+            edition_id_in(edition_ids, NormativeListItem.edition_id),
+            ~edition_id_in(matching_ids, NormativeListItem.edition_id),
+        )
+        .returning(NormativeListItem.edition_id)
+        .execution_options(synchronize_session=False)
+    )
+    removed_ids = sorted(removed)
+    added = insert_list_items(
+        db, list_id, and_(edition_id_in(matching_ids), ~already_listed(list_id))
+    )
+    return ListRegeneration(
+        list_id=list_id,
+        added_edition_ids=sorted(added),
+        removed_edition_ids=removed_ids,
+    )
@@ -0,0 +1,145 @@
+"""Cache invalidation events shared across API workers.
+
+Write paths call ``publish`` inside their transaction; the event is sent
+with PostgreSQL ``NOTIFY`` so it reaches other workers only if the
+transaction commits, and is dispatched to this worker's handlers right
+after commit. Each worker runs an ``InvalidationListener`` that ``LISTEN``s
+on the same channel and dispatches events published by other workers.
+
+An event names an entity type and the affected ids; ``ids`` is ``None``
+when every entity of that type must be treated as changed (payload too
+large for ``NOTIFY``, or events possibly missed while reconnecting).
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+import json
+import logging
+import select
+import threading
+from typing import Callable, DefaultDict, Iterable, List, Optional, Sequence
+from uuid import uuid4
+
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "standarr_invalidation"
+# NOTIFY payloads must stay below 8000 bytes.
+MAX_PAYLOAD_BYTES = 7900
+ALL_ENTITIES = "*"
+
+ORIGIN = uuid4().hex
+
+Handler = Callable[[str, Optional[List[int]]], None]
+
+_handlers: DefaultDict[str, List[Handler]] = defaultdict(list)
+_PENDING_KEY = "pending_invalidation_events"
+
+
+def subscribe(entities: Iterable[str], handler: Handler) -> None:
+    """Call ``handler(entity, ids)`` for events on any of ``entities``."""
+    for entity in entities:
+        _handlers[entity].append(handler)
+
+
+def publish(db: Session, entity: str, ids: Sequence[int] | None = None) -> None:
+    """Queue an invalidation event delivered when ``db`` commits."""
+    ids = sorted(set(ids)) if ids is not None else None
+    payload = _encode(entity, ids)
+    if len(payload.encode("utf-8")) > MAX_PAYLOAD_BYTES:
+        ids = None
+        payload = _encode(entity, None)
+    db.execute(sql_select(func.pg_notify(CHANNEL, payload)))
+    db.info.setdefault(_PENDING_KEY, []).append((entity, ids))
+
+
+def dispatch(entity: str, ids: List[int] | None) -> None:
+    targets = _handlers.get(entity, []) if entity != ALL_ENTITIES else [
+        handler for handlers in _handlers.values() for handler in handlers
+    ]
+    for handler in dict.fromkeys(targets):
+        try:
+            handler(entity, ids)
+        except Exception:
+            logger.exception("Invalidation handler failed for %s", entity)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed(session: Session) -> None:
+    for entity, ids in session.info.pop(_PENDING_KEY, []):
+        dispatch(entity, ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _encode(entity: str, ids: List[int] | None) -> str:
+    return json.dumps({"origin": ORIGIN, "entity": entity, "ids": ids}, separators=(",", ":"))
+
+
+class InvalidationListener:
+    """Background thread relaying NOTIFY events from other workers."""
+
+    def __init__(self, engine: Engine, poll_interval: float = 5.0, retry_delay: float = 2.0):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="invalidation-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def _run(self) -> None:
+        connected_before = False
+        while not self._stop.is_set():
+            try:
+                with self.engine.connect().execution_options(
+                    isolation_level="AUTOCOMMIT"
+                ) as connection:
+                    connection.exec_driver_sql(f"LISTEN {CHANNEL}")
+                    if connected_before:
+                        # Events may have been missed while disconnected.
+                        dispatch(ALL_ENTITIES, None)
+                    connected_before = True
+                    self._listen(connection.connection.dbapi_connection)
+            except Exception:
+                logger.exception("Invalidation listener disconnected")
+                self._stop.wait(self.retry_delay)
+
+    def _listen(self, dbapi_connection) -> None:
+        while not self._stop.is_set():
+            readable, _, _ = select.select([dbapi_connection], [], [], self.poll_interval)
+            if not readable:
+                continue
+            dbapi_connection.poll()
+            while dbapi_connection.notifies:
+                notify = dbapi_connection.notifies.pop(0)
+                self._handle(notify.payload)
+
+    def _handle(self, raw_payload: str) -> None:
+        try:
+            payload = json.loads(raw_payload)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation payload: %r", raw_payload)
+            return
+        if payload.get("origin") == ORIGIN:
+            return
+        dispatch(payload.get("entity", ALL_ENTITIES), payload.get("ids"))
@@ -0,0 +1,441 @@
+"""Streaming list exports.
+
+Every format shares the rule-B grouping: items are listed under their
+primary discipline and referenced under each secondary discipline, with
+disciplines in ``sort_order``. ``render_export`` walks the rows of
+``export_rows_statement`` once, in order, and drives an ``ExportWriter``
+through each section; writers turn those calls into output chunks, so no
+format needs the whole list in memory.
+"""
+from __future__ import annotations
+
+import csv
+from datetime import datetime
+import io
+from itertools import groupby
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List
+from xml.sax.saxutils import escape
+import zipfile
+
+from sqlalchemy import Integer, and_, cast, func, literal, select, true, union_all
+from sqlalchemy.orm import aliased
+
+from app.db import SessionLocal
+from app.models import (
+    DisciplineCategory,
+    DocumentEdition,
+    DocumentWork,
+    NormativeList,
+    NormativeListItem,
+)
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Export row kinds: an item listed under its primary discipline, or a
+# reference to it under one of its secondary disciplines.
+EXPORT_PRIMARY = 0
+EXPORT_REFERENCE = 1
+
+ROLES = {EXPORT_PRIMARY: "primary", EXPORT_REFERENCE: "reference"}
+
+# Flat record layout shared by the tabular formats.
+RECORD_FIELDS = (
+    "discipline",
+    "role",
+    "identifier",
+    "title",
+    "authority",
+    "edition_label",
+    "publication_date",
+    "status",
+    "note",
+    "primary_discipline",
+)
+
+
+def export_rows_statement(list_id: int):
+    """Included items of a list in export order, one row per section entry.
+
+    Rows are ordered by discipline ``sort_order``; within a discipline the
+    primary entries come before the references.
+    """
+    section = aliased(DisciplineCategory)
+    primary = aliased(DisciplineCategory)
+    entry_columns = (
+        NormativeListItem.id.label("item_id"),
+        DocumentWork.identifier,
+        DocumentWork.title,
+        DocumentWork.authority,
+        DocumentEdition.edition_label,
+        DocumentEdition.publication_date,
+        DocumentEdition.status,
+        NormativeListItem.note,
+    )
+    included = and_(
+        NormativeListItem.list_id == list_id,
+        NormativeListItem.included.is_(True),
+        NormativeListItem.primary_discipline_id_at_time.is_not(None),
+    )
+    primary_rows = (
+        select(
+            section.id.label("discipline_id"),
+            section.name.label("discipline_name"),
+            section.sort_order,
+            literal(EXPORT_PRIMARY).label("kind"),
+            section.name.label("primary_name"),
+            *entry_columns,
+        )
+        .select_from(NormativeListItem)
+        .join(NormativeListItem.edition)
+        .join(DocumentEdition.work)
+        .join(section, section.id == NormativeListItem.primary_discipline_id_at_time)
+        .where(included)
+    )
+    secondary = (
+        func.jsonb_array_elements_text(NormativeListItem.secondary_discipline_ids_at_time)
+        .table_valued("value")
+        .render_derived("secondary")
+    )
+    secondary_id = cast(secondary.c.value, Integer)
+    reference_rows = (
+        select(
+            section.id,
+            section.name,
+            section.sort_order,
+            literal(EXPORT_REFERENCE),
+            func.coalesce(primary.name, "N/D"),
+            *entry_columns,
+        )
+        .select_from(NormativeListItem)
+        .join(NormativeListItem.edition)
+        .join(DocumentEdition.work)
+        .join(secondary, true())
+        .join(section, section.id == secondary_id)
+        .outerjoin(primary, primary.id == NormativeListItem.primary_discipline_id_at_time)
+        .where(included, secondary_id != NormativeListItem.primary_discipline_id_at_time)
+    )
+    rows = union_all(primary_rows, reference_rows).subquery()
+    return select(rows).order_by(
+        rows.c.sort_order, rows.c.discipline_id, rows.c.kind, rows.c.item_id
+    )
+
+
+def export_record(row) -> Dict[str, Any]:
+    return {
+        "discipline": row.discipline_name,
+        "role": ROLES[row.kind],
+        "identifier": row.identifier,
+        "title": row.title,
+        "authority": row.authority,
+        "edition_label": row.edition_label,
+        "publication_date": row.publication_date.isoformat() if row.publication_date else None,
+        "status": row.status,
+        "note": row.note,
+        "primary_discipline": row.primary_name,
+    }
+
+
+class ExportWriter:
+    """Receives the sections of an export in order and yields output text or bytes.
+
+    For every discipline with entries the engine calls ``start_section``,
+    ``primary`` for each primary entry, ``start_references`` once, then
+    ``reference`` for each reference and finally ``end_section``.
+    """
+
+    media_type = "application/octet-stream"
+    extension = "bin"
+    # Whether browsers should download rather than display the export.
+    attachment = True
+
+    def begin(self, normative_list: NormativeList) -> Iterable[str | bytes]:
+        return ()
+
+    def start_section(self, discipline_name: str) -> Iterable[str | bytes]:
+        return ()
+
+    def primary(self, row) -> Iterable[str | bytes]:
+        return ()
+
+    def start_references(self, has_primary: bool) -> Iterable[str | bytes]:
+        return ()
+
+    def reference(self, row) -> Iterable[str | bytes]:
+        return ()
+
+    def end_section(self, has_references: bool) -> Iterable[str | bytes]:
+        return ()
+
+    def end(self) -> Iterable[str | bytes]:
+        return ()
+
+
+def render_export(writer: ExportWriter, normative_list: NormativeList, rows) -> Iterator[bytes]:
+    """Drive ``writer`` over ``rows`` (ordered as ``export_rows_statement``)."""
+
+    def chunks() -> Iterator[str | bytes]:
+        yield from writer.begin(normative_list)
+        for _, section_rows in groupby(rows, key=lambda row: row.discipline_id):
+            has_primary = has_references = False
+            for row in section_rows:
+                if not has_primary and not has_references:
+                    yield from writer.start_section(row.discipline_name)
+                if row.kind == EXPORT_PRIMARY:
+                    has_primary = True
+                    yield from writer.primary(row)
+                    continue
+                if not has_references:
+                    has_references = True
+                    yield from writer.start_references(has_primary)
+                yield from writer.reference(row)
+            if not has_references:
+                yield from writer.start_references(has_primary)
+            yield from writer.end_section(has_references)
+        yield from writer.end()
+
+    return _buffered(chunks())
+
+
+def _buffered(chunks: Iterator[str | bytes]) -> Iterator[bytes]:
+    buffer: List[bytes] = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        if not data:
+            continue
+        buffer.append(data)
+        size += len(data)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def format_export_line(row) -> str:
+    pub_date = row.publication_date.isoformat() if row.publication_date else "n.d."
+    return (
+        f"- {row.identifier} — {row.title} (Ed. {row.edition_label}, "
+        f"Pub. {pub_date}) [{row.authority}] {row.status}\n"
+        + (f"  Note: {row.note}\n" if row.note else "")
+    )
+
+
+class TxtWriter(ExportWriter):
+    """The human-readable export: lines joined by newlines, one block per discipline."""
+
+    media_type = "text/plain; charset=utf-8"
+    extension = "txt"
+    attachment = False
+
+    def __init__(self) -> None:
+        self._first = True
+
+    def _line(self, text: str) -> str:
+        if self._first:
+            self._first = False
+            return text
+        return "\n" + text
+
+    def begin(self, normative_list):
+        yield self._line("Standarr – Elenco Normative")
+        yield self._line(f"Nome elenco: {normative_list.name}")
+        yield self._line(f"Generato: {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}")
+        yield self._line(f"Modalità: {normative_list.regeneration_mode}")
+        yield self._line(f"Criteri (snapshot): {normative_list.source_filter_json}")
+        yield self._line("")
+
+    def start_section(self, discipline_name):
+        yield self._line(f"== {discipline_name.upper()} ==")
+        yield self._line("[Norme]")
+
+    def primary(self, row):
+        yield self._line(format_export_line(row))
+
+    def start_references(self, has_primary):
+        if not has_primary:
+            yield self._line("- (nessuna)\n")
+        yield self._line("[Riferimenti]")
+
+    def reference(self, row):
+        yield self._line(f"- {row.identifier} — vedi disciplina primaria: {row.primary_name}\n")
+
+    def end_section(self, has_references):
+        if not has_references:
+            yield self._line("- (nessuno)\n")
+        yield self._line("")
+
+
+class CsvWriter(ExportWriter):
+    media_type = "text/csv; charset=utf-8"
+    extension = "csv"
+
+    def __init__(self) -> None:
+        self._buffer = io.StringIO()
+        self._csv = csv.DictWriter(self._buffer, fieldnames=RECORD_FIELDS)
+
+    def _flush(self) -> str:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
+
+    def begin(self, normative_list):
+        self._csv.writeheader()
+        yield self._flush()
+
+    def primary(self, row):
+        self._csv.writerow(export_record(row))
+        yield self._flush()
+
+    reference = primary
+
+
+class NdjsonWriter(ExportWriter):
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def primary(self, row):
+        yield json.dumps(export_record(row), ensure_ascii=False) + "\n"
+
+    reference = primary
+
+
+# Characters that are not allowed in XML 1.0 documents.
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" '
+    'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    "</Types>"
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Elenco" sheetId="1" r:id="rId1"/></sheets>'
+    "</workbook>"
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    "</Relationships>"
+)
+_XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+_XLSX_SHEET_END = "</sheetData></worksheet>"
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable sink collecting what ``zipfile`` writes until drained."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class XlsxWriter(ExportWriter):
+    """A single-sheet workbook; the sheet XML is deflated into the archive row by row."""
+
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+
+    def __init__(self) -> None:
+        self._stream = _ZipStream()
+        self._zip = zipfile.ZipFile(self._stream, "w", compression=zipfile.ZIP_DEFLATED)
+        self._sheet = None
+        self._row_number = 0
+
+    def begin(self, normative_list):
+        for name, content in (
+            ("[Content_Types].xml", _XLSX_CONTENT_TYPES),
+            ("_rels/.rels", _XLSX_ROOT_RELS),
+            ("xl/workbook.xml", _XLSX_WORKBOOK),
+            ("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS),
+        ):
+            self._zip.writestr(name, content)
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(_XLSX_SHEET_START.encode("utf-8"))
+        self._write_row(RECORD_FIELDS)
+        yield self._stream.drain()
+
+    def primary(self, row):
+        record = export_record(row)
+        self._write_row([record[field] for field in RECORD_FIELDS])
+        yield self._stream.drain()
+
+    reference = primary
+
+    def end(self):
+        self._sheet.write(_XLSX_SHEET_END.encode("utf-8"))
+        self._sheet.close()
+        self._zip.close()
+        yield self._stream.drain()
+
+    def _write_row(self, values) -> None:
+        self._row_number += 1
+        cells = "".join(
+            f'<c t="inlineStr"><is><t xml:space="preserve">{_xml_text(value)}</t></is></c>'
+            for value in values
+        )
+        self._sheet.write(f'<row r="{self._row_number}">{cells}</row>'.encode("utf-8"))
+
+
+def _xml_text(value: Any) -> str:
+    if value is None:
+        return ""
+    return escape(_XML_INVALID.sub("", str(value)))
+
+
+EXPORT_WRITERS = {
+    writer.extension: writer for writer in (TxtWriter, CsvWriter, NdjsonWriter, XlsxWriter)
+}
+
+
+def stream_list_export(list_id: int, writer: ExportWriter) -> Iterator[bytes]:
+    # The request session is closed once the response starts streaming, so
+    # the export reads through its own session and a server-side cursor.
+    db = SessionLocal()
+    try:
+        normative_list = db.get(NormativeList, list_id)
+        rows = db.execute(
+            export_rows_statement(list_id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        yield from render_export(writer, normative_list, rows)
+    finally:
+        db.close()
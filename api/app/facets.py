@@ -0,0 +1,460 @@
+"""Maintained per-edition facet aggregate behind ``/api/search/facets``.
+
+Each edition is summarised by its facet values: authority, status, primary
+and secondary disciplines, tags, attachment and official-link flags, and
+whether it is its work's latest in-force edition. Editions with the same
+values share a ``SearchFacetCell`` that counts them, and ``EditionFacet``
+records the cell each edition is counted in. A catalogue reduces to far
+fewer cells than editions (a few hundred for the 500k-edition benchmark
+catalogue), so facet counts are sums over cells instead of joins over
+editions. ``SearchFacetCellYear`` splits each cell's count by publication
+year for the years a date range covers whole. Filters the cells cannot
+answer (text, update dates, the partial years at the ends of a date range)
+select the matching editions from ``EditionFacet``, which carries their
+work id and dates, and count them per cell.
+
+Write paths keep the aggregate current: ``maintain_dynamic_lists`` calls
+``refresh_edition_facets`` with the changed editions and their siblings.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from datetime import MAXYEAR, MINYEAR, date
+from typing import Any, Dict, Sequence
+
+from sqlalchemy import (
+    Integer,
+    String,
+    Text,
+    and_,
+    bindparam,
+    cast,
+    delete,
+    exists,
+    func,
+    literal,
+    or_,
+    select,
+    true,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models import (
+    DocumentEdition,
+    DocumentWork,
+    EditionFacet,
+    LocalAttachment,
+    SearchFacetCell,
+    SearchFacetCellYear,
+    WorkDiscipline,
+    WorkTag,
+)
+from app.schemas import ListFilters
+
+# Facet name -> the filter it ignores while counting (standard faceting:
+# a facet's own selection must not hide its alternative values).
+FACET_FILTERS = {
+    "authority": "authority",
+    "status": "status",
+    "primary_discipline": "discipline",
+    "secondary_discipline": "discipline",
+    "tag": "tag",
+    "has_attachment": "has_attachment",
+    "has_official_link": "has_official_link",
+}
+
+# Edition columns copied to ``EditionFacet`` for the text and date filters.
+EDITION_VALUES = ("work_id", "publication_date", "updated_at")
+
+CELL_VALUES = (
+    "authority",
+    "status",
+    "primary_discipline_id",
+    "secondary_discipline_ids",
+    "tag_ids",
+    "has_attachment",
+    "has_official_link",
+    "latest_in_force",
+)
+
+_cells = SearchFacetCell.__table__
+
+
+def edition_facet_values(*where):
+    """Facet values of the editions matching ``where``.
+
+    Columns: ``edition_id``, ``EDITION_VALUES``, ``cell_key`` and ``CELL_VALUES``.
+
+    Materialised, so the key is computed once per edition whatever join
+    order the planner picks for the statement using it.
+    """
+    secondary_ids = func.array(
+        select(WorkDiscipline.discipline_id)
+        .where(WorkDiscipline.work_id == DocumentWork.id)
+        .order_by(WorkDiscipline.discipline_id)
+        .scalar_subquery()
+    )
+    tag_ids = func.array(
+        select(WorkTag.tag_id)
+        .where(WorkTag.work_id == DocumentWork.id)
+        .order_by(WorkTag.tag_id)
+        .scalar_subquery()
+    )
+    values = [
+        DocumentWork.authority,
+        DocumentEdition.status,
+        DocumentWork.primary_discipline_id,
+        secondary_ids,
+        tag_ids,
+        exists().where(LocalAttachment.edition_id == DocumentEdition.id),
+        DocumentEdition.source_canonical_url.is_not(None),
+        DocumentEdition.id.is_not_distinct_from(DocumentWork.latest_in_force_edition_id),
+    ]
+    return (
+        select(
+            DocumentEdition.id.label("edition_id"),
+            DocumentEdition.work_id,
+            DocumentEdition.publication_date,
+            DocumentEdition.updated_at,
+            func.md5(cast(func.row(*values), Text)).label("cell_key"),
+            *[value.label(name) for name, value in zip(CELL_VALUES, values)],
+        )
+        .join(DocumentEdition.work)
+        .where(*where)
+        .cte("facet_values")
+        .prefix_with("MATERIALIZED")
+    )
+
+
+def refresh_edition_facets(db: Session, edition_ids: Sequence[int]) -> None:
+    """Recount ``edition_ids`` (created, changed or deleted) in the facet cells.
+
+    The editions' ``EditionFacet`` rows are created if missing and locked
+    before their values are read, so concurrent refreshes of an edition
+    apply one after the other and each sees the other's committed result.
+    """
+    edition_ids = sorted(set(edition_ids))
+    if not edition_ids:
+        return
+    ids = bindparam("facet_edition_ids", edition_ids, type_=ARRAY(Integer), unique=True)
+    db.execute(
+        pg_insert(EditionFacet)
+        .from_select(["edition_id"], select(func.unnest(ids)))
+        .on_conflict_do_nothing()
+    )
+    entry_columns = [
+        EditionFacet.cell_id,
+        *[EditionFacet.__table__.c[name] for name in EDITION_VALUES],
+    ]
+    previous = {
+        edition_id: tuple(entry)
+        for edition_id, *entry in db.execute(
+            select(EditionFacet.edition_id, *entry_columns)
+            .where(EditionFacet.edition_id == func.any(ids))
+            .order_by(EditionFacet.edition_id)
+            .with_for_update()
+        )
+    }
+
+    values = edition_facet_values(DocumentEdition.id == func.any(ids))
+    db.execute(
+        pg_insert(SearchFacetCell)
+        .from_select(
+            ["cell_key", *CELL_VALUES],
+            select(values.c.cell_key, *[values.c[name] for name in CELL_VALUES])
+            .distinct(values.c.cell_key)
+            .order_by(values.c.cell_key),
+        )
+        .on_conflict_do_nothing(index_elements=[SearchFacetCell.cell_key])
+    )
+    current = {
+        edition_id: tuple(entry)
+        for edition_id, *entry in db.execute(
+            select(
+                values.c.edition_id,
+                SearchFacetCell.id,
+                *[values.c[name] for name in EDITION_VALUES],
+            ).join(SearchFacetCell, SearchFacetCell.cell_key == values.c.cell_key)
+        )
+    }
+
+    deltas: Counter[int] = Counter()
+    year_deltas: Counter[tuple[int, int]] = Counter()
+
+    def count(entry: tuple, delta: int) -> None:
+        cell_id, _, publication_date, _ = entry
+        deltas[cell_id] += delta
+        if publication_date is not None:
+            year_deltas[cell_id, publication_date.year] += delta
+
+    moved = []
+    for edition_id in edition_ids:
+        old, new = previous.get(edition_id), current.get(edition_id)
+        if old == new:
+            continue
+        if old is not None and old[0] is not None:
+            count(old, -1)
+        if new is not None:
+            count(new, 1)
+            moved.append(
+                {"edition_id": edition_id, **dict(zip(("cell_id", *EDITION_VALUES), new))}
+            )
+    gone = [edition_id for edition_id in edition_ids if edition_id not in current]
+    if gone:
+        db.execute(delete(EditionFacet).where(EditionFacet.edition_id.in_(gone)))
+    if moved:
+        statement = pg_insert(EditionFacet).values(moved)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[EditionFacet.edition_id],
+                set_={
+                    name: statement.excluded[name] for name in ("cell_id", *EDITION_VALUES)
+                },
+            )
+        )
+    changed_years = sorted(key for key, delta in year_deltas.items() if delta)
+    changed_cells = sorted(
+        {cell_id for cell_id, delta in deltas.items() if delta}
+        | {cell_id for cell_id, _ in changed_years}
+    )
+    if not changed_cells:
+        return
+    # Locked in id order so concurrent refreshes cannot deadlock on the
+    # cells; a cell's year rows are only written under its lock.
+    db.execute(
+        select(SearchFacetCell.id)
+        .where(SearchFacetCell.id.in_(changed_cells))
+        .order_by(SearchFacetCell.id)
+        .with_for_update()
+    )
+    cell_changes = [
+        {"cell_id": cell_id, "delta": deltas[cell_id]}
+        for cell_id in changed_cells
+        if deltas[cell_id]
+    ]
+    if cell_changes:
+        db.execute(
+            update(_cells)
+            .where(_cells.c.id == bindparam("cell_id"))
+            .values(editions=_cells.c.editions + bindparam("delta")),
+            cell_changes,
+        )
+    if changed_years:
+        statement = pg_insert(SearchFacetCellYear).values(
+            [
+                {
+                    "cell_id": cell_id,
+                    "publication_year": year,
+                    "editions": year_deltas[cell_id, year],
+                }
+                for cell_id, year in changed_years
+            ]
+        )
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["publication_year", "cell_id"],
+                set_={"editions": SearchFacetCellYear.editions + statement.excluded.editions},
+            )
+        )
+
+
+def rebuild_edition_facets(connection: Connection) -> None:
+    """Recompute the whole aggregate from the catalogue."""
+    connection.execute(delete(EditionFacet))
+    connection.execute(delete(SearchFacetCellYear))
+    connection.execute(delete(SearchFacetCell))
+    values = edition_facet_values()
+    columns = [values.c[name] for name in CELL_VALUES]
+    connection.execute(
+        pg_insert(SearchFacetCell).from_select(
+            ["cell_key", *CELL_VALUES, "editions"],
+            select(values.c.cell_key, *columns, func.count()).group_by(
+                values.c.cell_key, *columns
+            ),
+        )
+    )
+    connection.execute(
+        pg_insert(EditionFacet).from_select(
+            ["edition_id", "cell_id", *EDITION_VALUES],
+            select(
+                values.c.edition_id,
+                SearchFacetCell.id,
+                *[values.c[name] for name in EDITION_VALUES],
+            ).join(SearchFacetCell, SearchFacetCell.cell_key == values.c.cell_key),
+        )
+    )
+    year = cast(func.extract("year", EditionFacet.publication_date), Integer)
+    connection.execute(
+        pg_insert(SearchFacetCellYear).from_select(
+            ["publication_year", "cell_id", "editions"],
+            select(year, EditionFacet.cell_id, func.count())
+            .where(EditionFacet.publication_date.is_not(None))
+            .group_by(year, EditionFacet.cell_id),
+        )
+    )
+
+
+def facet_counts_statement(filters: ListFilters, work_ids=None):
+    """``(facet, value, count)`` rows for every facet, plus ``("total", None, count)``.
+
+    Counts are sums over the facet cells. The text query (``work_ids``, a
+    SELECT of the ids of the matching works) and the update date filters
+    restrict the editions counted, which are then grouped by cell. A
+    publication date range alone is answered from the cells for the years
+    it covers whole, and edition by edition only for the partial years at
+    its ends. Each facet is counted with every faceted filter except its
+    own; ``only_latest_in_force`` applies to all of them. Values are
+    returned as strings.
+    """
+    flags = _cell_predicates(filters)
+
+    def cell_rows(statement):
+        if filters.only_latest_in_force:
+            statement = statement.where(_cells.c.latest_in_force)
+        return statement.add_columns(
+            *[predicate.label(f"match_{name}") for name, predicate in flags.items()]
+        )
+
+    sources = [cell_rows(source) for source in _cell_sources(filters, work_ids)]
+    cells = (sources[0] if len(sources) == 1 else union_all(*sources)).cte("facet_cells")
+
+    def matches(ignored: str | None):
+        return and_(true(), *[cells.c[f"match_{name}"] for name in flags if name != ignored])
+
+    def scalar_counts(facet: str | None, column=None):
+        value = cast(cells.c[column], String) if column else literal(None, String)
+        statement = select(
+            literal(facet or "total").label("facet"),
+            value.label("value"),
+            func.coalesce(func.sum(cells.c.editions), 0).label("count"),
+        ).where(matches(FACET_FILTERS.get(facet)))
+        return statement.group_by(cells.c[column]) if column else statement
+
+    def membership_counts(facet: str, column: str):
+        member = func.unnest(cells.c[column]).table_valued("value").render_derived(name="member")
+        return (
+            select(literal(facet), cast(member.c.value, String), func.sum(cells.c.editions))
+            .select_from(cells.join(member, true()))
+            .where(matches(FACET_FILTERS[facet]))
+            .group_by(member.c.value)
+        )
+
+    return union_all(
+        scalar_counts(None),
+        scalar_counts("authority", "authority"),
+        scalar_counts("status", "status"),
+        scalar_counts("primary_discipline", "primary_discipline_id"),
+        scalar_counts("has_attachment", "has_attachment"),
+        scalar_counts("has_official_link", "has_official_link"),
+        membership_counts("secondary_discipline", "secondary_discipline_ids"),
+        membership_counts("tag", "tag_ids"),
+    )
+
+
+def _cell_sources(filters: ListFilters, work_ids) -> list:
+    """SELECTs of cell values and edition counts whose union is the cells to count."""
+    key_columns = [_cells.c[name] for name in CELL_VALUES]
+
+    def counted_cells(counted):
+        counted = counted.subquery()
+        return (
+            select(*key_columns, counted.c.editions)
+            .select_from(_cells)
+            .join(counted, counted.c.cell_id == _cells.c.id)
+        )
+
+    def edition_counts(*restrictions, sign: int = 1):
+        return (
+            select(EditionFacet.cell_id, (func.count() * sign).label("editions"))
+            .where(*restrictions)
+            .group_by(EditionFacet.cell_id)
+        )
+
+    date_from, date_to = filters.publication_date_from, filters.publication_date_to
+    dates = []
+    if date_from:
+        dates.append(EditionFacet.publication_date >= date_from)
+    if date_to:
+        dates.append(EditionFacet.publication_date <= date_to)
+    restrictions = []
+    if work_ids is not None:
+        # As an array: a sorted index scan over the matches, whatever the
+        # planner estimates for the text query.
+        matches = func.array(work_ids.scalar_subquery())
+        restrictions.append(EditionFacet.work_id == func.any(matches))
+    if filters.updated_from:
+        restrictions.append(EditionFacet.updated_at >= filters.updated_from)
+    if filters.updated_to:
+        restrictions.append(EditionFacet.updated_at <= filters.updated_to)
+    if restrictions:
+        return [counted_cells(edition_counts(*restrictions, *dates))]
+    if not dates:
+        return [select(*key_columns, _cells.c.editions).where(_cells.c.editions > 0)]
+
+    if date_from and date_to and date_from.year == date_to.year:
+        return [counted_cells(edition_counts(*dates))]
+
+    # The years from the cell-year counts; the partial year at each end is
+    # added edition by edition, or included whole less the editions outside
+    # the range, whichever is the shorter part of the year.
+    published = EditionFacet.publication_date
+    first, last = MINYEAR, MAXYEAR
+    parts = []
+    if date_from:
+        year_start, year_end = date(date_from.year, 1, 1), date(date_from.year, 12, 31)
+        if date_from <= date(date_from.year, 7, 1):
+            first = date_from.year
+            parts.append(edition_counts(published >= year_start, published < date_from, sign=-1))
+        else:
+            first = date_from.year + 1
+            parts.append(edition_counts(published >= date_from, published <= year_end))
+    if date_to:
+        year_start, year_end = date(date_to.year, 1, 1), date(date_to.year, 12, 31)
+        if date_to >= date(date_to.year, 7, 1):
+            last = date_to.year
+            parts.append(edition_counts(published > date_to, published <= year_end, sign=-1))
+        else:
+            last = date_to.year - 1
+            parts.append(edition_counts(published >= year_start, published <= date_to))
+    whole_years = select(SearchFacetCellYear.cell_id, SearchFacetCellYear.editions).where(
+        SearchFacetCellYear.publication_year.between(first, last),
+        SearchFacetCellYear.editions > 0,
+    )
+    counts = union_all(whole_years, *parts).subquery()
+    return [
+        counted_cells(
+            select(counts.c.cell_id, func.sum(counts.c.editions).label("editions"))
+            .group_by(counts.c.cell_id)
+            .having(func.sum(counts.c.editions) > 0)
+        )
+    ]
+
+
+def _cell_predicates(filters: ListFilters) -> Dict[str, Any]:
+    """The faceted filters of ``filters`` as predicates on the facet cells."""
+    predicates: Dict[str, Any] = {}
+    if filters.authority:
+        predicates["authority"] = _cells.c.authority.in_(filters.authority)
+    if filters.status:
+        predicates["status"] = _cells.c.status.in_(filters.status)
+    if filters.discipline_ids:
+        predicates["discipline"] = or_(
+            _cells.c.primary_discipline_id.in_(filters.discipline_ids),
+            _cells.c.secondary_discipline_ids.overlap(
+                array(filters.discipline_ids, type_=Integer)
+            ),
+        )
+    if filters.tag_ids:
+        predicates["tag"] = _cells.c.tag_ids.overlap(array(filters.tag_ids, type_=Integer))
+    if filters.has_attachment is not None:
+        predicates["has_attachment"] = _cells.c.has_attachment.is_(filters.has_attachment)
+    if filters.has_official_link is not None:
+        predicates["has_official_link"] = _cells.c.has_official_link.is_(
+            filters.has_official_link
+        )
+    return predicates
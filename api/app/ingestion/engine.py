@@ -0,0 +1,665 @@
+"""Batched ingestion engine.
+
+Provider records are processed in batches of ``INGESTION_BATCH_SIZE``. Each
+batch is normalised first; ``BatchCatalog.preload`` then loads, in a few
+bulk queries, every catalogue row matching and upserting can touch: the
+provider's source records for the batch and its relation targets, the
+works sharing the batch's identifiers, the editions of those works and the
+editions with the batch's URLs, the provider records of those editions and
+the relations already leaving them. Candidates are matched and upserted
+one at a time, in feed order, against these in-memory maps, so every
+record sees what earlier records of the batch created or changed, and
+``BatchCatalog.flush`` writes the batch back with bulk INSERT/UPDATE
+statements. Discipline and tag ids come from one ``TaxonomyResolver`` per
+run.
+
+Unless the run is forced, records whose payload hash equals the one stored
+on their source record are skipped before normalisation.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+import hashlib
+from itertools import islice
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+
+from sqlalchemy import (
+    Integer,
+    Table,
+    cast,
+    column,
+    delete,
+    insert,
+    or_,
+    select,
+    union,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.ingestion.identifiers import canonicalize_identifier
+from app.ingestion.mapping import TaxonomyResolver
+from app.ingestion.matching import parse_date
+from app.models import (
+    DocumentEdition,
+    DocumentWork,
+    EditionRelation,
+    SourceRecord,
+    WorkDiscipline,
+    WorkTag,
+)
+
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "500"))
+# Records per transaction; a run checkpoints after each commit.
+INGESTION_COMMIT_SIZE = int(os.getenv("INGESTION_COMMIT_SIZE", "5000"))
+
+
+def payload_hash(payload: dict) -> str:
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def batched(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(records)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@dataclass(eq=False)
+class WorkRef:
+    id: int | None
+    identifier: str
+    canonical_identifier: str
+    authority: str
+    title: str
+    primary_discipline_id: int | None
+    changed: bool = False
+    # Replacement secondary disciplines/tags to write, if the record set them.
+    secondary_discipline_ids: List[int] | None = None
+    tag_ids: List[int] | None = None
+    editions: List["EditionRef"] = field(default_factory=list)
+    # The provider's source records pointing at one of ``editions``.
+    sources: List["SourceRef"] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class EditionRef:
+    id: int | None
+    work: WorkRef
+    edition_label: str
+    publication_date: date | None
+    status: str
+    source_canonical_url: str | None
+    changed: bool = False
+
+
+@dataclass(eq=False)
+class SourceRef:
+    id: int | None
+    external_id: str
+    work: WorkRef | None
+    edition: EditionRef | None
+    # None until written: more recent than every stored record.
+    fetched_at: datetime | None
+    payload_hash: str | None = None
+    raw_reference: str | None = None
+    changed: bool = False
+    sequence: int = 0
+
+
+def _row_key(edition: EditionRef) -> Any:
+    return edition.id if edition.id is not None else edition
+
+
+class BatchCatalog:
+    """In-memory view of the catalogue rows a batch can touch.
+
+    Implements ``app.ingestion.matching.CatalogLookup`` over the preloaded
+    maps and mirrors the single-record upsert rules: works are keyed by
+    canonical identifier (oldest first), editions by work, label and
+    publication date, source records by external id.
+    """
+
+    def __init__(self, db: Session, provider: str) -> None:
+        self.db = db
+        self.provider = provider
+        self.works: Dict[int, WorkRef] = {}
+        self.works_by_canonical: Dict[str, WorkRef] = {}
+        self.editions: Dict[int, EditionRef] = {}
+        self.editions_by_url: Dict[str, EditionRef] = {}
+        self.sources: Dict[str, SourceRef] = {}
+        self.relations: Set[Tuple[Any, Any, str]] = set()
+        self.new_works: List[WorkRef] = []
+        self.new_editions: List[EditionRef] = []
+        self.new_relations: List[Tuple[EditionRef, EditionRef, dict]] = []
+        self._sequence = 0
+
+    # Preloading
+
+    def preload(self, candidates: List[Dict[str, Any]]) -> None:
+        external_ids = {c["external_id"] for c in candidates if c.get("external_id")}
+        external_ids.update(
+            relation["to_external_id"]
+            for c in candidates
+            for relation in c.get("relations") or []
+            if relation.get("to_external_id")
+        )
+        canonicals = {
+            canonicalize_identifier(c["work"]["identifier"])
+            for c in candidates
+            if (c.get("work") or {}).get("identifier")
+        }
+        urls = {
+            (c.get("edition") or {}).get("source_canonical_url") for c in candidates
+        } - {None}
+
+        source_rows = self.db.execute(
+            select(
+                SourceRecord.id,
+                SourceRecord.external_id,
+                SourceRecord.work_id,
+                SourceRecord.edition_id,
+                SourceRecord.fetched_at,
+            ).where(
+                SourceRecord.provider == self.provider,
+                SourceRecord.external_id.in_(external_ids),
+            )
+        ).all()
+        source_edition_ids = {row.edition_id for row in source_rows if row.edition_id}
+        work_ids = {row.work_id for row in source_rows if row.work_id}
+        if source_edition_ids or urls:
+            work_ids.update(
+                self.db.scalars(
+                    union(
+                        select(DocumentEdition.work_id).where(
+                            DocumentEdition.id.in_(source_edition_ids)
+                        ),
+                        select(DocumentEdition.work_id).where(
+                            DocumentEdition.source_canonical_url.in_(urls)
+                        ),
+                    )
+                )
+            )
+
+        self._load_works(
+            or_(DocumentWork.id.in_(work_ids), DocumentWork.canonical_identifier.in_(canonicals))
+        )
+        # Works found by id may share their canonical identifier with an older work.
+        extra_canonicals = {work.canonical_identifier for work in self.works.values()} - canonicals
+        if extra_canonicals:
+            self._load_works(DocumentWork.canonical_identifier.in_(extra_canonicals))
+
+        edition_rows = self.db.execute(
+            select(
+                DocumentEdition.id,
+                DocumentEdition.work_id,
+                DocumentEdition.edition_label,
+                DocumentEdition.publication_date,
+                DocumentEdition.status,
+                DocumentEdition.source_canonical_url,
+            )
+            .where(DocumentEdition.work_id.in_(list(self.works)))
+            .order_by(DocumentEdition.id)
+        )
+        for row in edition_rows:
+            edition = EditionRef(
+                id=row.id,
+                work=self.works[row.work_id],
+                edition_label=row.edition_label,
+                publication_date=row.publication_date,
+                status=row.status,
+                source_canonical_url=row.source_canonical_url,
+            )
+            self.editions[edition.id] = edition
+            edition.work.editions.append(edition)
+            if edition.source_canonical_url:
+                self.editions_by_url.setdefault(edition.source_canonical_url, edition)
+
+        work_source_rows = self.db.execute(
+            select(
+                SourceRecord.id,
+                SourceRecord.external_id,
+                SourceRecord.work_id,
+                SourceRecord.edition_id,
+                SourceRecord.fetched_at,
+            ).where(
+                SourceRecord.provider == self.provider,
+                SourceRecord.edition_id.in_(list(self.editions)),
+            )
+        )
+        for row in [*source_rows, *work_source_rows]:
+            if row.external_id in self.sources:
+                continue
+            source = SourceRef(
+                id=row.id,
+                external_id=row.external_id,
+                work=self.works.get(row.work_id),
+                edition=self.editions.get(row.edition_id),
+                fetched_at=row.fetched_at,
+            )
+            self.sources[source.external_id] = source
+            if source.edition:
+                source.edition.work.sources.append(source)
+
+        self.relations.update(
+            self.db.execute(
+                select(
+                    EditionRelation.from_edition_id,
+                    EditionRelation.to_edition_id,
+                    EditionRelation.type,
+                ).where(EditionRelation.from_edition_id.in_(list(self.editions)))
+            ).tuples()
+        )
+
+    def _load_works(self, condition) -> None:
+        rows = self.db.execute(
+            select(
+                DocumentWork.id,
+                DocumentWork.identifier,
+                DocumentWork.canonical_identifier,
+                DocumentWork.authority,
+                DocumentWork.title,
+                DocumentWork.primary_discipline_id,
+            )
+            .where(condition)
+            .order_by(DocumentWork.id)
+        )
+        for row in rows:
+            if row.id in self.works:
+                continue
+            work = WorkRef(**row._asdict())
+            self.works[work.id] = work
+            current = self.works_by_canonical.get(work.canonical_identifier)
+            if current is None or current.id > work.id:
+                self.works_by_canonical[work.canonical_identifier] = work
+
+    # CatalogLookup
+
+    def source_targets(self, provider: str, external_id: str):
+        source = self.sources.get(external_id)
+        if source is None:
+            return None, None
+        return source.work, source.edition
+
+    def work_by_identifier(self, identifier: str) -> WorkRef | None:
+        return self.works_by_canonical.get(canonicalize_identifier(identifier))
+
+    def edition_by_url(self, source_url: str) -> EditionRef | None:
+        return self.editions_by_url.get(source_url)
+
+    def work_edition(
+        self, work: WorkRef, edition_label: str | None, publication_date: date | None
+    ) -> EditionRef | None:
+        for edition in work.editions:
+            if (
+                edition.edition_label == edition_label
+                and edition.publication_date == publication_date
+            ):
+                return edition
+        return None
+
+    def latest_source_external_id(self, work: WorkRef, provider: str) -> str | None:
+        if not work.sources:
+            return None
+        latest = max(
+            work.sources,
+            key=lambda source: (
+                source.edition.publication_date is not None,
+                source.edition.publication_date or date.min,
+                source.fetched_at or datetime.max,
+                source.sequence,
+            ),
+        )
+        return latest.external_id
+
+    # Upserts
+
+    def upsert(
+        self, candidate: Dict[str, Any], record_hash: str
+    ) -> Tuple[WorkRef, EditionRef, bool]:
+        """Apply a matched candidate; the flag tells whether its source record is new."""
+        edition_payload = candidate["edition"]
+        work = self._upsert_work(candidate["work"])
+        edition = self._upsert_edition(work, edition_payload)
+        created = self._upsert_source(
+            candidate["external_id"],
+            record_hash,
+            edition_payload.get("source_canonical_url"),
+            work,
+            edition,
+        )
+        for relation in candidate.get("relations", []):
+            self._add_relation(edition, relation)
+        return work, edition, created
+
+    def _upsert_work(self, payload: dict) -> WorkRef:
+        canonical = canonicalize_identifier(payload["identifier"])
+        work = self.works_by_canonical.get(canonical)
+        if work:
+            work.authority = payload["authority"]
+            work.title = payload["title"]
+            if payload.get("primary_discipline_id") is not None:
+                work.primary_discipline_id = payload.get("primary_discipline_id")
+            work.changed = True
+        else:
+            work = WorkRef(
+                id=None,
+                identifier=payload["identifier"],
+                canonical_identifier=canonical,
+                authority=payload["authority"],
+                title=payload["title"],
+                primary_discipline_id=payload.get("primary_discipline_id"),
+            )
+            self.works_by_canonical[canonical] = work
+            self.new_works.append(work)
+        if payload.get("secondary_discipline_ids") is not None:
+            work.secondary_discipline_ids = list(payload["secondary_discipline_ids"])
+        if payload.get("tag_ids") is not None:
+            work.tag_ids = list(payload["tag_ids"])
+        return work
+
+    def _upsert_edition(self, work: WorkRef, payload: dict) -> EditionRef:
+        publication_date = parse_date(payload.get("publication_date"))
+        edition = self.work_edition(work, payload["edition_label"], publication_date)
+        if edition:
+            previous_url = edition.source_canonical_url
+            edition.status = payload.get("status", edition.status)
+            edition.source_canonical_url = payload.get(
+                "source_canonical_url", edition.source_canonical_url
+            )
+            edition.changed = True
+            if (
+                previous_url != edition.source_canonical_url
+                and self.editions_by_url.get(previous_url) is edition
+            ):
+                del self.editions_by_url[previous_url]
+        else:
+            edition = EditionRef(
+                id=None,
+                work=work,
+                edition_label=payload["edition_label"],
+                publication_date=publication_date,
+                status=payload.get("status", "unknown"),
+                source_canonical_url=payload.get("source_canonical_url"),
+            )
+            work.editions.append(edition)
+            self.new_editions.append(edition)
+        if edition.source_canonical_url:
+            self.editions_by_url.setdefault(edition.source_canonical_url, edition)
+        return edition
+
+    def _upsert_source(
+        self,
+        external_id: str,
+        record_hash: str,
+        raw_reference: str | None,
+        work: WorkRef,
+        edition: EditionRef,
+    ) -> bool:
+        source = self.sources.get(external_id)
+        created = source is None
+        if created:
+            source = SourceRef(
+                id=None, external_id=external_id, work=None, edition=None, fetched_at=None
+            )
+            self.sources[external_id] = source
+        if source.edition is not edition:
+            if source.edition:
+                source.edition.work.sources.remove(source)
+            edition.work.sources.append(source)
+        source.work = work
+        source.edition = edition
+        source.payload_hash = record_hash
+        source.raw_reference = raw_reference
+        source.changed = True
+        self._sequence += 1
+        source.sequence = self._sequence
+        return created
+
+    def _add_relation(self, edition: EditionRef, relation: dict) -> None:
+        to_external_id = relation.get("to_external_id")
+        if not to_external_id:
+            return
+        target = self.sources.get(to_external_id)
+        if not target or not target.edition:
+            return
+        key = (_row_key(edition), _row_key(target.edition), relation.get("type", "related"))
+        if key in self.relations:
+            return
+        self.relations.add(key)
+        self.new_relations.append((edition, target.edition, relation))
+
+    # Write-back
+
+    def flush(self) -> None:
+        """Write the batch's new and changed rows with bulk statements."""
+        work_ids = self._insert_returning_ids(
+            DocumentWork.__table__,
+            [
+                {
+                    "authority": work.authority,
+                    "identifier": work.identifier,
+                    "canonical_identifier": work.canonical_identifier,
+                    "title": work.title,
+                    "primary_discipline_id": work.primary_discipline_id,
+                }
+                for work in self.new_works
+            ],
+        )
+        for work, work_id in zip(self.new_works, work_ids):
+            work.id = work_id
+        changed_works = [work for work in self.works.values() if work.changed]
+        self._update_by_id(
+            DocumentWork.__table__,
+            ("authority", "title", "primary_discipline_id"),
+            [
+                (work.id, work.authority, work.title, work.primary_discipline_id)
+                for work in changed_works
+            ],
+        )
+        touched_works = [*changed_works, *self.new_works]
+        self._replace_links(
+            WorkDiscipline.__table__,
+            "discipline_id",
+            {work.id: work.secondary_discipline_ids for work in touched_works},
+        )
+        self._replace_links(
+            WorkTag.__table__, "tag_id", {work.id: work.tag_ids for work in touched_works}
+        )
+
+        edition_ids = self._insert_returning_ids(
+            DocumentEdition.__table__,
+            [
+                {
+                    "work_id": edition.work.id,
+                    "edition_label": edition.edition_label,
+                    "publication_date": edition.publication_date,
+                    "status": edition.status,
+                    "source_canonical_url": edition.source_canonical_url,
+                }
+                for edition in self.new_editions
+            ],
+        )
+        for edition, edition_id in zip(self.new_editions, edition_ids):
+            edition.id = edition_id
+        self._update_by_id(
+            DocumentEdition.__table__,
+            ("status", "source_canonical_url"),
+            [
+                (edition.id, edition.status, edition.source_canonical_url)
+                for edition in self.editions.values()
+                if edition.changed
+            ],
+        )
+
+        changed_sources = [source for source in self.sources.values() if source.changed]
+        if changed_sources:
+            statement = pg_insert(SourceRecord.__table__)
+            self.db.execute(
+                statement.on_conflict_do_update(
+                    constraint="uq_source_external",
+                    set_={
+                        "payload_hash": statement.excluded.payload_hash,
+                        "raw_reference": statement.excluded.raw_reference,
+                        "work_id": statement.excluded.work_id,
+                        "edition_id": statement.excluded.edition_id,
+                    },
+                ),
+                [
+                    {
+                        "provider": self.provider,
+                        "external_id": source.external_id,
+                        "payload_hash": source.payload_hash,
+                        "raw_reference": source.raw_reference,
+                        "work_id": source.work.id,
+                        "edition_id": source.edition.id,
+                    }
+                    for source in changed_sources
+                ],
+            )
+
+        if self.new_relations:
+            self.db.execute(
+                insert(EditionRelation.__table__),
+                [
+                    {
+                        "from_edition_id": edition.id,
+                        "to_edition_id": target.id,
+                        "type": relation.get("type", "related"),
+                        "confidence": relation.get("confidence", 1.0),
+                        "source": relation.get("source"),
+                    }
+                    for edition, target, relation in self.new_relations
+                ],
+            )
+
+    def _insert_returning_ids(self, table: Table, rows: List[dict]) -> List[int]:
+        if not rows:
+            return []
+        statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        return self.db.scalars(statement, rows).all()
+
+    def _update_by_id(self, table: Table, names: Sequence[str], rows: List[tuple]) -> None:
+        """``UPDATE table ... FROM (VALUES ...)``: one statement for all ``rows``."""
+        if not rows:
+            return
+        data = values(
+            column("id", Integer),
+            *(column(name, table.c[name].type) for name in names),
+            name="batch_rows",
+        ).data(rows)
+        self.db.execute(
+            update(table)
+            .where(table.c.id == data.c.id)
+            .values({name: cast(data.c[name], table.c[name].type) for name in names})
+        )
+
+    def _replace_links(
+        self, table: Table, target_name: str, links: Dict[int, List[int] | None]
+    ) -> None:
+        links = {work_id: ids for work_id, ids in links.items() if ids is not None}
+        if not links:
+            return
+        self.db.execute(delete(table).where(table.c.work_id.in_(list(links))))
+        rows = [
+            {"work_id": work_id, target_name: target_id}
+            for work_id, ids in links.items()
+            for target_id in dict.fromkeys(ids)
+        ]
+        if rows:
+            self.db.execute(insert(table), rows)
+
+
+class IngestionEngine:
+    """Run a provider feed through normalisation, matching and bulk upserts, batch by batch.
+
+    Runs in the caller's transaction, which may be committed between calls
+    to ``ingest``; ``work_ids``/``edition_ids`` collect the rows each record
+    was upserted into, for the caller's follow-up maintenance, until
+    ``drain_touched`` hands them over. ``ingested`` counts every record
+    read, split into ``created``, ``updated`` and ``skipped``.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        provider: str,
+        provider_module,
+        batch_size: int = INGESTION_BATCH_SIZE,
+        force: bool = False,
+    ) -> None:
+        self.db = db
+        self.provider = provider
+        self.provider_module = provider_module
+        self.batch_size = batch_size
+        self.force = force
+        self.taxonomy = TaxonomyResolver(db)
+        self.ingested = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.work_ids: List[int] = []
+        self.edition_ids: List[int] = []
+
+    def ingest(self, records: Iterable[dict]) -> None:
+        for batch in batched(records, self.batch_size):
+            self.ingest_batch(batch)
+
+    def drain_touched(self) -> Tuple[List[int], List[int]]:
+        """Work and edition ids upserted since the previous call."""
+        touched = self.work_ids, self.edition_ids
+        self.work_ids, self.edition_ids = [], []
+        return touched
+
+    def ingest_batch(self, records: List[dict]) -> None:
+        self.ingested += len(records)
+        hashes = [payload_hash(record) for record in records]
+        if not self.force:
+            stored = self._stored_hashes(records)
+            changed = [
+                index
+                for index, record in enumerate(records)
+                if stored.get(record.get("external_id")) != hashes[index]
+            ]
+            self.skipped += len(records) - len(changed)
+            records = [records[index] for index in changed]
+            hashes = [hashes[index] for index in changed]
+            if not records:
+                return
+        candidates = [
+            self.provider_module.normalize(record, db=self.db, taxonomy=self.taxonomy)
+            for record in records
+        ]
+        catalog = BatchCatalog(self.db, self.provider)
+        catalog.preload(candidates)
+        upserted = []
+        for record_hash, candidate in zip(hashes, candidates):
+            candidate = self.provider_module.match_and_merge(
+                candidate, db=self.db, lookup=catalog
+            )
+            upserted.append(catalog.upsert(candidate, record_hash))
+        catalog.flush()
+        for work, edition, created in upserted:
+            self.work_ids.append(work.id)
+            self.edition_ids.append(edition.id)
+            if created:
+                self.created += 1
+            else:
+                self.updated += 1
+
+    def _stored_hashes(self, records: List[dict]) -> Dict[str, str]:
+        """Payload hashes of the batch's source records still linked to an edition."""
+        external_ids = {record.get("external_id") for record in records} - {None}
+        rows = self.db.execute(
+            select(SourceRecord.external_id, SourceRecord.payload_hash).where(
+                SourceRecord.provider == self.provider,
+                SourceRecord.external_id.in_(external_ids),
+                SourceRecord.edition_id.is_not(None),
+            )
+        )
+        return dict(rows.all())
@@ -0,0 +1,83 @@
+"""Canonical identifier keys used to match works across providers.
+
+The canonical form ignores case, accents, spacing and separator dashes,
+maps EU act citations ("Reg. (UE) 2016/679", "Direttiva 2006/42/CE") and
+CELEX references onto the same ``celex:`` key, and reduces Normattiva URLs
+and URNs to the bare ``urn:nir:`` reference.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+
+_DASHES = re.compile(r"[\u2010-\u2015\u2212]")
+_SEPARATORS = re.compile(r"[\s_]+")
+_NON_NUMERIC_DASH = re.compile(r"(?<!\d)-|-(?!\d)")
+_CELEX = re.compile(r"^celex\s*:?\s*(?P<number>[0-9ce]\d{4}[a-z]{1,2}\d{3,4}\w*)$")
+_BARE_CELEX = re.compile(r"^[0-9ce]\d{4}[a-z]{1,2}\d{4}\w*$")
+_EU_ACT = re.compile(
+    r"^(?P<kind>reg|regolamento|regulation|dir|direttiva|directive|dec|decisione|decision)"
+    r"\.?\s*(?:\((?:ue|eu|ce|ec|cee|eec|euratom)\)|ue|eu|ce|ec|cee|eec)?\s*"
+    r"(?P<marker>n\.?|no\.?|nr\.?|n°)?\s*"
+    r"(?P<first>\d{2,4})\s*/\s*(?P<second>\d{1,4})"
+    r"(?:\s*/\s*(?:ue|eu|ce|ec|cee|eec|euratom))?$"
+)
+_CELEX_DOCUMENT_TYPES = {
+    "reg": "R",
+    "regolamento": "R",
+    "regulation": "R",
+    "dir": "L",
+    "direttiva": "L",
+    "directive": "L",
+    "dec": "D",
+    "decisione": "D",
+    "decision": "D",
+}
+
+
+def canonicalize_identifier(value: str | None) -> str:
+    if not value:
+        return ""
+    text = _fold(value)
+
+    urn_start = text.find("urn:")
+    if urn_start != -1:
+        return _SEPARATORS.sub("", text[urn_start:])
+
+    celex = _CELEX.match(text)
+    if celex:
+        return f"celex:{celex.group('number')}"
+    if _BARE_CELEX.match(text):
+        return f"celex:{text}"
+
+    eu_act = _EU_ACT.match(text)
+    if eu_act:
+        return _eu_act_celex(eu_act)
+
+    compact = _SEPARATORS.sub("", text)
+    return _NON_NUMERIC_DASH.sub("", compact)
+
+
+def _fold(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _DASHES.sub("-", stripped).strip().lower()
+
+
+def _eu_act_celex(match: re.Match[str]) -> str:
+    first, second = match.group("first"), match.group("second")
+    year_first = _is_year(first) and not (len(first) == 2 and len(second) == 4)
+    if match.group("marker") or not year_first:
+        number, year = first, second
+    else:
+        year, number = first, second
+    if len(year) == 2:
+        year = f"19{year}" if int(year) >= 50 else f"20{year}"
+    document_type = _CELEX_DOCUMENT_TYPES[match.group("kind")]
+    return f"celex:3{year}{document_type.lower()}{int(number):04d}"
+
+
+def _is_year(value: str) -> bool:
+    if len(value) == 2:
+        return True
+    return len(value) == 4 and 1950 <= int(value) <= 2100
@@ -0,0 +1,122 @@
+"""Ingestion runs: processing one run of a provider from the queue.
+
+``run_ingestion_job`` is what the workers (``app.worker``) execute for a
+claimed run. It only depends on the catalogue upkeep in ``app.catalog``,
+not on the API, so importing it neither creates nor upgrades the schema.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.catalog import bump_lists_containing, maintain_dynamic_lists, refresh_latest_in_force
+from app.db import SessionLocal
+from app.events import publish
+from app.ingestion.engine import INGESTION_COMMIT_SIZE, IngestionEngine, batched
+from app.ingestion.queue import LeaseLost, ensure_run_owner
+from app.ingestion.watermarks import advance_watermark
+from app.models import IngestionRun
+from app.providers import get_provider
+from app.providers.client import fetch_pages
+
+
+def run_ingestion_job(run_id: int, worker_id: str | None = None) -> None:
+    """Ingest the changes in run ``run_id``'s window, resuming from its checkpoint if any.
+
+    Work is committed every ``INGESTION_COMMIT_SIZE`` records together with
+    the run's counters and checkpoint (page cursor and last external id),
+    so a failure only loses the current chunk. The provider's watermark
+    only advances when the run completes. When ``worker_id`` is given,
+    every commit first checks that the run is still leased to that worker.
+    """
+    db = SessionLocal()
+    try:
+        run = db.get(IngestionRun, run_id)
+        if not run:
+            return
+        try:
+            provider_module = get_provider(run.provider)
+            ingestion = IngestionEngine(
+                db, run.provider, provider_module, force=run.force_refresh
+            )
+            base_counts = _ingestion_counts(run)
+            pages = fetch_pages(
+                provider_module,
+                run.since,
+                cursor=run.checkpoint_cursor,
+                after=run.checkpoint_external_id,
+            )
+            pending = 0
+            for page in pages:
+                if page.high_water_mark is not None and (
+                    run.high_water_mark is None or page.high_water_mark > run.high_water_mark
+                ):
+                    run.high_water_mark = page.high_water_mark
+                for chunk in batched(page.items, INGESTION_COMMIT_SIZE):
+                    ingestion.ingest(chunk)
+                    pending += len(chunk)
+                    run.checkpoint_cursor = page.cursor
+                    run.checkpoint_external_id = chunk[-1]["external_id"]
+                    if pending >= INGESTION_COMMIT_SIZE:
+                        _commit_ingestion_chunk(db, run, ingestion, base_counts, worker_id)
+                        pending = 0
+            _commit_ingestion_chunk(
+                db, run, ingestion, base_counts, worker_id, completed=True
+            )
+        except LeaseLost:
+            db.rollback()
+        except Exception as exc:
+            # Counters and checkpoint fall back to the last committed chunk.
+            db.rollback()
+            try:
+                ensure_run_owner(db, run, worker_id)
+            except LeaseLost:
+                db.rollback()
+                return
+            run.status = "failed"
+            run.finished_at = datetime.utcnow()
+            run.error_message = str(exc)
+            db.add(run)
+            db.commit()
+    finally:
+        db.close()
+
+
+def _ingestion_counts(run: IngestionRun) -> dict[str, int]:
+    return {
+        "imported": run.records_imported or 0,
+        "created": run.records_created or 0,
+        "updated": run.records_updated or 0,
+        "skipped": run.records_skipped or 0,
+    }
+
+
+def _commit_ingestion_chunk(
+    db: Session,
+    run: IngestionRun,
+    ingestion: IngestionEngine,
+    base_counts: dict[str, int],
+    worker_id: str | None,
+    completed: bool = False,
+) -> None:
+    ensure_run_owner(db, run, worker_id)
+    work_ids, edition_ids = ingestion.drain_touched()
+    refresh_latest_in_force(db, work_ids)
+    bump_lists_containing(db, edition_ids)
+    maintain_dynamic_lists(db, edition_ids)
+    publish(db, "work", work_ids)
+    publish(db, "edition", edition_ids)
+    run.records_imported = base_counts["imported"] + ingestion.ingested
+    run.records_created = base_counts["created"] + ingestion.created
+    run.records_updated = base_counts["updated"] + ingestion.updated
+    run.records_skipped = base_counts["skipped"] + ingestion.skipped
+    if completed:
+        run.status = "completed"
+        run.finished_at = datetime.utcnow()
+        run.error_message = None
+        run.checkpoint_cursor = None
+        run.checkpoint_external_id = None
+        advance_watermark(db, run)
+    db.add(run)
+    db.commit()
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass
-from typing import Iterable
+from typing import Hashable, Iterable, Mapping
+import unicodedata
 
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.models import DisciplineCategory, UserTag
@@ -40,24 +44,185 @@ TAG_RULES: dict[str, tuple[str, ...]] = {
 }
 
 
-def apply_mapping(normalized: dict, db: Session | None = None) -> dict:
+def normalize_text(value: str) -> str:
+    """Case- and accent-insensitive form of ``value`` with single spaces."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton finding which labels' keywords occur in a text.
+
+    Keywords and texts are compared through ``normalize_text`` and a keyword
+    only matches whole words (``"qms"`` matches ``"ISO QMS audit"``, not
+    ``"qmsx"``). Matching costs one pass over the text, whatever the
+    number of keywords.
+    """
+
+    def __init__(self, keywords: Mapping[Hashable, Iterable[str]]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # Per state: (label, keyword length) of every keyword ending there.
+        self._outputs: list[list[tuple[Hashable, int]]] = [[]]
+        for label, label_keywords in keywords.items():
+            for keyword in label_keywords:
+                normalized = normalize_text(keyword)
+                if normalized:
+                    self._add(normalized, label)
+        self._link()
+
+    def _add(self, keyword: str, label: Hashable) -> None:
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((label, len(keyword)))
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] = (
+                    self._outputs[next_state] + self._outputs[self._fail[next_state]]
+                )
+
+    def labels(self, texts: Iterable[str]) -> set[Hashable]:
+        found: set[Hashable] = set()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        for text in texts:
+            text = normalize_text(text)
+            size = len(text)
+            state = 0
+            for end, char in enumerate(text, 1):
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                if not outputs[state] or (end < size and text[end].isalnum()):
+                    continue
+                for label, length in outputs[state]:
+                    start = end - length
+                    if start == 0 or not text[start - 1].isalnum():
+                        found.add(label)
+        return found
+
+
+_rule_matcher: tuple[object, object, KeywordMatcher] | None = None
+
+
+def _compiled_rules() -> KeywordMatcher:
+    """Matcher over the current rules, rebuilt when ``DISCIPLINE_RULES``/``TAG_RULES`` are replaced."""
+    global _rule_matcher
+    if (
+        _rule_matcher is None
+        or _rule_matcher[0] is not DISCIPLINE_RULES
+        or _rule_matcher[1] is not TAG_RULES
+    ):
+        keywords: dict[Hashable, Iterable[str]] = {
+            ("discipline", rule.code): rule.keywords for rule in DISCIPLINE_RULES
+        }
+        keywords.update({("tag", name): values for name, values in TAG_RULES.items()})
+        _rule_matcher = (DISCIPLINE_RULES, TAG_RULES, KeywordMatcher(keywords))
+    return _rule_matcher[2]
+
+
+class TaxonomyResolver:
+    """Ids of the disciplines and tags produced by the mapping rules.
+
+    The rule disciplines and tags are loaded once, so one resolver can map
+    any number of records (the ingestion engine keeps one per run); missing
+    ones are created on first use, each in its own short transaction so
+    that concurrent runs neither conflict on nor wait for each other's
+    uncommitted entries.
+    """
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        codes = [rule.code for rule in DISCIPLINE_RULES]
+        self._disciplines = {
+            discipline.code: discipline.id
+            for discipline in db.query(DisciplineCategory).filter(
+                DisciplineCategory.code.in_(codes)
+            )
+        }
+        self._tags = {
+            tag.normalized_name: tag.id
+            for tag in db.query(UserTag).filter(
+                UserTag.normalized_name.in_([_normalize_tag(name) for name in TAG_RULES])
+            )
+        }
+
+    def discipline_ids(self, codes: list[str]) -> tuple[int | None, list[int]]:
+        if not codes:
+            return None, []
+        for rule in DISCIPLINE_RULES:
+            if rule.code not in codes or rule.code in self._disciplines:
+                continue
+            self._disciplines[rule.code] = self._create(
+                DisciplineCategory,
+                DisciplineCategory.code,
+                code=rule.code,
+                name=rule.name,
+                version="v1",
+                sort_order=0,
+                active=True,
+            )
+
+        ordered_ids = [self._disciplines[code] for code in codes if code in self._disciplines]
+        primary_id = ordered_ids[0] if ordered_ids else None
+        secondary_ids = ordered_ids[1:] if len(ordered_ids) > 1 else []
+        return primary_id, secondary_ids
+
+    def tag_ids(self, names: list[str]) -> list[int]:
+        if not names:
+            return []
+        normalized_map = {_normalize_tag(name): name for name in names}
+        for normalized, original in normalized_map.items():
+            if normalized in self._tags:
+                continue
+            self._tags[normalized] = self._create(
+                UserTag, UserTag.normalized_name, name=original, normalized_name=normalized
+            )
+        return [self._tags[key] for key in normalized_map]
+
+    def _create(self, model, key, **values) -> int:
+        with self.db.get_bind().begin() as connection:
+            connection.execute(
+                pg_insert(model).values(**values).on_conflict_do_nothing(index_elements=[key])
+            )
+        return self.db.scalar(select(model.id).where(key == values[key.key]))
+
+
+def apply_mapping(
+    normalized: dict, db: Session | None = None, taxonomy: TaxonomyResolver | None = None
+) -> dict:
     work = normalized.get("work")
     if not work:
         return normalized
 
-    terms = _collect_terms(normalized)
-    discipline_codes = _match_disciplines(terms)
-    tag_names = _match_tags(terms)
+    discipline_codes, tag_names = _match_rules(_collect_terms(normalized))
 
     primary_id = work.get("primary_discipline_id")
     secondary_ids: list[int] | None = work.get("secondary_discipline_ids")
     tag_ids: list[int] | None = work.get("tag_ids")
 
-    if db:
-        mapped_primary_id, mapped_secondary_ids = _resolve_discipline_ids(
-            db, discipline_codes
-        )
-        mapped_tag_ids = _resolve_tag_ids(db, tag_names)
+    if taxonomy is None and db:
+        taxonomy = TaxonomyResolver(db)
+    if taxonomy:
+        mapped_primary_id, mapped_secondary_ids = taxonomy.discipline_ids(discipline_codes)
+        mapped_tag_ids = taxonomy.tag_ids(tag_names)
 
         if primary_id is None:
             primary_id = mapped_primary_id
@@ -91,82 +256,17 @@ def _collect_terms(normalized: dict) -> list[str]:
     title = work.get("title")
     if title:
         candidates.append(str(title))
-    return [item.strip().lower() for item in candidates if str(item).strip()]
-
-
-def _match_disciplines(terms: Iterable[str]) -> list[str]:
-    matches: list[str] = []
-    for rule in DISCIPLINE_RULES:
-        if _has_keyword(terms, rule.keywords):
-            matches.append(rule.code)
-    return matches
-
-
-def _match_tags(terms: Iterable[str]) -> list[str]:
-    matches: list[str] = []
-    for name, keywords in TAG_RULES.items():
-        if _has_keyword(terms, keywords):
-            matches.append(name)
-    return matches
-
-
-def _has_keyword(terms: Iterable[str], keywords: Iterable[str]) -> bool:
-    for term in terms:
-        for keyword in keywords:
-            if keyword in term:
-                return True
-    return False
-
-
-def _resolve_discipline_ids(
-    db: Session, codes: list[str]
-) -> tuple[int | None, list[int]]:
-    if not codes:
-        return None, []
-    existing = (
-        db.query(DisciplineCategory)
-        .filter(DisciplineCategory.code.in_(codes))
-        .all()
-    )
-    by_code = {discipline.code: discipline for discipline in existing}
-    for rule in DISCIPLINE_RULES:
-        if rule.code not in codes or rule.code in by_code:
-            continue
-        discipline = DisciplineCategory(
-            code=rule.code,
-            name=rule.name,
-            version="v1",
-            sort_order=0,
-            active=True,
-        )
-        db.add(discipline)
-        db.flush()
-        by_code[rule.code] = discipline
-
-    ordered_ids = [by_code[code].id for code in codes if code in by_code]
-    primary_id = ordered_ids[0] if ordered_ids else None
-    secondary_ids = ordered_ids[1:] if len(ordered_ids) > 1 else []
-    return primary_id, secondary_ids
-
-
-def _resolve_tag_ids(db: Session, names: list[str]) -> list[int]:
-    if not names:
-        return []
-    normalized_map = {_normalize_tag(name): name for name in names}
-    existing = (
-        db.query(UserTag)
-        .filter(UserTag.normalized_name.in_(normalized_map))
-        .all()
-    )
-    by_normalized = {tag.normalized_name: tag for tag in existing}
-    for normalized, original in normalized_map.items():
-        if normalized in by_normalized:
-            continue
-        tag = UserTag(name=original, normalized_name=normalized)
-        db.add(tag)
-        db.flush()
-        by_normalized[normalized] = tag
-    return [by_normalized[key].id for key in normalized_map]
+    return [item.strip() for item in candidates if str(item).strip()]
+
+
+def _match_rules(terms: Iterable[str]) -> tuple[list[str], list[str]]:
+    """Codes of the matching discipline rules and names of the matching tags, in rule order."""
+    found = _compiled_rules().labels(terms)
+    discipline_codes = [
+        rule.code for rule in DISCIPLINE_RULES if ("discipline", rule.code) in found
+    ]
+    tag_names = [name for name in TAG_RULES if ("tag", name) in found]
+    return discipline_codes, tag_names
 
 
 def _normalize_tag(value: str) -> str:
@@ -1,19 +1,104 @@
+"""Match normalised candidates to existing works and editions.
+
+``match_and_merge_candidate`` reads the catalogue through a lookup object:
+``DatabaseLookup`` runs one query per question and is used for a single
+candidate, while the batch ingestion engine passes a lookup over maps
+preloaded for a whole batch (see ``app.ingestion.engine``). Lookups return
+objects exposing ``id``/``identifier`` for works and ``edition_label``/
+``publication_date``/``work`` for editions.
+"""
 from __future__ import annotations
 
 from datetime import date
-from typing import Any, Dict
+from typing import Any, Dict, Protocol, Tuple
 
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from app.ingestion.identifiers import canonicalize_identifier
 from app.models import DocumentEdition, DocumentWork, SourceRecord
 
 
+class CatalogLookup(Protocol):
+    def source_targets(self, provider: str, external_id: str) -> Tuple[Any, Any]:
+        """Work and edition linked to a provider record, if any."""
+
+    def work_by_identifier(self, identifier: str) -> Any:
+        """The oldest work with the same canonical identifier."""
+
+    def edition_by_url(self, source_url: str) -> Any:
+        ...
+
+    def work_edition(
+        self, work: Any, edition_label: str | None, publication_date: date | None
+    ) -> Any:
+        ...
+
+    def latest_source_external_id(self, work: Any, provider: str) -> str | None:
+        """External id of the provider record of the work's most recent edition."""
+
+
+class DatabaseLookup:
+    def __init__(self, db: Session) -> None:
+        self.db = db
+
+    def source_targets(self, provider, external_id):
+        source_record = (
+            self.db.query(SourceRecord)
+            .filter(SourceRecord.provider == provider, SourceRecord.external_id == external_id)
+            .first()
+        )
+        if not source_record:
+            return None, None
+        work = self.db.get(DocumentWork, source_record.work_id) if source_record.work_id else None
+        edition = (
+            self.db.get(DocumentEdition, source_record.edition_id)
+            if source_record.edition_id
+            else None
+        )
+        return work, edition
+
+    def work_by_identifier(self, identifier):
+        return (
+            self.db.query(DocumentWork)
+            .filter(DocumentWork.canonical_identifier == canonicalize_identifier(identifier))
+            .order_by(DocumentWork.id)
+            .first()
+        )
+
+    def edition_by_url(self, source_url):
+        return (
+            self.db.query(DocumentEdition)
+            .filter(DocumentEdition.source_canonical_url == source_url)
+            .order_by(DocumentEdition.id)
+            .first()
+        )
+
+    def work_edition(self, work, edition_label, publication_date):
+        return (
+            self.db.query(DocumentEdition)
+            .filter(
+                DocumentEdition.work_id == work.id,
+                DocumentEdition.edition_label == edition_label,
+                DocumentEdition.publication_date == publication_date,
+            )
+            .first()
+        )
+
+    def latest_source_external_id(self, work, provider):
+        related_source = _latest_source_for_work(self.db, work.id, provider)
+        return related_source.external_id if related_source else None
+
+
 def match_and_merge_candidate(
-    candidate: Dict[str, Any], db: Session | None, provider: str
+    candidate: Dict[str, Any],
+    db: Session | None,
+    provider: str,
+    lookup: CatalogLookup | None = None,
 ) -> Dict[str, Any]:
-    if not db:
-        return candidate
+    if lookup is None:
+        if not db:
+            return candidate
+        lookup = DatabaseLookup(db)
 
     work_payload = candidate.get("work") or {}
     edition_payload = candidate.get("edition") or {}
@@ -24,38 +109,15 @@ def match_and_merge_candidate(
     existing_edition = None
 
     if external_id:
-        source_record = (
-            db.query(SourceRecord)
-            .filter(
-                SourceRecord.provider == provider, SourceRecord.external_id == external_id
-            )
-            .first()
-        )
-        if source_record:
-            if source_record.work_id:
-                existing_work = db.get(DocumentWork, source_record.work_id)
-            if source_record.edition_id:
-                existing_edition = db.get(DocumentEdition, source_record.edition_id)
+        existing_work, existing_edition = lookup.source_targets(provider, external_id)
 
     identifier = work_payload.get("identifier")
     if identifier and not existing_work:
-        normalized_identifier = _normalize_identifier(identifier)
-        existing_work = (
-            db.query(DocumentWork)
-            .filter(
-                func.replace(func.lower(DocumentWork.identifier), " ", "")
-                == normalized_identifier
-            )
-            .first()
-        )
+        existing_work = lookup.work_by_identifier(identifier)
 
     source_url = edition_payload.get("source_canonical_url")
     if source_url and not existing_edition:
-        existing_edition = (
-            db.query(DocumentEdition)
-            .filter(DocumentEdition.source_canonical_url == source_url)
-            .first()
-        )
+        existing_edition = lookup.edition_by_url(source_url)
 
     if existing_edition and not existing_work:
         existing_work = existing_edition.work
@@ -70,29 +132,19 @@ def match_and_merge_candidate(
         candidate["edition"] = edition_payload
 
     if existing_work and not existing_edition:
-        candidate_date = _parse_date(edition_payload.get("publication_date"))
-        matching_edition = (
-            db.query(DocumentEdition)
-            .filter(
-                DocumentEdition.work_id == existing_work.id,
-                DocumentEdition.edition_label == edition_payload.get("edition_label"),
-                DocumentEdition.publication_date == candidate_date,
-            )
-            .first()
+        candidate_date = parse_date(edition_payload.get("publication_date"))
+        matching_edition = lookup.work_edition(
+            existing_work, edition_payload.get("edition_label"), candidate_date
         )
         if not matching_edition:
-            related_source = _latest_source_for_work(db, existing_work.id, provider)
-            if related_source and related_source.external_id != external_id:
-                _append_relation(relations, related_source.external_id)
+            related_external_id = lookup.latest_source_external_id(existing_work, provider)
+            if related_external_id and related_external_id != external_id:
+                _append_relation(relations, related_external_id)
 
     return candidate
 
 
-def _normalize_identifier(value: str) -> str:
-    return value.strip().lower().replace(" ", "")
-
-
-def _parse_date(value: date | str | None) -> date | None:
+def parse_date(value: date | str | None) -> date | None:
     if isinstance(value, date):
         return value
     if isinstance(value, str) and value:
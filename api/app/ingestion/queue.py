@@ -0,0 +1,165 @@
+"""PostgreSQL-backed queue of ingestion runs.
+
+``IngestionRun`` rows are the jobs: the API inserts them as ``queued`` and
+worker processes (``python -m app.worker``) claim them with ``SELECT ...
+FOR UPDATE SKIP LOCKED``. A partial unique index allows one ``running``
+run per provider, so runs of the same provider never overlap.
+
+A claimed run is leased to its worker, which refreshes ``heartbeat_at``
+from a background thread. Runs whose heartbeat is older than the lease are
+put back in the queue (they resume from their checkpoint) or failed after
+``INGESTION_MAX_ATTEMPTS``; the previous owner notices at its next commit
+that the run is no longer its own and stops.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from sqlalchemy import and_, case, exists, func, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from app.ingestion.watermarks import incremental_since
+from app.models import IngestionRun
+
+logger = logging.getLogger(__name__)
+
+INGESTION_HEARTBEAT_SECONDS = float(os.getenv("INGESTION_HEARTBEAT_SECONDS", "15"))
+INGESTION_LEASE_SECONDS = float(os.getenv("INGESTION_LEASE_SECONDS", "120"))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "3"))
+
+QUEUED = "queued"
+RUNNING = "running"
+FAILED = "failed"
+
+
+class LeaseLost(RuntimeError):
+    """The run was reclaimed after its lease expired; its worker must stop."""
+
+
+def _utc_now():
+    # Timestamps in the table are naive UTC.
+    return func.timezone("utc", func.now())
+
+
+def claim_next_run(db: Session, worker_id: str) -> int | None:
+    """Lease the oldest queued run whose provider has nothing running, or return None.
+
+    The first claim fixes the run's start time and change window; later
+    attempts resume the same window from the checkpoint.
+    """
+    running = aliased(IngestionRun)
+    run = db.execute(
+        select(IngestionRun)
+        .where(
+            IngestionRun.status == QUEUED,
+            ~exists().where(
+                running.provider == IngestionRun.provider, running.status == RUNNING
+            ),
+        )
+        .order_by(IngestionRun.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).scalar_one_or_none()
+    if run is None:
+        db.rollback()
+        return None
+    if not run.attempts:
+        run.started_at = _utc_now()
+        run.since = incremental_since(db, run)
+    run.status = RUNNING
+    run.worker_id = worker_id
+    run.heartbeat_at = _utc_now()
+    run.attempts += 1
+    run.finished_at = None
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker started a run of the same provider concurrently.
+        db.rollback()
+        return None
+    return run.id
+
+
+def recover_expired_runs(db: Session) -> int:
+    """Requeue (or fail, past the attempt limit) running runs whose lease expired."""
+    expired = and_(
+        IngestionRun.status == RUNNING,
+        IngestionRun.heartbeat_at < _utc_now() - timedelta(seconds=INGESTION_LEASE_SECONDS),
+    )
+    exhausted = IngestionRun.attempts >= INGESTION_MAX_ATTEMPTS
+    result = db.execute(
+        update(IngestionRun)
+        .where(expired)
+        .values(
+            status=case((exhausted, FAILED), else_=QUEUED),
+            finished_at=case((exhausted, _utc_now()), else_=None),
+            error_message=case(
+                (exhausted, "Worker lease expired too many times"),
+                else_="Worker lease expired; requeued",
+            ),
+            worker_id=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount:
+        logger.warning("Recovered %d ingestion runs with expired leases", result.rowcount)
+    return result.rowcount
+
+
+def ensure_run_owner(db: Session, run: IngestionRun, worker_id: str | None) -> None:
+    """Lock ``run`` for the current transaction and check ``worker_id`` still holds it."""
+    if worker_id is None:
+        return
+    owner, status = db.execute(
+        select(IngestionRun.worker_id, IngestionRun.status)
+        .where(IngestionRun.id == run.id)
+        .with_for_update()
+    ).one()
+    if owner != worker_id or status != RUNNING:
+        raise LeaseLost(f"Ingestion run {run.id} is no longer leased to {worker_id}")
+
+
+class Heartbeat:
+    """Refreshes a run's lease from a background thread while the worker processes it."""
+
+    def __init__(self, engine: Engine, run_id: int, worker_id: str) -> None:
+        self.engine = engine
+        self.run_id = run_id
+        self.worker_id = worker_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._beat, name=f"heartbeat-{run_id}", daemon=True
+        )
+
+    def __enter__(self) -> "Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self) -> None:
+        while not self._stop.wait(INGESTION_HEARTBEAT_SECONDS):
+            try:
+                with self.engine.begin() as connection:
+                    beat = connection.execute(
+                        update(IngestionRun)
+                        .where(
+                            IngestionRun.id == self.run_id,
+                            IngestionRun.worker_id == self.worker_id,
+                            IngestionRun.status == RUNNING,
+                        )
+                        .values(heartbeat_at=_utc_now())
+                    )
+            except Exception:
+                logger.exception("Heartbeat failed for ingestion run %s", self.run_id)
+                continue
+            if not beat.rowcount:
+                return
@@ -0,0 +1,32 @@
+"""Reverse index from catalogue attributes to the lists that filter on them.
+
+Each list is indexed under the values of one of its filter dimensions (the
+most selective one present); an edition can only match the list if it
+carries one of those values, so catalogue changes only need to be checked
+against lists indexed under the changed editions' values. Lists with none
+of the indexed filters, or that expand related editions, are indexed under
+the wildcard key and are always candidates.
+"""
+from __future__ import annotations
+
+from typing import List, Tuple
+
+from app.schemas import ListFilters
+
+WILDCARD = "*"
+
+IndexKey = Tuple[str, str]
+
+
+def filter_index_keys(filters: ListFilters) -> List[IndexKey]:
+    if filters.include_related:
+        return [(WILDCARD, WILDCARD)]
+    for dimension, values in (
+        ("tag", filters.tag_ids),
+        ("discipline", filters.discipline_ids),
+        ("authority", filters.authority),
+        ("status", filters.status),
+    ):
+        if values:
+            return sorted({(dimension, str(value)) for value in values})
+    return [(WILDCARD, WILDCARD)]
@@ -1,62 +1,140 @@
 from __future__ import annotations
 
-from datetime import date, datetime
-import hashlib
-import json
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from email.utils import format_datetime
 from pathlib import Path
 from typing import Dict, List, Sequence
 from uuid import uuid4
 
-from fastapi import BackgroundTasks, Depends, FastAPI, File, HTTPException, Query, UploadFile
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, PlainTextResponse
-from sqlalchemy import and_, func, or_, select
-from sqlalchemy.orm import Session
-
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import (
+    Integer,
+    Text,
+    cast,
+    column,
+    func,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, aggregate_order_by
+from sqlalchemy.orm import Session, contains_eager, joinedload
+
+from app.cache import (
+    catalog_generation,
+    export_cache,
+    filter_cache_key,
+    filter_result_cache,
+)
+from app.catalog import (
+    build_search_query,
+    bump_list_versions,
+    bump_lists_containing,
+    edition_id_in,
+    insert_list_items,
+    maintain_dynamic_lists,
+    refresh_latest_in_force,
+    regenerate_items,
+    select_matching_edition_ids,
+)
 from app.db import SessionLocal, engine
+from app.events import InvalidationListener, publish
+from app.exports import EXPORT_WRITERS, render_export, stream_list_export
+from app.facets import FACET_FILTERS, facet_counts_statement
+from app.list_index import filter_index_keys
 from app.models import (
     DisciplineCategory,
     DocumentEdition,
     DocumentWork,
     EditionRelation,
     IngestionRun,
+    ListFilterKey,
+    ListRegeneration,
+    ListSnapshot,
     LocalAttachment,
     NormativeList,
     NormativeListItem,
-    SourceRecord,
+    ProviderWatermark,
     UserTag,
     WorkDiscipline,
     WorkTag,
 )
+from app.ingestion.queue import QUEUED
+from app.migrations import upgrade_schema
 from app.models import Base
+from app.pagination import SortKey, paginate
 from app.schemas import (
     AttachmentOut,
     DisciplineCreate,
     DisciplineOut,
     EditionCreate,
     EditionOut,
+    EditionPage,
     EditionUpdate,
+    FacetBucket,
     IngestionRunOut,
     IngestionStatus,
     ListCreate,
     ListFilters,
+    ListItemBatch,
+    ListItemBatchResult,
+    ListItemOperationResult,
     ListItemOut,
     ListItemUpdate,
     ListOut,
+    ListRegenerationOut,
     ListUpdate,
     ManualAddItem,
+    ProviderWatermarkOut,
     RelationCreate,
+    SearchFacets,
+    SearchPage,
+    SearchResult,
     TagCreate,
     TagOut,
     WorkCreate,
     WorkOut,
+    WorkPage,
     WorkUpdate,
 )
 from app.providers import get_provider
+from app.snapshots import (
+    frozen_lists,
+    is_frozen,
+    snapshot_export_rows,
+    snapshot_items_json,
+    sync_list_snapshot,
+)
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
-app = FastAPI(title="Standarr API")
+invalidation_listener = InvalidationListener(engine)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    invalidation_listener.start()
+    try:
+        yield
+    finally:
+        invalidation_listener.stop()
+
+
+app = FastAPI(title="Standarr API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -69,6 +147,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
 ATTACHMENTS_DIR = Path("/data/attachments")
 ATTACHMENTS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -97,6 +178,8 @@ def create_discipline(
 ) -> DisciplineCategory:
     discipline = DisciplineCategory(**payload.model_dump())
     db.add(discipline)
+    db.flush()
+    publish(db, "discipline", [discipline.id])
     db.commit()
     db.refresh(discipline)
     return discipline
@@ -115,13 +198,14 @@ def create_tag(payload: TagCreate, db: Session = Depends(get_db)) -> UserTag:
         return existing
     tag = UserTag(name=payload.name.strip(), normalized_name=normalized)
     db.add(tag)
+    db.flush()
+    publish(db, "tag", [tag.id])
     db.commit()
     db.refresh(tag)
     return tag
 
 
-@app.get("/api/works", response_model=List[WorkOut])
-def list_works(
+def query_filters(
     query: str | None = Query(default=None),
     authority: List[str] | None = Query(default=None),
     status: List[str] | None = Query(default=None),
@@ -135,9 +219,11 @@ def list_works(
     has_attachment: bool | None = Query(default=None),
     has_official_link: bool | None = Query(default=None),
     include_related: bool = Query(default=False),
-    db: Session = Depends(get_db),
-) -> List[DocumentWork]:
-    filters = ListFilters(
+    related_max_depth: int = Query(default=3, ge=1, le=10),
+    related_types: List[str] | None = Query(default=None),
+    related_min_confidence: float | None = Query(default=None, ge=0, le=1),
+) -> ListFilters:
+    return ListFilters(
         query=query,
         authority=authority,
         status=status,
@@ -151,20 +237,135 @@ def list_works(
         has_attachment=has_attachment,
         has_official_link=has_official_link,
         include_related=include_related,
+        related_max_depth=related_max_depth,
+        related_types=related_types,
+        related_min_confidence=related_min_confidence,
     )
-    editions_query = db.query(DocumentEdition).join(DocumentWork)
-    editions_query = apply_filters(editions_query, filters)
-    editions = editions_query.all()
-    edition_ids = expand_with_related_editions(db, editions, filters.include_related)
-    if not edition_ids:
-        return []
-    return (
-        db.query(DocumentWork)
-        .join(DocumentEdition)
-        .filter(DocumentEdition.id.in_(edition_ids))
-        .distinct()
-        .all()
+
+
+@app.get("/api/works", response_model=WorkPage)
+def list_works(
+    filters: ListFilters = Depends(query_filters),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(default=False),
+    db: Session = Depends(get_db),
+) -> WorkPage:
+    works_query = db.query(DocumentWork).filter(
+        DocumentWork.id.in_(
+            select(DocumentEdition.work_id).where(
+                DocumentEdition.id.in_(select_matching_edition_ids(filters))
+            )
+        )
+    )
+    total = works_query.count() if include_total else None
+    rows, next_cursor = _paginate(works_query, work_sort_keys(filters), cursor, limit)
+    return WorkPage(items=[work for work, in rows], next_cursor=next_cursor, total=total)
+
+
+@app.get("/api/search", response_model=SearchPage)
+def search_library(
+    filters: ListFilters = Depends(query_filters),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(default=False),
+    db: Session = Depends(get_db),
+) -> SearchPage:
+    """Library view: matching works with their matching editions in one query.
+
+    Editions are aggregated per work as JSON (newest first), so a page costs
+    a single round trip regardless of how many editions each work has.
+    """
+    matching_ids = select_matching_edition_ids(filters).cte("matching_editions")
+    edition_columns = [
+        DocumentEdition.id,
+        DocumentEdition.work_id,
+        DocumentEdition.edition_label,
+        DocumentEdition.publication_date,
+        DocumentEdition.status,
+        DocumentEdition.valid_from,
+        DocumentEdition.valid_to,
+        DocumentEdition.source_canonical_url,
+        DocumentEdition.created_at,
+        DocumentEdition.updated_at,
+    ]
+    edition_object = func.json_build_object(
+        *[part for column in edition_columns for part in (column.key, column)]
     )
+    editions_json = (
+        select(
+            func.json_agg(
+                aggregate_order_by(
+                    edition_object,
+                    DocumentEdition.publication_date.desc().nulls_last(),
+                    DocumentEdition.id.desc(),
+                )
+            )
+        )
+        .where(
+            DocumentEdition.work_id == DocumentWork.id,
+            DocumentEdition.id.in_(select(matching_ids.c.id)),
+        )
+        .scalar_subquery()
+    )
+    matching_work = DocumentWork.id.in_(
+        select(DocumentEdition.work_id).where(DocumentEdition.id.in_(select(matching_ids.c.id)))
+    )
+    total = db.query(DocumentWork).filter(matching_work).count() if include_total else None
+    works_query = (
+        db.query(DocumentWork, DisciplineCategory, editions_json)
+        .outerjoin(DocumentWork.primary_discipline)
+        .filter(matching_work)
+    )
+    rows, next_cursor = _paginate(works_query, work_sort_keys(filters), cursor, limit)
+    items = []
+    for work, discipline, editions in rows:
+        editions = editions or []
+        items.append(
+            SearchResult(
+                work=work,
+                primary_discipline=discipline,
+                latest_edition=editions[0] if editions else None,
+                editions=editions,
+            )
+        )
+    return SearchPage(items=items, next_cursor=next_cursor, total=total)
+
+
+@app.get("/api/search/facets", response_model=SearchFacets)
+def search_facets(
+    filters: ListFilters = Depends(query_filters), db: Session = Depends(get_db)
+) -> SearchFacets:
+    """Edition counts per facet value for the filter sidebar (see app.facets).
+
+    Counts are read from the maintained facet aggregate. Each facet is
+    counted with all filters except its own. Related-edition expansion is
+    not applied to counts.
+    """
+    work_ids = None
+    tsquery = build_search_query(filters.query)
+    if tsquery is not None:
+        work_ids = select(DocumentWork.id).where(DocumentWork.search_vector.op("@@")(tsquery))
+
+    parsers = {
+        "primary_discipline": int,
+        "secondary_discipline": int,
+        "tag": int,
+        "has_attachment": lambda value: value == "true",
+        "has_official_link": lambda value: value == "true",
+    }
+    total = 0
+    buckets: Dict[str, List[FacetBucket]] = {facet: [] for facet in FACET_FILTERS}
+    for facet, value, count in db.execute(facet_counts_statement(filters, work_ids)):
+        if facet == "total":
+            total = count
+            continue
+        if value is not None and facet in parsers:
+            value = parsers[facet](value)
+        buckets[facet].append(FacetBucket(value=value, count=count))
+    for facet_buckets in buckets.values():
+        facet_buckets.sort(key=lambda bucket: -bucket.count)
+    return SearchFacets(total=total, **buckets)
 
 
 @app.get("/api/works/{work_id}", response_model=WorkOut)
@@ -190,6 +391,7 @@ def create_work(payload: WorkCreate, db: Session = Depends(get_db)) -> DocumentW
         db.add(WorkDiscipline(work_id=work.id, discipline_id=discipline_id))
     for tag_id in payload.tag_ids:
         db.add(WorkTag(work_id=work.id, tag_id=tag_id))
+    publish(db, "work", [work.id])
     db.commit()
     db.refresh(work)
     return work
@@ -215,6 +417,9 @@ def update_work(
         db.query(WorkTag).filter(WorkTag.work_id == work_id).delete()
         for tag_id in tag_ids:
             db.add(WorkTag(work_id=work_id, tag_id=tag_id))
+    bump_lists_containing(db, [edition.id for edition in work.editions])
+    maintain_dynamic_lists(db, [], work_ids=[work_id])
+    publish(db, "work", [work_id])
     db.commit()
     db.refresh(work)
     return work
@@ -227,6 +432,7 @@ def delete_work(work_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
         raise HTTPException(status_code=404, detail="Work not found")
     edition_ids = [edition.id for edition in work.editions]
     if edition_ids:
+        bump_lists_containing(db, edition_ids)
         db.query(LocalAttachment).filter(LocalAttachment.edition_id.in_(edition_ids)).delete()
         db.query(EditionRelation).filter(
             or_(
@@ -241,6 +447,9 @@ def delete_work(work_id: int, db: Session = Depends(get_db)) -> dict[str, str]:
     db.query(WorkDiscipline).filter(WorkDiscipline.work_id == work_id).delete()
     db.query(WorkTag).filter(WorkTag.work_id == work_id).delete()
     db.delete(work)
+    maintain_dynamic_lists(db, edition_ids)
+    publish(db, "work", [work_id])
+    publish(db, "edition", edition_ids)
     db.commit()
     return {"status": "deleted"}
 
@@ -253,51 +462,37 @@ def get_edition(edition_id: int, db: Session = Depends(get_db)) -> DocumentEditi
     return edition
 
 
-@app.get("/api/editions", response_model=List[EditionOut])
+@app.get("/api/editions", response_model=EditionPage)
 def list_editions(
-    query: str | None = Query(default=None),
+    filters: ListFilters = Depends(query_filters),
     work_id: int | None = Query(default=None),
-    authority: List[str] | None = Query(default=None),
-    status: List[str] | None = Query(default=None),
-    publication_date_from: date | None = Query(default=None),
-    publication_date_to: date | None = Query(default=None),
-    updated_from: datetime | None = Query(default=None),
-    updated_to: datetime | None = Query(default=None),
-    discipline_ids: List[int] | None = Query(default=None),
-    tag_ids: List[int] | None = Query(default=None),
-    only_latest_in_force: bool = Query(default=False),
-    has_attachment: bool | None = Query(default=None),
-    has_official_link: bool | None = Query(default=None),
-    include_related: bool = Query(default=False),
+    cursor: str | None = Query(default=None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include_total: bool = Query(default=False),
     db: Session = Depends(get_db),
-) -> List[DocumentEdition]:
-    filters = ListFilters(
-        query=query,
-        authority=authority,
-        status=status,
-        publication_date_from=publication_date_from,
-        publication_date_to=publication_date_to,
-        updated_from=updated_from,
-        updated_to=updated_to,
-        discipline_ids=discipline_ids,
-        tag_ids=tag_ids,
-        only_latest_in_force=only_latest_in_force,
-        has_attachment=has_attachment,
-        has_official_link=has_official_link,
-        include_related=include_related,
-    )
-    query_set = db.query(DocumentEdition).join(DocumentWork)
-    if work_id is not None:
-        query_set = query_set.filter(DocumentEdition.work_id == work_id)
-    query_set = apply_filters(query_set, filters)
-    editions = query_set.all()
-    edition_ids = expand_with_related_editions(db, editions, filters.include_related)
-    if not edition_ids:
-        return []
-    return (
+) -> EditionPage:
+    editions_query = (
         db.query(DocumentEdition)
-        .filter(DocumentEdition.id.in_(edition_ids))
-        .all()
+        .join(DocumentEdition.work)
+        .filter(DocumentEdition.id.in_(select_matching_edition_ids(filters, work_id=work_id)))
+    )
+    total = None
+    if include_total:
+        if work_id is None:
+            total = len(resolve_matching_edition_ids(db, filters))
+        else:
+            total = editions_query.count()
+    rank = search_rank(filters)
+    if rank is not None:
+        sort_keys = [SortKey(rank, descending=True), SortKey(DocumentEdition.id, descending=True)]
+    else:
+        sort_keys = [
+            SortKey(DocumentEdition.publication_date, descending=True),
+            SortKey(DocumentEdition.id, descending=True),
+        ]
+    rows, next_cursor = _paginate(editions_query, sort_keys, cursor, limit)
+    return EditionPage(
+        items=[edition for edition, in rows], next_cursor=next_cursor, total=total
     )
 
 
@@ -307,6 +502,10 @@ def create_edition(
 ) -> DocumentEdition:
     edition = DocumentEdition(**payload.model_dump())
     db.add(edition)
+    db.flush()
+    refresh_latest_in_force(db, [edition.work_id])
+    maintain_dynamic_lists(db, [edition.id])
+    publish(db, "edition", [edition.id])
     db.commit()
     db.refresh(edition)
     return edition
@@ -321,6 +520,10 @@ def update_edition(
         raise HTTPException(status_code=404, detail="Edition not found")
     for key, value in payload.model_dump(exclude_unset=True).items():
         setattr(edition, key, value)
+    refresh_latest_in_force(db, [edition.work_id])
+    bump_lists_containing(db, [edition_id])
+    maintain_dynamic_lists(db, [edition_id])
+    publish(db, "edition", [edition_id])
     db.commit()
     db.refresh(edition)
     return edition
@@ -338,8 +541,12 @@ def delete_edition(edition_id: int, db: Session = Depends(get_db)) -> dict[str,
             EditionRelation.to_edition_id == edition_id,
         )
     ).delete()
+    bump_lists_containing(db, [edition_id])
     db.query(NormativeListItem).filter(NormativeListItem.edition_id == edition_id).delete()
     db.delete(edition)
+    refresh_latest_in_force(db, [edition.work_id])
+    maintain_dynamic_lists(db, [edition_id], work_ids=[edition.work_id])
+    publish(db, "edition", [edition_id])
     db.commit()
     return {"status": "deleted"}
 
@@ -350,106 +557,56 @@ def create_relation(
 ) -> dict[str, int]:
     relation = EditionRelation(**payload.model_dump())
     db.add(relation)
+    db.flush()
+    maintain_dynamic_lists(db, [relation.from_edition_id, relation.to_edition_id])
+    publish(db, "relation", [relation.id])
     db.commit()
     return {"id": relation.id}
 
 
-def apply_filters(query, filters: ListFilters):
-    if filters.query:
-        like_term = f"%{filters.query.strip()}%"
-        query = query.filter(
-            or_(
-                DocumentWork.title.ilike(like_term),
-                DocumentWork.identifier.ilike(like_term),
-                DocumentWork.abstract.ilike(like_term),
-            )
-        )
-    if filters.authority:
-        query = query.filter(DocumentWork.authority.in_(filters.authority))
-    if filters.status:
-        query = query.filter(DocumentEdition.status.in_(filters.status))
-    if filters.publication_date_from:
-        query = query.filter(DocumentEdition.publication_date >= filters.publication_date_from)
-    if filters.publication_date_to:
-        query = query.filter(DocumentEdition.publication_date <= filters.publication_date_to)
-    if filters.updated_from:
-        query = query.filter(DocumentEdition.updated_at >= filters.updated_from)
-    if filters.updated_to:
-        query = query.filter(DocumentEdition.updated_at <= filters.updated_to)
-    if filters.discipline_ids:
-        query = query.outerjoin(WorkDiscipline).filter(
-            or_(
-                DocumentWork.primary_discipline_id.in_(filters.discipline_ids),
-                WorkDiscipline.discipline_id.in_(filters.discipline_ids),
-            )
-        )
-    if filters.tag_ids:
-        query = query.join(WorkTag).filter(WorkTag.tag_id.in_(filters.tag_ids))
-    if filters.has_attachment is True:
-        query = query.join(LocalAttachment)
-    if filters.has_attachment is False:
-        query = query.outerjoin(LocalAttachment).filter(LocalAttachment.id.is_(None))
-    if filters.has_official_link is True:
-        query = query.filter(DocumentEdition.source_canonical_url.is_not(None))
-    if filters.has_official_link is False:
-        query = query.filter(DocumentEdition.source_canonical_url.is_(None))
-    if filters.only_latest_in_force:
-        subq = (
-            select(
-                DocumentEdition.work_id,
-                func.max(DocumentEdition.publication_date).label("max_pub"),
-            )
-            .where(DocumentEdition.status == "in_force")
-            .group_by(DocumentEdition.work_id)
-            .subquery()
-        )
-        query = query.join(
-            subq,
-            and_(
-                DocumentEdition.work_id == subq.c.work_id,
-                DocumentEdition.publication_date == subq.c.max_pub,
-            ),
-        )
-    return query
+def search_rank(filters: ListFilters):
+    tsquery = build_search_query(filters.query)
+    if tsquery is None:
+        return None
+    # Widened to double precision so the value survives a keyset cursor round trip.
+    return cast(func.ts_rank(DocumentWork.search_vector, tsquery), DOUBLE_PRECISION)
 
 
-def expand_with_related_editions(
-    db: Session, editions: Sequence[DocumentEdition], include_related: bool
-) -> List[int]:
-    edition_ids = {edition.id for edition in editions}
-    if not include_related or not edition_ids:
-        return list(edition_ids)
-    relations = (
-        db.query(EditionRelation)
-        .filter(
-            or_(
-                EditionRelation.from_edition_id.in_(edition_ids),
-                EditionRelation.to_edition_id.in_(edition_ids),
-            )
-        )
-        .all()
-    )
-    for relation in relations:
-        edition_ids.add(relation.from_edition_id)
-        edition_ids.add(relation.to_edition_id)
-    return list(edition_ids)
-
-
-def build_list_items(
-    db: Session, list_id: int, editions: List[DocumentEdition]
-) -> None:
-    for edition in editions:
-        work = edition.work
-        secondary_ids = [wd.discipline_id for wd in work.secondary_disciplines]
-        item = NormativeListItem(
-            list_id=list_id,
-            edition_id=edition.id,
-            included=True,
-            reason="auto",
-            primary_discipline_id_at_time=work.primary_discipline_id,
-            secondary_discipline_ids_at_time=secondary_ids,
-        )
-        db.add(item)
+def resolve_matching_edition_ids(db: Session, filters: ListFilters) -> Sequence[int]:
+    """Sorted ids of editions matching ``filters``, served from the filter cache when fresh."""
+    key = filter_cache_key(filters)
+    cached = filter_result_cache.get(key)
+    if cached is not None:
+        return cached
+    generation = catalog_generation()
+    edition_ids = db.scalars(select_matching_edition_ids(filters)).all()
+    return filter_result_cache.put(key, generation, edition_ids)
+
+
+def work_sort_keys(filters: ListFilters) -> List[SortKey]:
+    rank = search_rank(filters)
+    if rank is not None:
+        return [SortKey(rank, descending=True), SortKey(DocumentWork.id)]
+    return [SortKey(DocumentWork.identifier), SortKey(DocumentWork.id)]
+
+
+def _paginate(query, sort_keys: List[SortKey], cursor: str | None, limit: int):
+    try:
+        return paginate(query, sort_keys, cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+# Loads an edition's work and secondary disciplines in the same round trips
+# as the editions, for code that snapshots them into list items.
+ITEM_SNAPSHOT_LOAD = joinedload(DocumentEdition.work).selectinload(
+    DocumentWork.secondary_disciplines
+)
+
+# Populates ``item.edition.work`` from the joins of a list items query.
+ITEM_EDITION_EAGER = contains_eager(NormativeListItem.edition).contains_eager(
+    DocumentEdition.work
+)
 
 
 @app.post("/api/lists", response_model=ListOut)
@@ -463,22 +620,15 @@ def create_list(payload: ListCreate, db: Session = Depends(get_db)) -> Normative
     )
     db.add(normative_list)
     db.flush()
+    for dimension, value in filter_index_keys(payload.filters):
+        db.add(ListFilterKey(list_id=normative_list.id, dimension=dimension, value=value))
 
-    query = db.query(DocumentEdition).join(DocumentWork)
-    query = apply_filters(query, payload.filters)
-    editions = query.all()
-    edition_ids = expand_with_related_editions(
-        db, editions, payload.filters.include_related
+    insert_list_items(
+        db,
+        normative_list.id,
+        edition_id_in(resolve_matching_edition_ids(db, payload.filters)),
     )
-    if edition_ids:
-        editions = (
-            db.query(DocumentEdition)
-            .filter(DocumentEdition.id.in_(edition_ids))
-            .all()
-        )
-    else:
-        editions = []
-    build_list_items(db, normative_list.id, editions)
+    sync_list_snapshot(db, normative_list)
 
     db.commit()
     db.refresh(normative_list)
@@ -502,83 +652,91 @@ def update_list(
         raise HTTPException(status_code=404, detail="List not found")
     for key, value in payload.model_dump(exclude_unset=True).items():
         setattr(normative_list, key, value)
+    sync_list_snapshot(db, normative_list)
+    bump_list_versions(db, NormativeList.id == list_id)
     db.commit()
     db.refresh(normative_list)
     return normative_list
 
 
-@app.post("/api/lists/{list_id}/regenerate", response_model=ListOut)
-def regenerate_list(list_id: int, db: Session = Depends(get_db)) -> NormativeList:
+def get_mutable_list(db: Session, list_id: int) -> NormativeList:
+    """Load a list whose items may be changed; frozen lists are read-only."""
     normative_list = db.get(NormativeList, list_id)
     if not normative_list:
         raise HTTPException(status_code=404, detail="List not found")
+    if is_frozen(normative_list):
+        raise HTTPException(status_code=409, detail="List is frozen")
+    return normative_list
 
-    filters = ListFilters(**normative_list.source_filter_json)
-    query = db.query(DocumentEdition).join(DocumentWork)
-    query = apply_filters(query, filters)
-    editions = query.all()
-    edition_ids = expand_with_related_editions(db, editions, filters.include_related)
-    if edition_ids:
-        editions = (
-            db.query(DocumentEdition)
-            .filter(DocumentEdition.id.in_(edition_ids))
-            .all()
-        )
-    else:
-        editions = []
 
-    existing_items = (
-        db.query(NormativeListItem)
-        .filter(NormativeListItem.list_id == list_id)
-        .all()
-    )
-    existing_by_edition = {item.edition_id: item for item in existing_items}
-    new_edition_ids = {edition.id for edition in editions}
+@app.post("/api/lists/{list_id}/regenerate", response_model=ListRegenerationOut)
+def regenerate_list(list_id: int, db: Session = Depends(get_db)) -> ListRegenerationOut:
+    """Re-run the list's filters and record the resulting diff."""
+    normative_list = get_mutable_list(db, list_id)
 
-    for edition in editions:
-        if edition.id in existing_by_edition:
-            continue
-        work = edition.work
-        secondary_ids = [wd.discipline_id for wd in work.secondary_disciplines]
-        db.add(
-            NormativeListItem(
-                list_id=list_id,
-                edition_id=edition.id,
-                included=True,
-                reason="auto",
-                primary_discipline_id_at_time=work.primary_discipline_id,
-                secondary_discipline_ids_at_time=secondary_ids,
-            )
-        )
+    filters = ListFilters(**normative_list.source_filter_json)
+    regeneration = regenerate_items(
+        db,
+        list_id,
+        resolve_matching_edition_ids(db, filters),
+        reset_overrides=not normative_list.preserve_overrides,
+    )
+    regeneration.source = "manual"
+    db.add(regeneration)
+    db.flush()
+    # Read before the commit expires it: the insert already returned every column.
+    response = ListRegenerationOut.model_validate(regeneration)
+    if (
+        regeneration.added_edition_ids
+        or regeneration.removed_edition_ids
+        or regeneration.overrides_reset
+    ):
+        bump_list_versions(db, NormativeList.id == list_id)
+    db.commit()
+    return response
 
-    for item in existing_items:
-        if item.edition_id not in new_edition_ids and item.reason == "auto":
-            db.delete(item)
-            continue
-        if not normative_list.preserve_overrides and item.reason in {
-            "manual_exclude",
-            "manual_include",
-        }:
-            if item.edition_id in new_edition_ids:
-                item.included = True
-                item.reason = "auto"
-            else:
-                db.delete(item)
 
-    db.commit()
-    db.refresh(normative_list)
-    return normative_list
+@app.get(
+    "/api/lists/{list_id}/regenerations", response_model=List[ListRegenerationOut]
+)
+def list_regenerations(
+    list_id: int, db: Session = Depends(get_db)
+) -> List[ListRegeneration]:
+    normative_list = db.get(NormativeList, list_id)
+    if not normative_list:
+        raise HTTPException(status_code=404, detail="List not found")
+    return (
+        db.query(ListRegeneration)
+        .filter(ListRegeneration.list_id == list_id)
+        .order_by(ListRegeneration.regenerated_at.desc(), ListRegeneration.id.desc())
+        .all()
+    )
 
 
 @app.get("/api/lists/{list_id}/items", response_model=List[ListItemOut])
 def list_items(list_id: int, db: Session = Depends(get_db)) -> List[NormativeListItem]:
+    """Items of the list with their edition and work.
+
+    A frozen list returns its snapshot as a raw ``Response``, which bypasses
+    ``response_model``: the snapshot rows were serialised through
+    ``ListItemOut`` when the snapshot was written (see app.snapshots).
+    """
     normative_list = db.get(NormativeList, list_id)
     if not normative_list:
         raise HTTPException(status_code=404, detail="List not found")
+    if is_frozen(normative_list):
+        snapshot_items = db.scalar(
+            select(ListSnapshot.items).where(ListSnapshot.list_id == list_id)
+        )
+        if snapshot_items is not None:
+            return Response(
+                content=snapshot_items_json(snapshot_items), media_type="application/json"
+            )
     return (
         db.query(NormativeListItem)
         .join(NormativeListItem.edition)
         .join(DocumentEdition.work)
+        .options(ITEM_EDITION_EAGER)
         .filter(NormativeListItem.list_id == list_id)
         .order_by(NormativeListItem.added_at)
         .all()
@@ -589,6 +747,7 @@ def list_items(list_id: int, db: Session = Depends(get_db)) -> List[NormativeLis
 def include_item(
     list_id: int, item_id: int, db: Session = Depends(get_db)
 ) -> dict[str, str]:
+    get_mutable_list(db, list_id)
     item = (
         db.query(NormativeListItem)
         .filter(
@@ -601,6 +760,7 @@ def include_item(
         raise HTTPException(status_code=404, detail="List item not found")
     item.included = True
     item.reason = "manual_include"
+    bump_list_versions(db, NormativeList.id == list_id)
     db.commit()
     return {"status": "included"}
 
@@ -609,6 +769,7 @@ def include_item(
 def exclude_item(
     list_id: int, item_id: int, db: Session = Depends(get_db)
 ) -> dict[str, str]:
+    get_mutable_list(db, list_id)
     item = (
         db.query(NormativeListItem)
         .filter(
@@ -621,6 +782,7 @@ def exclude_item(
         raise HTTPException(status_code=404, detail="List item not found")
     item.included = False
     item.reason = "manual_exclude"
+    bump_list_versions(db, NormativeList.id == list_id)
     db.commit()
     return {"status": "excluded"}
 
@@ -629,10 +791,13 @@ def exclude_item(
 def manual_add_item(
     list_id: int, payload: ManualAddItem, db: Session = Depends(get_db)
 ) -> dict[str, int]:
-    normative_list = db.get(NormativeList, list_id)
-    if not normative_list:
-        raise HTTPException(status_code=404, detail="List not found")
-    edition = db.get(DocumentEdition, payload.edition_id)
+    get_mutable_list(db, list_id)
+    edition = (
+        db.query(DocumentEdition)
+        .options(ITEM_SNAPSHOT_LOAD)
+        .filter(DocumentEdition.id == payload.edition_id)
+        .first()
+    )
     if not edition:
         raise HTTPException(status_code=404, detail="Edition not found")
     work = edition.work
@@ -647,8 +812,11 @@ def manual_add_item(
         secondary_discipline_ids_at_time=secondary_ids,
     )
     db.add(item)
+    db.flush()
+    item_id = item.id
+    bump_list_versions(db, NormativeList.id == list_id)
     db.commit()
-    return {"id": item.id}
+    return {"id": item_id}
 
 
 @app.patch("/api/lists/{list_id}/items/{item_id}")
@@ -658,6 +826,7 @@ def update_item_note(
     payload: ListItemUpdate,
     db: Session = Depends(get_db),
 ) -> dict[str, str]:
+    get_mutable_list(db, list_id)
     item = (
         db.query(NormativeListItem)
         .filter(
@@ -670,21 +839,119 @@ def update_item_note(
         raise HTTPException(status_code=404, detail="List item not found")
     if payload.note is not None:
         item.note = payload.note
+    bump_list_versions(db, NormativeList.id == list_id)
     db.commit()
     return {"status": "updated"}
 
 
-def format_export_line(item: NormativeListItem, discipline_name: str) -> str:
-    edition = item.edition
-    work = edition.work
-    pub_date = edition.publication_date.isoformat() if edition.publication_date else "n.d."
-    status = edition.status
-    return (
-        f"- {work.identifier} — {work.title} (Ed. {edition.edition_label}, "
-        f"Pub. {pub_date}) [{work.authority}] {status}\n"
-        + (f"  Note: {item.note}\n" if item.note else "")
+@app.post("/api/lists/{list_id}/items/batch", response_model=ListItemBatchResult)
+def batch_update_items(
+    list_id: int, payload: ListItemBatch, db: Session = Depends(get_db)
+) -> ListItemBatchResult:
+    """Apply many include/exclude/note/manual_add operations in one transaction.
+
+    Operations are resolved in order (the last include/exclude and the last
+    note for an item win) and then applied with one statement per kind.
+    Operations on items or editions that do not exist, or adding an edition
+    already in the list, are reported in the results and skipped.
+    """
+    get_mutable_list(db, list_id)
+    operations = payload.operations
+    in_list = NormativeListItem.list_id == list_id
+    item_ids = [op.item_id for op in operations if op.op != "manual_add" and op.item_id]
+    edition_ids = [op.edition_id for op in operations if op.op == "manual_add" and op.edition_id]
+    existing_items = set(
+        db.scalars(
+            select(NormativeListItem.id).where(
+                in_list, edition_id_in(item_ids, NormativeListItem.id)
+            )
+        )
+    )
+    existing_editions = set(db.scalars(select(DocumentEdition.id).where(edition_id_in(edition_ids))))
+    listed = dict(
+        db.execute(
+            select(NormativeListItem.edition_id, NormativeListItem.id).where(
+                in_list, edition_id_in(edition_ids, NormativeListItem.edition_id)
+            )
+        ).all()
     )
 
+    results: List[ListItemOperationResult] = []
+    included: Dict[int, bool] = {}
+    notes: Dict[int, str | None] = {}
+    additions: Dict[int, str | None] = {}
+    added_results: List[tuple[int, ListItemOperationResult]] = []
+    for index, operation in enumerate(operations):
+        result = ListItemOperationResult(
+            index=index, op=operation.op, status="ok", item_id=operation.item_id
+        )
+        results.append(result)
+        if operation.op == "manual_add":
+            edition_id = operation.edition_id
+            if edition_id is None:
+                result.status = "invalid"
+            elif edition_id not in existing_editions:
+                result.status = "not_found"
+            elif edition_id in listed:
+                result.status = "already_listed"
+                result.item_id = listed[edition_id]
+            else:
+                if edition_id in additions:
+                    result.status = "already_listed"
+                else:
+                    additions[edition_id] = operation.note
+                added_results.append((edition_id, result))
+        elif operation.item_id is None or (
+            operation.op == "note" and "note" not in operation.model_fields_set
+        ):
+            result.status = "invalid"
+        elif operation.item_id not in existing_items:
+            result.status = "not_found"
+        elif operation.op == "note":
+            notes[operation.item_id] = operation.note
+        else:
+            included[operation.item_id] = operation.op == "include"
+
+    for value, reason in ((True, "manual_include"), (False, "manual_exclude")):
+        ids = [item_id for item_id, state in included.items() if state is value]
+        if ids:
+            db.execute(
+                update(NormativeListItem)
+                .where(in_list, edition_id_in(ids, NormativeListItem.id))
+                .values(included=value, reason=reason)
+                .execution_options(synchronize_session=False)
+            )
+    if additions:
+        insert_list_items(db, list_id, edition_id_in(list(additions)), reason="manual_include")
+        added = dict(
+            db.execute(
+                select(NormativeListItem.edition_id, NormativeListItem.id).where(
+                    in_list, edition_id_in(list(additions), NormativeListItem.edition_id)
+                )
+            ).all()
+        )
+        for edition_id, result in added_results:
+            result.item_id = added[edition_id]
+        for edition_id, note in additions.items():
+            if note is not None:
+                notes.setdefault(added[edition_id], note)
+    if notes:
+        rows = values(
+            column("id", Integer), column("note", Text), name="batch_notes"
+        ).data(list(notes.items()))
+        db.execute(
+            update(NormativeListItem)
+            .where(NormativeListItem.id == rows.c.id)
+            .values(note=rows.c.note)
+            .execution_options(synchronize_session=False)
+        )
+
+    applied = sum(result.status == "ok" for result in results)
+    if applied:
+        bump_list_versions(db, NormativeList.id == list_id)
+    db.commit()
+    return ListItemBatchResult(applied=applied, failed=len(results) - applied, results=results)
+
 
 def calculate_sha256(payload: bytes) -> str:
     import hashlib
@@ -697,64 +964,91 @@ def sanitize_filename(filename: str) -> str:
     return sanitized or f"attachment-{uuid4().hex}"
 
 
-@app.get("/api/lists/{list_id}/export/txt", response_class=PlainTextResponse)
-def export_list_txt(list_id: int, db: Session = Depends(get_db)) -> str:
-    normative_list = db.get(NormativeList, list_id)
-    if not normative_list:
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """Whether ``If-None-Match`` names ``etag``.
+
+    ``If-Modified-Since`` is not honoured: ``Last-Modified`` has whole-second
+    precision, so a change made in the same second as the copy the client
+    holds would look unmodified.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    return if_none_match is not None and _etag_matches(if_none_match, etag)
+
+
+@app.get("/api/lists/{list_id}/export/{export_format}", response_class=PlainTextResponse)
+def export_list(
+    list_id: int, export_format: str, request: Request, db: Session = Depends(get_db)
+) -> Response:
+    """Stream a list export as ``txt``, ``csv``, ``ndjson`` or ``xlsx``.
+
+    Responses carry a weak ``ETag`` built from the list's content version and
+    the last discipline change, and a UTC ``Last-Modified``; ``If-None-Match``
+    requests for an unchanged list get a 304 and repeated renders are served
+    from ``export_cache``. Frozen lists render from their snapshot.
+    """
+    writer_class = EXPORT_WRITERS.get(export_format)
+    if writer_class is None:
+        raise HTTPException(status_code=404, detail="Unknown export format")
+    state = db.execute(
+        select(
+            NormativeList.content_version,
+            NormativeList.content_updated_at,
+            # Stored in the session time zone; converted to UTC like content_updated_at.
+            select(
+                func.timezone(
+                    "utc",
+                    func.timezone(
+                        func.current_setting("TimeZone"), func.max(DisciplineCategory.updated_at)
+                    ),
+                )
+            ).scalar_subquery(),
+            frozen_lists(),
+        ).where(NormativeList.id == list_id)
+    ).first()
+    if not state:
         raise HTTPException(status_code=404, detail="List not found")
-
-    items = (
-        db.query(NormativeListItem)
-        .join(NormativeListItem.edition)
-        .join(DocumentEdition.work)
-        .filter(NormativeListItem.list_id == list_id, NormativeListItem.included.is_(True))
-        .all()
+    content_version, content_updated_at, disciplines_updated_at, frozen = state
+    last_modified = max(filter(None, (content_updated_at, disciplines_updated_at)))
+    disciplines_stamp = (
+        int(disciplines_updated_at.timestamp() * 1_000_000) if disciplines_updated_at else 0
     )
-
-    disciplines = {
-        d.id: d
-        for d in db.query(DisciplineCategory).order_by(DisciplineCategory.sort_order).all()
+    etag = f'W/"{list_id}-{content_version}-{disciplines_stamp}-{export_format}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "no-cache",
     }
-
-    sections: Dict[int, Dict[str, List[str]]] = {}
-    for item in items:
-        primary_id = item.primary_discipline_id_at_time
-        if primary_id is None:
-            continue
-        sections.setdefault(primary_id, {"primary": [], "references": []})
-        sections[primary_id]["primary"].append(
-            format_export_line(item, disciplines[primary_id].name)
+    if writer_class.attachment:
+        filename = f"elenco-{list_id}.{writer_class.extension}"
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    cache_key = (list_id, export_format, etag)
+    cached = export_cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type=writer_class.media_type, headers=headers)
+    snapshot_rows = None
+    if frozen:
+        snapshot_rows = db.scalar(
+            select(ListSnapshot.export_rows).where(ListSnapshot.list_id == list_id)
         )
-        for secondary_id in item.secondary_discipline_ids_at_time or []:
-            if secondary_id == primary_id:
-                continue
-            sections.setdefault(secondary_id, {"primary": [], "references": []})
-            primary_name = disciplines.get(primary_id).name if disciplines.get(primary_id) else "N/D"
-            sections[secondary_id]["references"].append(
-                f"- {item.edition.work.identifier} — vedi disciplina primaria: {primary_name}\n"
-            )
-
-    header = [
-        "Standarr – Elenco Normative",
-        f"Nome elenco: {normative_list.name}",
-        f"Generato: {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
-        f"Modalità: {normative_list.regeneration_mode}",
-        f"Criteri (snapshot): {normative_list.source_filter_json}",
-        "",
-    ]
-
-    body: List[str] = []
-    for discipline_id, discipline in disciplines.items():
-        if discipline_id not in sections:
-            continue
-        body.append(f"== {discipline.name.upper()} ==")
-        body.append("[Norme]")
-        body.extend(sections[discipline_id]["primary"] or ["- (nessuna)\n"])
-        body.append("[Riferimenti]")
-        body.extend(sections[discipline_id]["references"] or ["- (nessuno)\n"])
-        body.append("")
-
-    return "\n".join(header + body)
+    if snapshot_rows is not None:
+        chunks = render_export(
+            writer_class(), db.get(NormativeList, list_id), snapshot_export_rows(snapshot_rows)
+        )
+    else:
+        chunks = stream_list_export(list_id, writer_class())
+    return StreamingResponse(
+        export_cache.tee(cache_key, chunks),
+        media_type=writer_class.media_type,
+        headers=headers,
+    )
 
 
 @app.get("/api/editions/{edition_id}/attachments", response_model=List[AttachmentOut])
@@ -805,6 +1099,9 @@ def upload_attachment(
         storage_path=str(storage_path),
     )
     db.add(attachment)
+    db.flush()
+    maintain_dynamic_lists(db, [edition_id])
+    publish(db, "attachment", [attachment.id])
     db.commit()
     db.refresh(attachment)
     return attachment
@@ -833,128 +1130,59 @@ def delete_attachment(attachment_id: int, db: Session = Depends(get_db)) -> dict
     if storage_path.exists():
         storage_path.unlink()
     db.delete(attachment)
+    maintain_dynamic_lists(db, [attachment.edition_id])
+    publish(db, "attachment", [attachment_id])
     db.commit()
     return {"status": "deleted"}
 
 
 def enqueue_ingestion(
-    provider: str, background_tasks: BackgroundTasks, db: Session
+    provider: str, db: Session, force: bool = False, full_resync: bool = False
 ) -> int:
+    """Queue a run of ``provider`` for the ingestion workers (``python -m app.worker``)."""
     try:
         get_provider(provider)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    run = IngestionRun(provider=provider, status="running", started_at=datetime.utcnow())
+    run = IngestionRun(
+        provider=provider,
+        status=QUEUED,
+        started_at=datetime.utcnow(),
+        force_refresh=force,
+        full_resync=full_resync,
+    )
     db.add(run)
     db.commit()
     db.refresh(run)
-    background_tasks.add_task(_run_ingestion_job, provider, run.id)
     return run.id
 
 
-def _run_ingestion_job(provider: str, run_id: int) -> None:
-    db = SessionLocal()
-    ingested = 0
-    try:
-        provider_module = get_provider(provider)
-        run = db.get(IngestionRun, run_id)
-        if not run:
-            return
-        previous_run = (
-            db.query(IngestionRun)
-            .filter(IngestionRun.id != run_id)
-            .order_by(IngestionRun.started_at.desc())
-            .first()
-        )
-        since = previous_run.started_at if previous_run else None
-
-        records = provider_module.fetch_changes(since)
-        try:
-            for record in records:
-                normalized = provider_module.normalize(record, db=db)
-                candidate = provider_module.match_and_merge(normalized, db=db)
-                work_payload = candidate["work"]
-                edition_payload = candidate["edition"]
-                external_id = candidate["external_id"]
-
-                work = _upsert_work(db, work_payload)
-                edition = _upsert_edition(db, work, edition_payload)
-
-                payload_hash = _payload_hash(record)
-                raw_reference = edition_payload.get("source_canonical_url")
-                _upsert_source_record(
-                    db,
-                    provider=provider,
-                    external_id=external_id,
-                    payload_hash=payload_hash,
-                    raw_reference=raw_reference,
-                    work_id=work.id,
-                    edition_id=edition.id,
-                )
-
-                for relation in candidate.get("relations", []):
-                    to_external_id = relation.get("to_external_id")
-                    if not to_external_id:
-                        continue
-                    target_source = (
-                        db.query(SourceRecord)
-                        .filter(
-                            SourceRecord.provider == provider,
-                            SourceRecord.external_id == to_external_id,
-                        )
-                        .first()
-                    )
-                    if not target_source or not target_source.edition_id:
-                        continue
-                    exists = (
-                        db.query(EditionRelation)
-                        .filter(
-                            EditionRelation.from_edition_id == edition.id,
-                            EditionRelation.to_edition_id == target_source.edition_id,
-                            EditionRelation.type == relation.get("type", "related"),
-                        )
-                        .first()
-                    )
-                    if exists:
-                        continue
-                    db.add(
-                        EditionRelation(
-                            from_edition_id=edition.id,
-                            to_edition_id=target_source.edition_id,
-                            type=relation.get("type", "related"),
-                            confidence=relation.get("confidence", 1.0),
-                            source=relation.get("source"),
-                        )
-                    )
-                ingested += 1
-            db.commit()
-            run.status = "completed"
-            run.finished_at = datetime.utcnow()
-            run.error_message = None
-            run.records_imported = ingested
-            db.add(run)
-            db.commit()
-        except Exception as exc:
-            db.rollback()
-            run.status = "failed"
-            run.finished_at = datetime.utcnow()
-            run.error_message = str(exc)
-            run.records_imported = ingested
-            db.add(run)
-            db.commit()
-    finally:
-        db.close()
-
-
 @app.post("/api/ingestion/run")
 def run_ingestion(
-    background_tasks: BackgroundTasks,
     provider: str = Query(...),
+    force: bool = Query(False),
+    full: bool = Query(False),
     db: Session = Depends(get_db),
 ) -> dict[str, str | int]:
-    run_id = enqueue_ingestion(provider, background_tasks, db)
-    return {"status": "queued", "provider": provider, "run_id": run_id}
+    run_id = enqueue_ingestion(provider, db, force=force, full_resync=full)
+    return {"status": QUEUED, "provider": provider, "run_id": run_id}
+
+
+@app.post("/api/ingestion/runs/{run_id}/resume", response_model=IngestionRunOut)
+def resume_ingestion(run_id: int, db: Session = Depends(get_db)) -> IngestionRun:
+    run = db.get(IngestionRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Ingestion run not found")
+    if run.status != "failed":
+        raise HTTPException(status_code=409, detail="Only failed runs can be resumed")
+    run.status = QUEUED
+    run.finished_at = None
+    run.error_message = None
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    return run
 
 
 @app.get("/api/ingestion/status", response_model=IngestionStatus)
@@ -981,125 +1209,6 @@ def ingestion_runs(
     )
 
 
-def _parse_date(value: date | str | None) -> date | None:
-    if isinstance(value, date):
-        return value
-    if isinstance(value, str) and value:
-        return date.fromisoformat(value)
-    return None
-
-
-def _payload_hash(payload: dict) -> str:
-    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
-    return hashlib.sha256(encoded).hexdigest()
-
-
-def _upsert_work(db: Session, payload: dict) -> DocumentWork:
-    secondary_ids = payload.get("secondary_discipline_ids")
-    tag_ids = payload.get("tag_ids")
-    work = (
-        db.query(DocumentWork)
-        .filter(DocumentWork.identifier == payload["identifier"])
-        .first()
-    )
-    if work:
-        work.authority = payload["authority"]
-        work.title = payload["title"]
-        if payload.get("primary_discipline_id") is not None:
-            work.primary_discipline_id = payload.get("primary_discipline_id")
-        db.add(work)
-        if secondary_ids is not None:
-            _sync_work_disciplines(db, work.id, secondary_ids)
-        if tag_ids is not None:
-            _sync_work_tags(db, work.id, tag_ids)
-        return work
-    work = DocumentWork(
-        authority=payload["authority"],
-        identifier=payload["identifier"],
-        title=payload["title"],
-        primary_discipline_id=payload.get("primary_discipline_id"),
-    )
-    db.add(work)
-    db.flush()
-    if secondary_ids is not None:
-        _sync_work_disciplines(db, work.id, secondary_ids)
-    if tag_ids is not None:
-        _sync_work_tags(db, work.id, tag_ids)
-    return work
-
-
-def _sync_work_disciplines(
-    db: Session, work_id: int, discipline_ids: Sequence[int]
-) -> None:
-    db.query(WorkDiscipline).filter(WorkDiscipline.work_id == work_id).delete()
-    for discipline_id in discipline_ids:
-        db.add(WorkDiscipline(work_id=work_id, discipline_id=discipline_id))
-
-
-def _sync_work_tags(db: Session, work_id: int, tag_ids: Sequence[int]) -> None:
-    db.query(WorkTag).filter(WorkTag.work_id == work_id).delete()
-    for tag_id in tag_ids:
-        db.add(WorkTag(work_id=work_id, tag_id=tag_id))
-
-
-def _upsert_edition(db: Session, work: DocumentWork, payload: dict) -> DocumentEdition:
-    publication_date = _parse_date(payload.get("publication_date"))
-    edition = (
-        db.query(DocumentEdition)
-        .filter(
-            DocumentEdition.work_id == work.id,
-            DocumentEdition.edition_label == payload["edition_label"],
-            DocumentEdition.publication_date == publication_date,
-        )
-        .first()
-    )
-    if edition:
-        edition.status = payload.get("status", edition.status)
-        edition.source_canonical_url = payload.get(
-            "source_canonical_url", edition.source_canonical_url
-        )
-        db.add(edition)
-        return edition
-    edition = DocumentEdition(
-        work_id=work.id,
-        edition_label=payload["edition_label"],
-        publication_date=publication_date,
-        status=payload.get("status", "unknown"),
-        source_canonical_url=payload.get("source_canonical_url"),
-    )
-    db.add(edition)
-    db.flush()
-    return edition
-
-
-def _upsert_source_record(
-    db: Session,
-    provider: str,
-    external_id: str,
-    payload_hash: str,
-    raw_reference: str | None,
-    work_id: int | None,
-    edition_id: int | None,
-) -> SourceRecord:
-    record = (
-        db.query(SourceRecord)
-        .filter(SourceRecord.provider == provider, SourceRecord.external_id == external_id)
-        .first()
-    )
-    if record:
-        record.payload_hash = payload_hash
-        record.raw_reference = raw_reference
-        record.work_id = work_id
-        record.edition_id = edition_id
-        db.add(record)
-        return record
-    record = SourceRecord(
-        provider=provider,
-        external_id=external_id,
-        payload_hash=payload_hash,
-        raw_reference=raw_reference,
-        work_id=work_id,
-        edition_id=edition_id,
-    )
-    db.add(record)
-    return record
+@app.get("/api/ingestion/watermarks", response_model=list[ProviderWatermarkOut])
+def ingestion_watermarks(db: Session = Depends(get_db)) -> list[ProviderWatermark]:
+    return db.query(ProviderWatermark).order_by(ProviderWatermark.provider).all()
@@ -0,0 +1,196 @@
+"""Idempotent schema upgrades applied at startup.
+
+``Base.metadata.create_all`` only creates missing tables, so columns and
+indexes added to existing tables after their first deployment are applied
+here. Every step must be safe to run repeatedly.
+"""
+from __future__ import annotations
+
+from typing import Callable, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.facets import rebuild_edition_facets
+from app.ingestion.identifiers import canonicalize_identifier
+from app.list_index import filter_index_keys
+from app.models import WORK_SEARCH_DOCUMENT, NormativeList
+from app.schemas import ListFilters
+from app.snapshots import frozen_lists, sync_list_snapshot
+
+# Arbitrary key serialising concurrent upgrades from several API workers.
+UPGRADE_LOCK_KEY = 7_416_001
+
+BACKFILL_BATCH_SIZE = 1000
+
+UpgradeStep = Union[str, Callable[[Connection], None]]
+
+
+def _backfill_canonical_identifiers(connection: Connection) -> None:
+    while True:
+        rows = connection.execute(
+            text(
+                "SELECT id, identifier FROM document_works "
+                "WHERE canonical_identifier IS NULL LIMIT :limit"
+            ),
+            {"limit": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            return
+        connection.execute(
+            text("UPDATE document_works SET canonical_identifier = :canonical WHERE id = :id"),
+            [
+                {"id": row.id, "canonical": canonicalize_identifier(row.identifier)}
+                for row in rows
+            ],
+        )
+
+
+def _add_latest_in_force_edition(connection: Connection) -> None:
+    exists = connection.execute(
+        text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'document_works' "
+            "AND column_name = 'latest_in_force_edition_id'"
+        )
+    ).first()
+    if exists:
+        return
+    connection.execute(
+        text(
+            "ALTER TABLE document_works ADD COLUMN latest_in_force_edition_id integer "
+            "CONSTRAINT fk_document_works_latest_in_force_edition_id "
+            "REFERENCES document_editions (id) ON DELETE SET NULL"
+        )
+    )
+    connection.execute(
+        text(
+            "UPDATE document_works AS work SET latest_in_force_edition_id = latest.id "
+            "FROM ("
+            "SELECT DISTINCT ON (work_id) work_id, id FROM document_editions "
+            "WHERE status = 'in_force' "
+            "ORDER BY work_id, publication_date DESC NULLS LAST, id DESC"
+            ") AS latest WHERE latest.work_id = work.id"
+        )
+    )
+
+
+def _backfill_list_filter_keys(connection: Connection) -> None:
+    rows = connection.execute(
+        text(
+            "SELECT id, source_filter_json FROM normative_lists AS list "
+            "WHERE NOT EXISTS (SELECT 1 FROM list_filter_keys AS k WHERE k.list_id = list.id)"
+        )
+    ).all()
+    keys = [
+        {"list_id": row.id, "dimension": dimension, "value": value}
+        for row in rows
+        for dimension, value in filter_index_keys(ListFilters(**row.source_filter_json))
+    ]
+    if keys:
+        connection.execute(
+            text(
+                "INSERT INTO list_filter_keys (list_id, dimension, value) "
+                "VALUES (:list_id, :dimension, :value)"
+            ),
+            keys,
+        )
+
+
+def _backfill_list_snapshots(connection: Connection) -> None:
+    session = Session(bind=connection)
+    try:
+        frozen = session.query(NormativeList).filter(
+            frozen_lists(), ~NormativeList.snapshot.has()
+        )
+        for normative_list in frozen.all():
+            sync_list_snapshot(session, normative_list)
+        session.flush()
+    finally:
+        session.close()
+
+
+def _backfill_edition_facets(connection: Connection) -> None:
+    counted = connection.execute(text("SELECT 1 FROM edition_facets LIMIT 1")).first()
+    if counted or not connection.execute(text("SELECT 1 FROM document_editions LIMIT 1")).first():
+        return
+    rebuild_edition_facets(connection)
+
+
+UPGRADE_STEPS: tuple[UpgradeStep, ...] = (
+    "ALTER TABLE document_works ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({WORK_SEARCH_DOCUMENT}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_document_works_search_vector "
+    "ON document_works USING gin (search_vector)",
+    "ALTER TABLE document_works ADD COLUMN IF NOT EXISTS canonical_identifier varchar(255)",
+    _backfill_canonical_identifiers,
+    "ALTER TABLE document_works ALTER COLUMN canonical_identifier SET NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_document_works_canonical_identifier "
+    "ON document_works (canonical_identifier)",
+    "CREATE INDEX IF NOT EXISTS ix_document_editions_work_id ON document_editions (work_id)",
+    "CREATE INDEX IF NOT EXISTS ix_work_disciplines_discipline_id "
+    "ON work_disciplines (discipline_id)",
+    "CREATE INDEX IF NOT EXISTS ix_work_tags_tag_id ON work_tags (tag_id)",
+    "CREATE INDEX IF NOT EXISTS ix_local_attachments_edition_id "
+    "ON local_attachments (edition_id)",
+    _add_latest_in_force_edition,
+    "CREATE INDEX IF NOT EXISTS ix_document_works_latest_in_force_edition_id "
+    "ON document_works (latest_in_force_edition_id)",
+    "CREATE INDEX IF NOT EXISTS ix_edition_relations_from_edition_id "
+    "ON edition_relations (from_edition_id)",
+    "CREATE INDEX IF NOT EXISTS ix_edition_relations_to_edition_id "
+    "ON edition_relations (to_edition_id)",
+    "CREATE INDEX IF NOT EXISTS ix_normative_list_items_list_id "
+    "ON normative_list_items (list_id)",
+    "CREATE INDEX IF NOT EXISTS ix_normative_list_items_edition_id "
+    "ON normative_list_items (edition_id)",
+    "ALTER TABLE list_regenerations "
+    "ADD COLUMN IF NOT EXISTS source varchar(50) NOT NULL DEFAULT 'manual'",
+    _backfill_list_filter_keys,
+    "ALTER TABLE normative_lists "
+    "ADD COLUMN IF NOT EXISTS content_version integer NOT NULL DEFAULT 1",
+    "ALTER TABLE normative_lists "
+    "ADD COLUMN IF NOT EXISTS content_updated_at timestamp NOT NULL "
+    "DEFAULT timezone('utc', now())",
+    "ALTER TABLE normative_lists "
+    "ALTER COLUMN content_updated_at SET DEFAULT timezone('utc', now())",
+    _backfill_list_snapshots,
+    "CREATE INDEX IF NOT EXISTS ix_document_editions_source_canonical_url "
+    "ON document_editions (source_canonical_url)",
+    "ALTER TABLE ingestion_runs "
+    "ADD COLUMN IF NOT EXISTS records_created integer NOT NULL DEFAULT 0",
+    "ALTER TABLE ingestion_runs "
+    "ADD COLUMN IF NOT EXISTS records_updated integer NOT NULL DEFAULT 0",
+    "ALTER TABLE ingestion_runs "
+    "ADD COLUMN IF NOT EXISTS records_skipped integer NOT NULL DEFAULT 0",
+    "ALTER TABLE ingestion_runs "
+    "ADD COLUMN IF NOT EXISTS force_refresh boolean NOT NULL DEFAULT false",
+    "ALTER TABLE ingestion_runs ADD COLUMN IF NOT EXISTS checkpoint_cursor varchar(255)",
+    "ALTER TABLE ingestion_runs ADD COLUMN IF NOT EXISTS checkpoint_external_id varchar(255)",
+    "ALTER TABLE ingestion_runs ADD COLUMN IF NOT EXISTS worker_id varchar(255)",
+    "ALTER TABLE ingestion_runs ADD COLUMN IF NOT EXISTS heartbeat_at timestamp",
+    "ALTER TABLE ingestion_runs ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0",
+    # Runs started in-process before the worker queue have no lease and
+    # died with their API worker; they can be resumed from their checkpoint.
+    "UPDATE ingestion_runs SET status = 'failed', finished_at = timezone('utc', now()), "
+    "error_message = 'Interrupted (API worker restarted)' "
+    "WHERE status = 'running' AND heartbeat_at IS NULL",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_ingestion_runs_running_provider "
+    "ON ingestion_runs (provider) WHERE status = 'running'",
+    "ALTER TABLE ingestion_runs "
+    "ADD COLUMN IF NOT EXISTS full_resync boolean NOT NULL DEFAULT false",
+    "ALTER TABLE ingestion_runs ADD COLUMN IF NOT EXISTS since timestamp",
+    "ALTER TABLE ingestion_runs ADD COLUMN IF NOT EXISTS high_water_mark timestamp",
+    _backfill_edition_facets,
+)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": UPGRADE_LOCK_KEY})
+        for step in UPGRADE_STEPS:
+            if callable(step):
+                step(connection)
+            else:
+                connection.execute(text(step))
@@ -2,21 +2,40 @@ from sqlalchemy import (
     Boolean,
     CheckConstraint,
     Column,
+    Computed,
     Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     UniqueConstraint,
     func,
+    text,
 )
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
+from sqlalchemy.orm import declarative_base, deferred, relationship, validates
+
+from app.ingestion.identifiers import canonicalize_identifier
 
 Base = declarative_base()
 
+# Weighted full-text document for a work: title (A) > identifier (B) > abstract (C).
+# Title and abstract are indexed with the Italian, English and ``simple``
+# configurations so that stemmed and verbatim terms both match.
+WORK_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('italian'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(identifier, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(abstract, '')), 'C') || "
+    "setweight(to_tsvector('italian'::regconfig, coalesce(abstract, '')), 'C') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(abstract, '')), 'C')"
+)
+
 
 class DisciplineCategory(Base):
     __tablename__ = "discipline_categories"
@@ -53,26 +72,54 @@ class DocumentWork(Base):
     id = Column(Integer, primary_key=True)
     authority = Column(String(50), nullable=False)
     identifier = Column(String(255), nullable=False, unique=True)
+    canonical_identifier = Column(String(255), nullable=False, index=True)
     title = Column(String(512), nullable=False)
     abstract = Column(Text, nullable=True)
     primary_discipline_id = Column(Integer, ForeignKey("discipline_categories.id"))
+    search_vector = Column(TSVECTOR, Computed(WORK_SEARCH_DOCUMENT, persisted=True))
+    # Maintained by ``refresh_latest_in_force``: the in-force edition with the
+    # most recent publication date (undated last), ties broken by highest id.
+    latest_in_force_edition_id = Column(
+        Integer,
+        ForeignKey(
+            "document_editions.id",
+            use_alter=True,
+            name="fk_document_works_latest_in_force_edition_id",
+            ondelete="SET NULL",
+        ),
+        nullable=True,
+        index=True,
+    )
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(
         DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
     )
 
+    __table_args__ = (
+        Index(
+            "ix_document_works_search_vector", "search_vector", postgresql_using="gin"
+        ),
+    )
+
     primary_discipline = relationship("DisciplineCategory", back_populates="works")
-    editions = relationship("DocumentEdition", back_populates="work")
+    editions = relationship(
+        "DocumentEdition", back_populates="work", foreign_keys="DocumentEdition.work_id"
+    )
     secondary_disciplines = relationship("WorkDiscipline", back_populates="work")
     tags = relationship("WorkTag", back_populates="work")
 
+    @validates("identifier")
+    def _sync_canonical_identifier(self, key: str, value: str) -> str:
+        self.canonical_identifier = canonicalize_identifier(value)
+        return value
+
 
 class WorkDiscipline(Base):
     __tablename__ = "work_disciplines"
 
     work_id = Column(Integer, ForeignKey("document_works.id"), primary_key=True)
     discipline_id = Column(
-        Integer, ForeignKey("discipline_categories.id"), primary_key=True
+        Integer, ForeignKey("discipline_categories.id"), primary_key=True, index=True
     )
 
     work = relationship("DocumentWork", back_populates="secondary_disciplines")
@@ -83,7 +130,7 @@ class WorkTag(Base):
     __tablename__ = "work_tags"
 
     work_id = Column(Integer, ForeignKey("document_works.id"), primary_key=True)
-    tag_id = Column(Integer, ForeignKey("user_tags.id"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("user_tags.id"), primary_key=True, index=True)
 
     work = relationship("DocumentWork", back_populates="tags")
     tag = relationship("UserTag", back_populates="works")
@@ -93,19 +140,19 @@ class DocumentEdition(Base):
     __tablename__ = "document_editions"
 
     id = Column(Integer, primary_key=True)
-    work_id = Column(Integer, ForeignKey("document_works.id"), nullable=False)
+    work_id = Column(Integer, ForeignKey("document_works.id"), nullable=False, index=True)
     edition_label = Column(String(100), nullable=False)
     publication_date = Column(Date, nullable=True)
     status = Column(String(50), nullable=False, default="unknown")
     valid_from = Column(Date, nullable=True)
     valid_to = Column(Date, nullable=True)
-    source_canonical_url = Column(String(1024), nullable=True)
+    source_canonical_url = Column(String(1024), nullable=True, index=True)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(
         DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
     )
 
-    work = relationship("DocumentWork", back_populates="editions")
+    work = relationship("DocumentWork", back_populates="editions", foreign_keys=[work_id])
     relations_from = relationship(
         "EditionRelation", foreign_keys="EditionRelation.from_edition_id"
     )
@@ -119,8 +166,12 @@ class EditionRelation(Base):
     __tablename__ = "edition_relations"
 
     id = Column(Integer, primary_key=True)
-    from_edition_id = Column(Integer, ForeignKey("document_editions.id"), nullable=False)
-    to_edition_id = Column(Integer, ForeignKey("document_editions.id"), nullable=False)
+    from_edition_id = Column(
+        Integer, ForeignKey("document_editions.id"), nullable=False, index=True
+    )
+    to_edition_id = Column(
+        Integer, ForeignKey("document_editions.id"), nullable=False, index=True
+    )
     type = Column(String(50), nullable=False)
     confidence = Column(Float, nullable=False, default=1.0)
     source = Column(String(100), nullable=True)
@@ -151,7 +202,9 @@ class LocalAttachment(Base):
     __tablename__ = "local_attachments"
 
     id = Column(Integer, primary_key=True)
-    edition_id = Column(Integer, ForeignKey("document_editions.id"), nullable=False)
+    edition_id = Column(
+        Integer, ForeignKey("document_editions.id"), nullable=False, index=True
+    )
     filename = Column(String(255), nullable=False)
     mime_type = Column(String(100), nullable=False)
     size_bytes = Column(Integer, nullable=False)
@@ -176,16 +229,27 @@ class NormativeList(Base):
     source_filter_json = Column(JSONB, nullable=False, default=dict)
     regeneration_mode = Column(String(50), nullable=False, default="dynamic")
     preserve_overrides = Column(Boolean, nullable=False, default=True)
+    # Bumped whenever anything shown in the list's exports changes; exports
+    # are cached and ETag-validated against it.
+    content_version = Column(Integer, nullable=False, default=1, server_default="1")
+    # UTC, unlike the other timestamps: it is sent as Last-Modified.
+    content_updated_at = Column(
+        DateTime, nullable=False, server_default=func.timezone("utc", func.now())
+    )
 
     items = relationship("NormativeListItem", back_populates="list")
+    regenerations = relationship("ListRegeneration", back_populates="list")
+    snapshot = relationship("ListSnapshot", back_populates="list", uselist=False)
 
 
 class NormativeListItem(Base):
     __tablename__ = "normative_list_items"
 
     id = Column(Integer, primary_key=True)
-    list_id = Column(Integer, ForeignKey("normative_lists.id"), nullable=False)
-    edition_id = Column(Integer, ForeignKey("document_editions.id"), nullable=False)
+    list_id = Column(Integer, ForeignKey("normative_lists.id"), nullable=False, index=True)
+    edition_id = Column(
+        Integer, ForeignKey("document_editions.id"), nullable=False, index=True
+    )
     included = Column(Boolean, nullable=False, default=True)
     reason = Column(String(50), nullable=False, default="auto")
     note = Column(Text, nullable=True)
@@ -197,13 +261,154 @@ class NormativeListItem(Base):
     edition = relationship("DocumentEdition")
 
 
+class SearchFacetCell(Base):
+    """Number of editions sharing one combination of facet values (see app.facets)."""
+
+    __tablename__ = "search_facet_cells"
+
+    id = Column(Integer, primary_key=True)
+    # md5 of the facet values, computed in SQL by app.facets.
+    cell_key = Column(String(32), nullable=False, unique=True)
+    authority = Column(String(50), nullable=False)
+    status = Column(String(50), nullable=False)
+    primary_discipline_id = Column(Integer, nullable=True)
+    secondary_discipline_ids = Column(ARRAY(Integer), nullable=False)
+    tag_ids = Column(ARRAY(Integer), nullable=False)
+    has_attachment = Column(Boolean, nullable=False)
+    has_official_link = Column(Boolean, nullable=False)
+    latest_in_force = Column(Boolean, nullable=False)
+    editions = Column(Integer, nullable=False, default=0)
+
+
+class SearchFacetCellYear(Base):
+    """Editions of a facet cell published in one year (see app.facets)."""
+
+    __tablename__ = "search_facet_cell_years"
+
+    publication_year = Column(Integer, primary_key=True)
+    cell_id = Column(Integer, ForeignKey("search_facet_cells.id"), primary_key=True)
+    editions = Column(Integer, nullable=False, default=0)
+
+
+class EditionFacet(Base):
+    """The facet cell an edition is counted in (see app.facets).
+
+    Not a foreign key to the edition: the entry outlives a deleted edition
+    until the facet refresh that uncounts it. The work id and dates are
+    copied from the edition so text and date filters can select cells
+    without joining the catalogue.
+    """
+
+    __tablename__ = "edition_facets"
+    __table_args__ = (
+        Index("ix_edition_facets_work_id", "work_id", postgresql_include=["cell_id"]),
+        Index(
+            "ix_edition_facets_publication_date",
+            "publication_date",
+            postgresql_include=["cell_id"],
+        ),
+        Index("ix_edition_facets_updated_at", "updated_at", postgresql_include=["cell_id"]),
+    )
+
+    edition_id = Column(Integer, primary_key=True)
+    cell_id = Column(Integer, ForeignKey("search_facet_cells.id"), nullable=True)
+    work_id = Column(Integer, nullable=True)
+    publication_date = Column(Date, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+
+class ListFilterKey(Base):
+    """Reverse index entry: ``list_id`` filters on ``dimension`` = ``value`` (see app.list_index)."""
+
+    __tablename__ = "list_filter_keys"
+
+    list_id = Column(Integer, ForeignKey("normative_lists.id"), primary_key=True)
+    dimension = Column(String(50), primary_key=True)
+    value = Column(String(255), primary_key=True)
+
+    __table_args__ = (Index("ix_list_filter_keys_dimension_value", "dimension", "value"),)
+
+
+class ListRegeneration(Base):
+    __tablename__ = "list_regenerations"
+    # The insert returns regenerated_at, so a new row needs no reload.
+    __mapper_args__ = {"eager_defaults": True}
+
+    id = Column(Integer, primary_key=True)
+    list_id = Column(Integer, ForeignKey("normative_lists.id"), nullable=False, index=True)
+    regenerated_at = Column(DateTime, nullable=False, server_default=func.now())
+    # "manual" for the regenerate endpoint, "catalog" for incremental maintenance.
+    source = Column(String(50), nullable=False, default="manual")
+    added_edition_ids = Column(JSONB, nullable=False, default=list)
+    removed_edition_ids = Column(JSONB, nullable=False, default=list)
+    overrides_kept = Column(Integer, nullable=False, default=0)
+    overrides_reset = Column(Integer, nullable=False, default=0)
+
+    list = relationship("NormativeList", back_populates="regenerations")
+
+
+class ListSnapshot(Base):
+    """Immutable content of a frozen list (see app.snapshots)."""
+
+    __tablename__ = "list_snapshots"
+
+    list_id = Column(Integer, ForeignKey("normative_lists.id"), primary_key=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    item_count = Column(Integer, nullable=False, default=0)
+    # gzip-compressed NDJSON: serialised list items, and export rows in export order.
+    items = deferred(Column(LargeBinary, nullable=False))
+    export_rows = deferred(Column(LargeBinary, nullable=False))
+
+    list = relationship("NormativeList", back_populates="snapshot")
+
+
 class IngestionRun(Base):
     __tablename__ = "ingestion_runs"
+    __table_args__ = (
+        # At most one running run per provider (see app.ingestion.queue).
+        Index(
+            "ix_ingestion_runs_running_provider",
+            "provider",
+            unique=True,
+            postgresql_where=text("status = 'running'"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     provider = Column(String(100), nullable=False)
-    status = Column(String(50), nullable=False, default="running")
+    status = Column(String(50), nullable=False, default="queued")
     started_at = Column(DateTime, nullable=False, server_default=func.now())
     finished_at = Column(DateTime, nullable=True)
     error_message = Column(Text, nullable=True)
     records_imported = Column(Integer, nullable=False, default=0)
+    records_created = Column(Integer, nullable=False, default=0)
+    records_updated = Column(Integer, nullable=False, default=0)
+    # Records whose payload hash matched the stored source record.
+    records_skipped = Column(Integer, nullable=False, default=0)
+    force_refresh = Column(Boolean, nullable=False, default=False)
+    # Ignore the provider watermark and fetch everything.
+    full_resync = Column(Boolean, nullable=False, default=False)
+    # Change window, fixed when the run is first claimed, and the highest
+    # modification time the provider reported so far.
+    since = Column(DateTime, nullable=True)
+    high_water_mark = Column(DateTime, nullable=True)
+    # Resume point: the provider page cursor and the last committed record.
+    checkpoint_cursor = Column(String(255), nullable=True)
+    checkpoint_external_id = Column(String(255), nullable=True)
+    # Lease held by the worker processing the run.
+    worker_id = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+
+class ProviderWatermark(Base):
+    """Provider-reported high-water mark of the last completed run of each provider."""
+
+    __tablename__ = "provider_watermarks"
+
+    provider = Column(String(100), primary_key=True)
+    high_water_mark = Column(DateTime, nullable=False)
+    run_id = Column(Integer, ForeignKey("ingestion_runs.id", ondelete="SET NULL"), nullable=True)
+    updated_at = Column(
+        DateTime, nullable=False, server_default=func.now(), onupdate=func.now()
+    )
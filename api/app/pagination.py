@@ -0,0 +1,110 @@
+"""Keyset (cursor) pagination helpers.
+
+A page is ordered by a list of ``SortKey`` expressions ending with a unique
+column; the cursor is an opaque, URL-safe encoding of the sort values of the
+last row returned, so the next page is a plain range condition instead of an
+OFFSET scan.
+"""
+from __future__ import annotations
+
+import base64
+from dataclasses import dataclass
+from datetime import date, datetime
+import json
+from typing import Any, List, Sequence
+
+from sqlalchemy import and_, false, or_
+
+
+@dataclass(frozen=True)
+class SortKey:
+    expression: Any
+    descending: bool = False
+
+    def ordering(self):
+        ordered = self.expression.desc() if self.descending else self.expression.asc()
+        return ordered.nulls_last()
+
+    def after(self, value: Any):
+        """Rows strictly after ``value`` in this key's order (NULLs sort last)."""
+        if value is None:
+            return false()
+        beyond = self.expression < value if self.descending else self.expression > value
+        return or_(beyond, self.expression.is_(None))
+
+    def equal(self, value: Any):
+        if value is None:
+            return self.expression.is_(None)
+        return self.expression == value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[SortKey]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError("Invalid cursor")
+    return [_decode_value(value, key) for value, key in zip(values, keys)]
+
+
+def keyset_condition(keys: Sequence[SortKey], values: Sequence[Any]):
+    condition = keys[-1].after(values[-1])
+    for key, value in zip(reversed(keys[:-1]), reversed(values[:-1])):
+        condition = or_(key.after(value), and_(key.equal(value), condition))
+    return condition
+
+
+def paginate(query, keys: Sequence[SortKey], cursor: str | None, limit: int):
+    """Return ``(rows, next_cursor)`` for one page of an ORM query.
+
+    Each row is a tuple of the query's own columns/entities; the sort key
+    values used to build the cursor are stripped off.
+    """
+    width = len(query.column_descriptions)
+    query = query.add_columns(*(key.expression for key in keys))
+    if cursor:
+        query = query.filter(keyset_condition(keys, decode_cursor(cursor, keys)))
+    rows = query.order_by(*(key.ordering() for key in keys)).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][width:])
+    return [tuple(row[:width]) for row in rows], next_cursor
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(value: Any, key: SortKey) -> Any:
+    """``value`` as the Python type of ``key``'s column; ValueError if it does not fit."""
+    if value is None:
+        return None
+    try:
+        expected = key.expression.type.python_type
+    except NotImplementedError:
+        expected = None
+    if expected is datetime or expected is date:
+        if isinstance(value, str):
+            try:
+                return expected.fromisoformat(value)
+            except ValueError:
+                pass
+    elif expected is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif expected is None:
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            return value
+    elif isinstance(value, expected) and not isinstance(value, bool):
+        return value
+    raise ValueError("Invalid cursor")
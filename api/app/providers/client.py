@@ -0,0 +1,235 @@
+"""Shared HTTP client for provider feeds.
+
+Providers are async: ``fetch_changes(since)`` yields pages of change
+entries and ``get_details(external_id)`` returns one full record. All of
+them share a single pooled ``httpx.AsyncClient`` that lives on a dedicated
+event loop thread, so concurrent ingestion runs reuse the same keep-alive
+connections. Each provider gets its own concurrency limit; requests are
+retried with exponential backoff on transport errors, timeouts and
+429/5xx responses (honouring ``Retry-After``).
+
+Ingestion jobs are synchronous: ``fetch_pages`` drives a provider from
+the calling thread, fetching the details of each page concurrently and
+yielding the pages in feed order. Each page carries the provider cursor
+it was fetched from, so a run can checkpoint and later resume there.
+"""
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Future
+from datetime import datetime, timezone
+import os
+import random
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Coroutine,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
+from urllib.parse import quote
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv("PROVIDER_HTTP_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("PROVIDER_HTTP_RETRIES", "4"))
+HTTP_BACKOFF = float(os.getenv("PROVIDER_HTTP_BACKOFF", "0.5"))
+HTTP_MAX_BACKOFF = 30.0
+HTTP_MAX_CONNECTIONS = int(os.getenv("PROVIDER_HTTP_MAX_CONNECTIONS", "100"))
+# Per-provider override: ``<PROVIDER>_CONCURRENCY``, e.g. ``EURLEX_CONCURRENCY``.
+DEFAULT_CONCURRENCY = int(os.getenv("PROVIDER_CONCURRENCY", "16"))
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+T = TypeVar("T")
+
+
+class ProviderHTTPError(RuntimeError):
+    """A provider request failed for good (non-retryable status or retries exhausted)."""
+
+
+class FeedPage(NamedTuple):
+    # Passing ``cursor`` back to ``fetch_changes`` restarts at this page.
+    cursor: Optional[str]
+    items: List[Dict[str, Any]]
+    # Latest modification time the provider reported (naive UTC), if any.
+    high_water_mark: Optional[datetime] = None
+
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_client: Optional[httpx.AsyncClient] = None
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _runtime_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="provider-http", daemon=True
+            ).start()
+            _loop = loop
+        return _loop
+
+
+def submit(coroutine: Coroutine[Any, Any, T]) -> Future[T]:
+    """Schedule ``coroutine`` on the provider event loop."""
+    return asyncio.run_coroutine_threadsafe(coroutine, _runtime_loop())
+
+
+def run(coroutine: Coroutine[Any, Any, T]) -> T:
+    """Run ``coroutine`` on the provider event loop and wait for its result."""
+    return submit(coroutine).result()
+
+
+def _http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            ),
+            headers={"Accept": "application/json"},
+            follow_redirects=True,
+        )
+    return _client
+
+
+def _provider_slots(provider: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(provider)
+    if semaphore is None:
+        limit = int(os.getenv(f"{provider.upper()}_CONCURRENCY", DEFAULT_CONCURRENCY))
+        semaphore = _semaphores[provider] = asyncio.Semaphore(max(limit, 1))
+    return semaphore
+
+
+def _retry_delay(attempt: int, response: httpx.Response | None) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), HTTP_MAX_BACKOFF)
+    delay = min(HTTP_BACKOFF * 2**attempt, HTTP_MAX_BACKOFF)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def get_json(provider: str, url: str, params: Dict[str, Any] | None = None) -> Any:
+    """GET ``url`` within ``provider``'s concurrency limit, retrying transient failures."""
+    client = _http_client()
+    attempt = 0
+    while True:
+        response = None
+        try:
+            async with _provider_slots(provider):
+                response = await client.get(url, params=params)
+        except httpx.TransportError as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                if response.is_error:
+                    raise ProviderHTTPError(
+                        f"{provider}: GET {response.url} returned {response.status_code}"
+                    )
+                return response.json()
+            error = f"status {response.status_code}"
+        if attempt == HTTP_RETRIES:
+            raise ProviderHTTPError(
+                f"{provider}: GET {url} failed after {attempt + 1} attempts ({error})"
+            )
+        # Back off outside the concurrency slot, so other requests can proceed.
+        await asyncio.sleep(_retry_delay(attempt, response))
+        attempt += 1
+
+
+async def feed_pages(
+    provider: str, feed_url: str, since: datetime | None, cursor: str | None = None
+) -> AsyncIterator[FeedPage]:
+    """Change entries from a JSON feed, one page at a time, starting at page ``cursor``.
+
+    The feed answers ``GET {feed_url}/changes?since=&page=`` with
+    ``{"items": [{"external_id": ..., "modified_at": ...}, ...],
+    "next_page": <page or null>, "high_water_mark": <timestamp or null>}``;
+    without ``high_water_mark`` the page's latest ``modified_at`` is used.
+    """
+    params: Dict[str, Any] = {"page": int(cursor or 1)}
+    if since is not None:
+        params["since"] = since.isoformat()
+    while True:
+        payload = await get_json(provider, f"{feed_url.rstrip('/')}/changes", params)
+        items = payload.get("items") or []
+        if items:
+            yield FeedPage(str(params["page"]), items, _page_high_water_mark(payload, items))
+        next_page = payload.get("next_page")
+        if not next_page:
+            return
+        params["page"] = next_page
+
+
+def _page_high_water_mark(payload: Dict[str, Any], items: List[Dict[str, Any]]) -> datetime | None:
+    reported = payload.get("high_water_mark")
+    candidates = [reported] if reported else [item.get("modified_at") for item in items]
+    timestamps = [_parse_timestamp(value) for value in candidates if value]
+    return max(timestamps, default=None)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+async def feed_record(provider: str, feed_url: str, external_id: str) -> Dict[str, Any]:
+    """Full record for ``external_id``: ``GET {feed_url}/records/{external_id}``."""
+    url = f"{feed_url.rstrip('/')}/records/{quote(external_id, safe='')}"
+    return await get_json(provider, url)
+
+
+async def _detailed_page(
+    provider_module: object, pages: AsyncIterator[FeedPage], after: str | None
+) -> FeedPage | None:
+    page = await anext(pages, None)
+    if page is None:
+        return None
+    entries = page.items
+    if after is not None:
+        external_ids = [entry["external_id"] for entry in entries]
+        if after in external_ids:
+            entries = entries[external_ids.index(after) + 1 :]
+    details = [
+        asyncio.ensure_future(provider_module.get_details(entry["external_id"]))
+        for entry in entries
+    ]
+    try:
+        return page._replace(items=list(await asyncio.gather(*details)))
+    except BaseException:
+        for task in details:
+            task.cancel()
+        raise
+
+
+def fetch_pages(
+    provider_module: object,
+    since: datetime | None,
+    cursor: str | None = None,
+    after: str | None = None,
+) -> Iterator[FeedPage]:
+    """Pages of records changed since ``since``, with their details, from ``cursor`` on.
+
+    ``after`` resumes inside the first page: its entries up to and
+    including that external id are skipped without fetching their details.
+    """
+    pages = provider_module.fetch_changes(since, cursor)
+    try:
+        while (page := run(_detailed_page(provider_module, pages, after))) is not None:
+            after = None
+            yield page
+    finally:
+        run(pages.aclose())
@@ -1,37 +1,23 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List
+import os
+from typing import Any, AsyncIterator, Dict, List
 
 from sqlalchemy.orm import Session
 
-from app.ingestion.mapping import apply_mapping
-from app.ingestion.matching import match_and_merge_candidate
+from app.ingestion.mapping import TaxonomyResolver, apply_mapping
+from app.ingestion.matching import CatalogLookup, match_and_merge_candidate
+from app.providers.client import FeedPage, feed_pages, feed_record
 
 
 PROVIDER_NAME = "eurlex"
+FEED_URL = os.getenv("EURLEX_FEED_URL")
 
-
-def fetch_changes(since: datetime | None) -> List[Dict[str, Any]]:
-    return [
-        {
-            "external_id": "eurlex:32016R0679",
-            "title": "General Data Protection Regulation",
-            "publication_date": "2016-04-27",
-            "status": "in_force",
-            "source_url": "https://eur-lex.europa.eu/legal-content/EN/TXT/?uri=CELEX:32016R0679",
-            "authority": "EU",
-            "identifier": "CELEX:32016R0679",
-            "primary_discipline_id": None,
-            "categories": ["privacy", "data protection"],
-            "keywords": ["GDPR", "personal data"],
-        }
-    ]
-
-
-def get_details(external_id: str) -> Dict[str, Any]:
-    return {
-        "external_id": external_id,
+# Served when no feed is configured.
+FIXTURES: List[Dict[str, Any]] = [
+    {
+        "external_id": "eurlex:32016R0679",
         "title": "General Data Protection Regulation",
         "publication_date": "2016-04-27",
         "status": "in_force",
@@ -42,9 +28,31 @@ def get_details(external_id: str) -> Dict[str, Any]:
         "categories": ["privacy", "data protection"],
         "keywords": ["GDPR", "personal data"],
     }
+]
+
 
+async def fetch_changes(
+    since: datetime | None, cursor: str | None = None
+) -> AsyncIterator[FeedPage]:
+    if not FEED_URL:
+        yield FeedPage(None, [{"external_id": record["external_id"]} for record in FIXTURES])
+        return
+    async for page in feed_pages(PROVIDER_NAME, FEED_URL, since, cursor):
+        yield page
 
-def normalize(record: Dict[str, Any], db: Session | None = None) -> Dict[str, Any]:
+
+async def get_details(external_id: str) -> Dict[str, Any]:
+    if not FEED_URL:
+        record = next(record for record in FIXTURES if record["external_id"] == external_id)
+        return dict(record)
+    return await feed_record(PROVIDER_NAME, FEED_URL, external_id)
+
+
+def normalize(
+    record: Dict[str, Any],
+    db: Session | None = None,
+    taxonomy: TaxonomyResolver | None = None,
+) -> Dict[str, Any]:
     normalized = {
         "external_id": record["external_id"],
         "work": {
@@ -63,10 +71,12 @@ def normalize(record: Dict[str, Any], db: Session | None = None) -> Dict[str, An
         "categories": record.get("categories", []),
         "keywords": record.get("keywords", []),
     }
-    return apply_mapping(normalized, db=db)
+    return apply_mapping(normalized, db=db, taxonomy=taxonomy)
 
 
 def match_and_merge(
-    candidate: Dict[str, Any], db: Session | None = None
+    candidate: Dict[str, Any],
+    db: Session | None = None,
+    lookup: CatalogLookup | None = None,
 ) -> Dict[str, Any]:
-    return match_and_merge_candidate(candidate, db=db, provider=PROVIDER_NAME)
+    return match_and_merge_candidate(candidate, db=db, provider=PROVIDER_NAME, lookup=lookup)
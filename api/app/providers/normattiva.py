@@ -1,37 +1,23 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List
+import os
+from typing import Any, AsyncIterator, Dict, List
 
 from sqlalchemy.orm import Session
 
-from app.ingestion.mapping import apply_mapping
-from app.ingestion.matching import match_and_merge_candidate
+from app.ingestion.mapping import TaxonomyResolver, apply_mapping
+from app.ingestion.matching import CatalogLookup, match_and_merge_candidate
+from app.providers.client import FeedPage, feed_pages, feed_record
 
 
 PROVIDER_NAME = "normattiva"
+FEED_URL = os.getenv("NORMATTIVA_FEED_URL")
 
-
-def fetch_changes(since: datetime | None) -> List[Dict[str, Any]]:
-    return [
-        {
-            "external_id": "normattiva:urn:nir:stato:legge:1990-08-07;241",
-            "title": "Nuove norme in materia di procedimento amministrativo",
-            "publication_date": "1990-08-07",
-            "status": "in_force",
-            "source_url": "https://www.normattiva.it/urn:nir:stato:legge:1990-08-07;241",
-            "authority": "IT",
-            "identifier": "urn:nir:stato:legge:1990-08-07;241",
-            "primary_discipline_id": None,
-            "categories": ["procedimento amministrativo"],
-            "keywords": ["amministrativo", "PA"],
-        }
-    ]
-
-
-def get_details(external_id: str) -> Dict[str, Any]:
-    return {
-        "external_id": external_id,
+# Served when no feed is configured.
+FIXTURES: List[Dict[str, Any]] = [
+    {
+        "external_id": "normattiva:urn:nir:stato:legge:1990-08-07;241",
         "title": "Nuove norme in materia di procedimento amministrativo",
         "publication_date": "1990-08-07",
         "status": "in_force",
@@ -42,9 +28,31 @@ def get_details(external_id: str) -> Dict[str, Any]:
         "categories": ["procedimento amministrativo"],
         "keywords": ["amministrativo", "PA"],
     }
+]
+
 
+async def fetch_changes(
+    since: datetime | None, cursor: str | None = None
+) -> AsyncIterator[FeedPage]:
+    if not FEED_URL:
+        yield FeedPage(None, [{"external_id": record["external_id"]} for record in FIXTURES])
+        return
+    async for page in feed_pages(PROVIDER_NAME, FEED_URL, since, cursor):
+        yield page
 
-def normalize(record: Dict[str, Any], db: Session | None = None) -> Dict[str, Any]:
+
+async def get_details(external_id: str) -> Dict[str, Any]:
+    if not FEED_URL:
+        record = next(record for record in FIXTURES if record["external_id"] == external_id)
+        return dict(record)
+    return await feed_record(PROVIDER_NAME, FEED_URL, external_id)
+
+
+def normalize(
+    record: Dict[str, Any],
+    db: Session | None = None,
+    taxonomy: TaxonomyResolver | None = None,
+) -> Dict[str, Any]:
     normalized = {
         "external_id": record["external_id"],
         "work": {
@@ -63,10 +71,12 @@ def normalize(record: Dict[str, Any], db: Session | None = None) -> Dict[str, An
         "categories": record.get("categories", []),
         "keywords": record.get("keywords", []),
     }
-    return apply_mapping(normalized, db=db)
+    return apply_mapping(normalized, db=db, taxonomy=taxonomy)
 
 
 def match_and_merge(
-    candidate: Dict[str, Any], db: Session | None = None
+    candidate: Dict[str, Any],
+    db: Session | None = None,
+    lookup: CatalogLookup | None = None,
 ) -> Dict[str, Any]:
-    return match_and_merge_candidate(candidate, db=db, provider=PROVIDER_NAME)
+    return match_and_merge_candidate(candidate, db=db, provider=PROVIDER_NAME, lookup=lookup)
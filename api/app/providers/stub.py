@@ -0,0 +1,238 @@
+"""Local stub of a provider JSON feed, for running ingestion offline.
+
+Serves the protocol the providers speak (see ``app.providers.client``):
+``GET /changes?since=&page=`` and ``GET /records/{external_id}``, over
+synthetic records, with optional per-request latency and injected 503s to
+exercise the client's concurrency limits and retries. Records carry a
+``modified_at``; ``touch`` marks some of them as modified now, and
+``fail_requests`` fails a given window of upcoming requests::
+
+    python -m app.providers.stub --provider eurlex --records 5000 --latency 0.05
+    EURLEX_FEED_URL=http://127.0.0.1:8765 uvicorn app.main:app
+
+``StubFeedServer`` runs the same server in a background thread, as a
+context manager yielding its base URL.
+"""
+from __future__ import annotations
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List
+from urllib.parse import parse_qs, unquote, urlsplit
+
+AUTHORITIES = {"eurlex": "EU", "normattiva": "IT", "iso": "ISO"}
+CATEGORIES = (
+    ["privacy", "data protection"],
+    ["quality management"],
+    ["procedimento amministrativo"],
+)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def synthetic_records(provider: str, count: int) -> List[Dict[str, Any]]:
+    """``count`` distinct records shaped like the provider fixtures."""
+    authority = AUTHORITIES.get(provider, provider.upper())
+    modified = datetime(2024, 1, 1)
+    return [
+        {
+            "external_id": f"{provider}:stub-{index:06d}",
+            "title": f"Stub {authority} act {index}",
+            "publication_date": f"{2000 + index % 25}-{1 + index % 12:02d}-15",
+            "status": "in_force" if index % 7 else "withdrawn",
+            "source_url": f"https://stub.invalid/{provider}/{index}",
+            "authority": authority,
+            "identifier": f"STUB-{authority}-{index:06d}",
+            "primary_discipline_id": None,
+            "categories": CATEGORIES[index % len(CATEGORIES)],
+            "keywords": [],
+            "modified_at": (modified + timedelta(seconds=index)).isoformat() + "Z",
+        }
+        for index in range(count)
+    ]
+
+
+def _timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.removesuffix("Z"))
+
+
+class StubFeedServer:
+    def __init__(
+        self,
+        records: Iterable[Dict[str, Any]],
+        page_size: int = 100,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.records = {record["external_id"]: record for record in records}
+        self.page_size = page_size
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        # Requests being handled right now, and the most seen at once.
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._failure_window = (0, 0)
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubFeedServer":
+        # A short poll interval keeps ``stop`` quick.
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def __enter__(self) -> str:
+        return self.start().url
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def fail_requests(self, count: int, after: int = 0) -> None:
+        """Answer 503 to the ``count`` requests following the next ``after`` ones."""
+        with self._lock:
+            start = self.requests + after
+            self._failure_window = (start, start + count)
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            index = self.requests
+            self.requests += 1
+            start, end = self._failure_window
+            return start <= index < end or self._random.random() < self.failure_rate
+
+    def _enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def touch(self, external_ids: Iterable[str]) -> None:
+        """Mark records as modified now, so they reappear in incremental changes."""
+        now = datetime.utcnow().isoformat() + "Z"
+        with self._lock:
+            for external_id in external_ids:
+                self.records[external_id] = {**self.records[external_id], "modified_at": now}
+
+    def _changes(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        page = int(query.get("page", ["1"])[0])
+        since = query.get("since", [""])[0]
+        with self._lock:
+            changed = sorted(
+                (record["modified_at"], external_id)
+                for external_id, record in self.records.items()
+                if not since or _timestamp(record["modified_at"]) >= _timestamp(since)
+            )
+        start = (page - 1) * self.page_size
+        items = [
+            {"external_id": external_id, "modified_at": modified_at}
+            for modified_at, external_id in changed[start : start + self.page_size]
+        ]
+        next_page = page + 1 if start + self.page_size < len(changed) else None
+        high_water_mark = changed[-1][0] if changed else None
+        return {"items": items, "next_page": next_page, "high_water_mark": high_water_mark}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this,
+            # Nagle and delayed ACKs stall every keep-alive response.
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                stub._enter()
+                try:
+                    self._respond()
+                finally:
+                    stub._leave()
+
+            def _respond(self) -> None:
+                if stub._should_fail():
+                    self._send(503, {"detail": "injected failure"}, {"Retry-After": "0"})
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlsplit(self.path)
+                if url.path == "/changes":
+                    self._send(200, stub._changes(parse_qs(url.query)))
+                    return
+                if url.path.startswith("/records/"):
+                    record = stub.records.get(unquote(url.path[len("/records/") :]))
+                    if record is not None:
+                        self._send(200, record)
+                        return
+                self._send(404, {"detail": "Not found"})
+
+            def _send(
+                self, status: int, payload: Any, headers: Dict[str, str] | None = None
+            ) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a stub provider feed.")
+    parser.add_argument("--provider", default="eurlex")
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of 503s")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = StubFeedServer(
+        synthetic_records(args.provider, args.records),
+        page_size=args.page_size,
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Serving {len(server.records)} {args.provider} records on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
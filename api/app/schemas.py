@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import Any, List, Optional
+from typing import Any, List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -22,6 +22,12 @@ class DisciplineOut(ORMBase, DisciplineCreate):
     updated_at: datetime
 
 
+class DisciplineSummary(ORMBase):
+    id: int
+    code: str
+    name: str
+
+
 class TagCreate(BaseModel):
     name: str
 
@@ -54,6 +60,12 @@ class WorkOut(ORMBase):
     updated_at: datetime
 
 
+class WorkPage(BaseModel):
+    items: List[WorkOut]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
 class WorkSummary(ORMBase):
     id: int
     authority: str
@@ -94,6 +106,12 @@ class EditionOut(ORMBase):
     updated_at: datetime
 
 
+class EditionPage(BaseModel):
+    items: List[EditionOut]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
 class EditionSummary(ORMBase):
     id: int
     edition_label: str
@@ -102,6 +120,35 @@ class EditionSummary(ORMBase):
     work: WorkSummary
 
 
+class SearchResult(BaseModel):
+    work: WorkOut
+    primary_discipline: Optional[DisciplineSummary] = None
+    latest_edition: Optional[EditionOut] = None
+    editions: List[EditionOut] = Field(default_factory=list)
+
+
+class SearchPage(BaseModel):
+    items: List[SearchResult]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class FacetBucket(BaseModel):
+    value: Optional[bool | int | str] = None
+    count: int
+
+
+class SearchFacets(BaseModel):
+    total: int
+    authority: List[FacetBucket] = Field(default_factory=list)
+    status: List[FacetBucket] = Field(default_factory=list)
+    primary_discipline: List[FacetBucket] = Field(default_factory=list)
+    secondary_discipline: List[FacetBucket] = Field(default_factory=list)
+    tag: List[FacetBucket] = Field(default_factory=list)
+    has_attachment: List[FacetBucket] = Field(default_factory=list)
+    has_official_link: List[FacetBucket] = Field(default_factory=list)
+
+
 class EditionUpdate(BaseModel):
     edition_label: Optional[str] = None
     publication_date: Optional[date] = None
@@ -133,6 +180,9 @@ class ListFilters(BaseModel):
     has_attachment: Optional[bool] = None
     has_official_link: Optional[bool] = None
     include_related: bool = False
+    related_max_depth: int = Field(default=3, ge=1, le=10)
+    related_types: Optional[List[str]] = None
+    related_min_confidence: Optional[float] = Field(default=None, ge=0, le=1)
 
 
 class ListCreate(BaseModel):
@@ -161,6 +211,18 @@ class ListOut(ORMBase):
     source_filter_json: dict[str, Any]
     regeneration_mode: str
     preserve_overrides: bool
+    content_version: int
+
+
+class ListRegenerationOut(ORMBase):
+    id: int
+    list_id: int
+    regenerated_at: datetime
+    source: str
+    added_edition_ids: List[int]
+    removed_edition_ids: List[int]
+    overrides_kept: int
+    overrides_reset: int
 
 
 class ListItemUpdate(BaseModel):
@@ -172,6 +234,33 @@ class ManualAddItem(BaseModel):
     note: Optional[str] = None
 
 
+class ListItemOperation(BaseModel):
+    """One entry of a batch: ``item_id`` for include/exclude/note, ``edition_id`` for manual_add."""
+
+    op: Literal["include", "exclude", "note", "manual_add"]
+    item_id: Optional[int] = None
+    edition_id: Optional[int] = None
+    note: Optional[str] = None
+
+
+class ListItemBatch(BaseModel):
+    operations: List[ListItemOperation] = Field(min_length=1, max_length=10_000)
+
+
+class ListItemOperationResult(BaseModel):
+    index: int
+    op: str
+    # "ok", "not_found", "already_listed" or "invalid".
+    status: str
+    item_id: Optional[int] = None
+
+
+class ListItemBatchResult(BaseModel):
+    applied: int
+    failed: int
+    results: List[ListItemOperationResult]
+
+
 class ListItemOut(ORMBase):
     id: int
     list_id: int
@@ -209,3 +298,22 @@ class IngestionRunOut(ORMBase):
     finished_at: Optional[datetime]
     error_message: Optional[str]
     records_imported: int
+    records_created: int
+    records_updated: int
+    records_skipped: int
+    force_refresh: bool
+    full_resync: bool
+    since: Optional[datetime]
+    high_water_mark: Optional[datetime]
+    checkpoint_cursor: Optional[str]
+    checkpoint_external_id: Optional[str]
+    worker_id: Optional[str]
+    heartbeat_at: Optional[datetime]
+    attempts: int
+
+
+class ProviderWatermarkOut(ORMBase):
+    provider: str
+    high_water_mark: datetime
+    run_id: Optional[int]
+    updated_at: datetime
@@ -0,0 +1,129 @@
+"""Immutable snapshots of frozen lists.
+
+A list is frozen once it is finalised (``status == "final"``) or switched
+to the ``"frozen"`` regeneration mode. Freezing stores a ``ListSnapshot``
+holding the list's items and its export rows, denormalised (identifiers,
+titles, edition labels, dates, statuses, discipline names) and compressed
+as gzip NDJSON. While the snapshot exists, item listings and exports read
+it instead of joining the catalogue: a frozen list costs one row read and
+renders the same whatever later happens to works, editions or disciplines.
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from datetime import date
+import gzip
+import io
+import json
+from typing import Iterator
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, joinedload
+
+from app.exports import EXPORT_BATCH_SIZE, export_rows_statement
+from app.models import DocumentEdition, ListSnapshot, NormativeList, NormativeListItem
+from app.schemas import ListItemOut
+
+FROZEN_STATUS = "final"
+FROZEN_MODE = "frozen"
+
+# Column layout of ``export_rows_statement``; snapshot rows are stored as
+# JSON arrays in this order.
+EXPORT_ROW_FIELDS = (
+    "discipline_id",
+    "discipline_name",
+    "sort_order",
+    "kind",
+    "primary_name",
+    "item_id",
+    "identifier",
+    "title",
+    "authority",
+    "edition_label",
+    "publication_date",
+    "status",
+    "note",
+)
+
+SnapshotExportRow = namedtuple("SnapshotExportRow", EXPORT_ROW_FIELDS)
+_PUBLICATION_DATE = EXPORT_ROW_FIELDS.index("publication_date")
+
+
+def is_frozen(normative_list: NormativeList) -> bool:
+    return (
+        normative_list.status == FROZEN_STATUS
+        or normative_list.regeneration_mode == FROZEN_MODE
+    )
+
+
+def frozen_lists():
+    """SQL condition matching the lists ``is_frozen`` is true for."""
+    return or_(
+        NormativeList.status == FROZEN_STATUS,
+        NormativeList.regeneration_mode == FROZEN_MODE,
+    )
+
+
+def build_list_snapshot(db: Session, list_id: int) -> ListSnapshot:
+    """Capture the current items and export rows of ``list_id``."""
+    items = (
+        db.query(NormativeListItem)
+        .options(joinedload(NormativeListItem.edition).joinedload(DocumentEdition.work))
+        .filter(NormativeListItem.list_id == list_id)
+        .order_by(NormativeListItem.added_at, NormativeListItem.id)
+    )
+    item_lines = io.BytesIO()
+    item_count = 0
+    with gzip.GzipFile(fileobj=item_lines, mode="wb") as output:
+        for item in items.yield_per(EXPORT_BATCH_SIZE):
+            output.write(ListItemOut.model_validate(item).model_dump_json().encode("utf-8"))
+            output.write(b"\n")
+            item_count += 1
+
+    rows = db.execute(
+        export_rows_statement(list_id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    row_lines = io.BytesIO()
+    with gzip.GzipFile(fileobj=row_lines, mode="wb") as output:
+        for row in rows:
+            values = list(row)
+            if values[_PUBLICATION_DATE] is not None:
+                values[_PUBLICATION_DATE] = values[_PUBLICATION_DATE].isoformat()
+            output.write(json.dumps(values, separators=(",", ":")).encode("utf-8"))
+            output.write(b"\n")
+
+    return ListSnapshot(
+        list_id=list_id,
+        item_count=item_count,
+        items=item_lines.getvalue(),
+        export_rows=row_lines.getvalue(),
+    )
+
+
+def sync_list_snapshot(db: Session, normative_list: NormativeList) -> None:
+    """Snapshot a list that has just been frozen, or drop the snapshot of an unfrozen one."""
+    db.flush()
+    snapshot = db.get(ListSnapshot, normative_list.id)
+    if is_frozen(normative_list):
+        if snapshot is None:
+            db.add(build_list_snapshot(db, normative_list.id))
+    elif snapshot is not None:
+        db.delete(snapshot)
+
+
+def snapshot_items_json(items: bytes) -> bytes:
+    """The snapshot's items as a JSON array, without re-serialising them."""
+    # JSON encoding escapes newlines inside strings, so every newline in
+    # the NDJSON stream is a record separator.
+    lines = gzip.decompress(items).rstrip(b"\n")
+    return b"[" + lines.replace(b"\n", b",") + b"]"
+
+
+def snapshot_export_rows(export_rows: bytes) -> Iterator[SnapshotExportRow]:
+    """Decode the snapshot's export rows, in the order ``render_export`` expects."""
+    with gzip.GzipFile(fileobj=io.BytesIO(export_rows)) as lines:
+        for line in lines:
+            row = SnapshotExportRow(*json.loads(line))
+            if row.publication_date is not None:
+                row = row._replace(publication_date=date.fromisoformat(row.publication_date))
+            yield row
@@ -0,0 +1,104 @@
+"""Ingestion worker pool: ``python -m app.worker [--concurrency N]``.
+
+Starts ``INGESTION_WORKERS`` processes, separate from the API, that poll
+the ingestion run queue (``app.ingestion.queue``) and process one run at a
+time each. Idle workers also requeue runs whose lease expired, so runs left
+behind by a crashed or killed worker are picked up again from their
+checkpoint. Exited workers are restarted; SIGTERM/SIGINT stop the pool
+after the workers finish their current run.
+
+Worker processes import the ingestion job (``app.ingestion.jobs``), not the
+API, so spawning one does not touch the schema; the pool creates and
+upgrades it once at startup.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from uuid import uuid4
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_POLL_SECONDS = float(os.getenv("INGESTION_POLL_SECONDS", "2"))
+
+logger = logging.getLogger("app.worker")
+
+
+def work(poll_seconds: float) -> None:
+    """Worker process loop: claim a queued run, process it under a heartbeat, repeat."""
+    from app.db import SessionLocal, engine
+    from app.ingestion.queue import Heartbeat, claim_next_run, recover_expired_runs
+    from app.ingestion.jobs import run_ingestion_job
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+    logger.info("Ingestion worker %s started", worker_id)
+
+    while not stopping.is_set():
+        db = SessionLocal()
+        try:
+            recover_expired_runs(db)
+            run_id = claim_next_run(db, worker_id)
+        except Exception:
+            logger.exception("Could not poll the ingestion queue")
+            run_id = None
+        finally:
+            db.close()
+        if run_id is None:
+            stopping.wait(poll_seconds)
+            continue
+        logger.info("Worker %s processing ingestion run %s", worker_id, run_id)
+        with Heartbeat(engine, run_id, worker_id):
+            run_ingestion_job(run_id, worker_id=worker_id)
+    logger.info("Ingestion worker %s stopped", worker_id)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the ingestion worker pool.")
+    parser.add_argument("--concurrency", type=int, default=INGESTION_WORKERS)
+    parser.add_argument("--poll-seconds", type=float, default=INGESTION_POLL_SECONDS)
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s"
+    )
+
+    # Create and upgrade the schema once, before any worker starts.
+    from app.db import engine
+    from app.migrations import upgrade_schema
+    from app.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    context = multiprocessing.get_context("spawn")
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+
+    def spawn(index: int) -> multiprocessing.process.BaseProcess:
+        process = context.Process(
+            target=work, args=(args.poll_seconds,), name=f"ingestion-worker-{index}"
+        )
+        process.start()
+        return process
+
+    processes = [spawn(index) for index in range(max(args.concurrency, 1))]
+    while not stopping.wait(1.0):
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning("%s exited with %s; restarting", process.name, process.exitcode)
+                processes[index] = spawn(index)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
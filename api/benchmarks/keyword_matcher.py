@@ -0,0 +1,119 @@
+"""Cost of ``KeywordMatcher`` as the rule count and the text length grow.
+
+    python -m benchmarks.keyword_matcher
+
+Two sweeps over deterministic random words: the rule count varies while
+the text length is fixed, then the text length varies while the rule count
+is fixed. Each row compares the matcher with scanning the text once per
+keyword, which is what mapping did before the automaton.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import string
+import time
+from typing import Callable
+
+from app.ingestion.mapping import KeywordMatcher, normalize_text
+
+KEYWORDS_PER_RULE = 3
+RULE_COUNTS = (10, 100, 1_000, 10_000)
+TEXT_LENGTHS = (1_000, 10_000, 100_000)
+FIXED_RULES = 1_000
+FIXED_TEXT_LENGTH = 10_000
+
+
+class Corpus:
+    def __init__(self, seed: int) -> None:
+        self.random = random.Random(seed)
+        self.vocabulary = [self._word() for _ in range(20_000)]
+
+    def _word(self) -> str:
+        length = self.random.randint(4, 10)
+        return "".join(self.random.choice(string.ascii_lowercase) for _ in range(length))
+
+    def rules(self, count: int) -> dict[int, list[str]]:
+        return {
+            label: [
+                " ".join(self.random.choices(self.vocabulary, k=self.random.randint(1, 2)))
+                for _ in range(KEYWORDS_PER_RULE)
+            ]
+            for label in range(count)
+        }
+
+    def text(self, length: int) -> str:
+        words: list[str] = []
+        size = 0
+        while size < length:
+            word = self.random.choice(self.vocabulary)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)[:length]
+
+
+def per_keyword_scan(rules: dict[int, list[str]]) -> Callable[[str], set[int]]:
+    keywords = [
+        (label, f" {normalize_text(keyword)} ")
+        for label, label_keywords in rules.items()
+        for keyword in label_keywords
+    ]
+
+    def labels(text: str) -> set[int]:
+        padded = f" {normalize_text(text)} "
+        return {label for label, keyword in keywords if keyword in padded}
+
+    return labels
+
+
+def timed(function: Callable[[str], set[int]], text: str, repeat: int) -> tuple[float, set[int]]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found = function(text)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), found
+
+
+def row(corpus: Corpus, rule_count: int, text_length: int, repeat: int) -> None:
+    rules = corpus.rules(rule_count)
+    text = corpus.text(text_length)
+    started = time.perf_counter()
+    matcher = KeywordMatcher(rules)
+    build = (time.perf_counter() - started) * 1000
+    automaton, found = timed(lambda value: matcher.labels([value]), text, repeat)
+    scan, expected = timed(per_keyword_scan(rules), text, repeat)
+    assert found == expected, "the matcher and the per-keyword scan disagree"
+    print(
+        f"{rule_count:>7} {text_length:>9} {build:>9.1f}ms "
+        f"{automaton:>9.2f}ms {scan:>10.2f}ms {len(found):>7}"
+    )
+
+
+def run(seed: int, repeat: int) -> None:
+    corpus = Corpus(seed)
+    header = (
+        f"{'rules':>7} {'chars':>9} {'build':>11} {'matcher':>11} "
+        f"{'per keyword':>12} {'matches':>7}"
+    )
+    print(f"Text length fixed at {FIXED_TEXT_LENGTH} characters")
+    print(header)
+    for rule_count in RULE_COUNTS:
+        row(corpus, rule_count, FIXED_TEXT_LENGTH, repeat)
+    print(f"\nRule count fixed at {FIXED_RULES}")
+    print(header)
+    for text_length in TEXT_LENGTHS:
+        row(corpus, FIXED_RULES, text_length, repeat)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.seed, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Latency of ``/api/search/facets`` on a synthetic catalogue.
+
+    DATABASE_URL=... python -m benchmarks.search_facets generate --editions 500000
+    DATABASE_URL=... python -m benchmarks.search_facets run
+
+``generate`` fills an empty (or, with ``--reset``, emptied) database with
+a deterministic catalogue: two editions per work across six authorities
+and five statuses, 60 disciplines, 200 tags, official links, attachments
+and generated titles. ``run`` times each scenario through the API and
+compares the median with the 50 ms budget.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+BUDGET_MS = 50.0
+
+# Titles have two of ``TERMS`` synthetic terms (about 0.5% of the works
+# each) and, in one work in fifty, the common word ``COMMON_WORD``.
+TERMS = 400
+COMMON_WORD = "sicurezza"
+
+SCENARIOS = (
+    ("no filters", {}),
+    ("status", {"status": ["in_force"]}),
+    ("authority + status + disciplines", {
+        "authority": ["EU", "IT"], "status": ["in_force"], "discipline_ids": [3, 4],
+    }),
+    ("tags + attachment", {"tag_ids": [3, 5, 7], "has_attachment": True}),
+    ("latest in force", {"only_latest_in_force": True}),
+    ("text, one term", {"query": "voce42"}),
+    ("text, two terms + status", {"query": "voce42 voce8", "status": ["in_force"]}),
+    ("text, common word", {"query": COMMON_WORD}),
+    ("publication date from", {"publication_date_from": "2015-01-01"}),
+    ("publication date range", {
+        "publication_date_from": "2012-03-15", "publication_date_to": "2019-09-30",
+    }),
+    ("updated recently", {"updated_from": "2025-05-01T00:00:00"}),
+)
+
+
+def generate(editions: int, reset: bool) -> None:
+    from app.db import engine
+    from app.facets import rebuild_edition_facets
+    import app.main  # noqa: F401  (creates and upgrades the schema)
+    from app.models import Base
+
+    works = editions // 2
+    with engine.begin() as connection:
+        if reset:
+            tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+            connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        elif connection.execute(text("SELECT 1 FROM document_editions LIMIT 1")).first():
+            sys.exit("The database already has editions; use --reset to replace them.")
+        connection.execute(
+            text(
+                "INSERT INTO discipline_categories (code, name, version, sort_order, active) "
+                "SELECT 'D' || n, 'Disciplina ' || n, 'v1', n, true "
+                "FROM generate_series(1, 60) AS n"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO user_tags (name, normalized_name) "
+                "SELECT 'Tag ' || n, 'tag ' || n FROM generate_series(1, 200) AS n"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO document_works "
+                "(authority, identifier, canonical_identifier, title, abstract, "
+                "primary_discipline_id) "
+                "SELECT (ARRAY['ISO', 'IEC', 'EU', 'IT', 'UNI', 'CEI'])[n % 6 + 1], "
+                "'SYN ' || n, 'SYN' || n, "
+                "CASE WHEN n % 50 = 0 THEN :common || ' ' ELSE '' END "
+                "|| 'voce' || (n * 7 % :terms + 1) || ' voce' || (n * 13 % (:terms - 3) + 1) "
+                "|| ' ' || n, "
+                "'Norma sintetica ' || n, n % 60 + 1 "
+                "FROM generate_series(1, :works) AS n"
+            ),
+            {"works": works, "common": COMMON_WORD, "terms": TERMS},
+        )
+        connection.execute(
+            text(
+                "INSERT INTO work_disciplines (work_id, discipline_id) "
+                "SELECT id, (id * 7) % 60 + 1 FROM document_works WHERE id % 10 < 9 "
+                "UNION SELECT id, (id * 13) % 60 + 1 FROM document_works WHERE id % 4 = 0"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO work_tags (work_id, tag_id) "
+                "SELECT id, (id * 11) % 200 + 1 FROM document_works WHERE id % 2 = 0"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO document_editions "
+                "(work_id, edition_label, publication_date, status, source_canonical_url, "
+                "updated_at) "
+                "SELECT work.id, 'ed' || k, "
+                "date '2000-01-01' + ((work.id * 37 + k * 1500) % 9000), "
+                "(ARRAY['in_force', 'withdrawn', 'superseded', 'draft', 'unknown'])"
+                "[(work.id + k) % 5 + 1], "
+                "CASE WHEN (work.id + k) % 3 = 0 THEN 'https://example.org/' || work.id || '/' || k "
+                "END, "
+                "timestamp '2020-01-01' + ((work.id * 17 + k) % 2000) * interval '1 day' "
+                "FROM document_works AS work CROSS JOIN generate_series(1, 2) AS k"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO local_attachments "
+                "(edition_id, filename, mime_type, size_bytes, sha256, storage_path) "
+                "SELECT id, 'synthetic.pdf', 'application/pdf', 1, md5(id::text), "
+                "'/dev/null' FROM document_editions WHERE id % 47 = 0"
+            )
+        )
+        connection.execute(
+            text(
+                "UPDATE document_works AS work SET latest_in_force_edition_id = latest.id "
+                "FROM (SELECT DISTINCT ON (work_id) work_id, id FROM document_editions "
+                "WHERE status = 'in_force' "
+                "ORDER BY work_id, publication_date DESC NULLS LAST, id DESC) AS latest "
+                "WHERE latest.work_id = work.id"
+            )
+        )
+        rebuild_edition_facets(connection)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM ANALYZE"))
+    print(f"Generated {works} works and {works * 2} editions.")
+
+
+def run(repeat: int) -> bool:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    within_budget = True
+    print(f"{'scenario':34} {'editions':>9} {'median':>9} {'p95':>9}")
+    for name, params in SCENARIOS:
+        response = client.get("/api/search/facets", params=params)
+        response.raise_for_status()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get("/api/search/facets", params=params).raise_for_status()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        median = statistics.median(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        mark = "ok" if median < BUDGET_MS else "OVER"
+        within_budget = within_budget and median < BUDGET_MS
+        print(
+            f"{name:34} {response.json()['total']:>9} "
+            f"{median:>7.1f}ms {p95:>7.1f}ms  {mark}"
+        )
+    return within_budget
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_parser = commands.add_parser("generate", help="create the synthetic catalogue")
+    generate_parser.add_argument("--editions", type=int, default=500_000)
+    generate_parser.add_argument("--reset", action="store_true")
+    run_parser = commands.add_parser("run", help="time the facet scenarios")
+    run_parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    if args.command == "generate":
+        generate(args.editions, args.reset)
+    elif not run(args.repeat):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
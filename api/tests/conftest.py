@@ -0,0 +1,109 @@
+"""Shared fixtures.
+
+Tests that need the database run against ``TEST_DATABASE_URL``, which must
+point to a disposable PostgreSQL database: the schema is created there and
+every table is emptied before each test. Without it those tests are skipped.
+"""
+from __future__ import annotations
+
+import os
+
+import pytest
+from sqlalchemy import event, text
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # Before anything imports app.db, which binds its engine at import time.
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+
+@pytest.fixture(scope="session")
+def app_main():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    import app.main
+
+    return app.main
+
+
+@pytest.fixture
+def engine(app_main):
+    from app.cache import bump_catalog_generation
+    from app.models import Base
+
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with app_main.engine.begin() as connection:
+        # Ids keep increasing across tests, so id-keyed caches never see a reused id.
+        connection.execute(text(f"TRUNCATE {tables} CASCADE"))
+    bump_catalog_generation()
+    return app_main.engine
+
+
+@pytest.fixture
+def db(engine):
+    from app.db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def stub_feed(monkeypatch):
+    """The eurlex provider pointed at a ``StubFeedServer`` on an ephemeral port.
+
+    25 records in pages of 10; the server's latency and failures can be
+    changed by the test. No database is needed.
+    """
+    from app.providers import client, eurlex
+    from app.providers.stub import StubFeedServer, synthetic_records
+
+    server = StubFeedServer(synthetic_records("eurlex", 25), page_size=10).start()
+    monkeypatch.setattr(eurlex, "FEED_URL", server.url)
+    monkeypatch.setattr(client, "HTTP_BACKOFF", 0.01)
+    # Concurrency limits are read once per provider; start from none.
+    monkeypatch.setattr(client, "_semaphores", {})
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def client(engine, app_main):
+    from fastapi.testclient import TestClient
+
+    return TestClient(app_main.app)
+
+
+class QueryCounter:
+    """Records the statements sent to the database while it is active."""
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+        self.statements: list[str] = []
+        # One bound method, so the same listener is removed as was added.
+        self._listener = self._record
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __enter__(self) -> "QueryCounter":
+        self.statements.clear()
+        event.listen(self.engine, "before_cursor_execute", self._listener)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._listener)
+
+
+@pytest.fixture
+def count_queries(engine):
+    """``with count_queries() as queries:`` counts the statements run in the block."""
+    return lambda: QueryCounter(engine)
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app.facets import rebuild_edition_facets
+from app.models import (
+    DocumentEdition,
+    DocumentWork,
+    EditionFacet,
+    LocalAttachment,
+    SearchFacetCell,
+    SearchFacetCellYear,
+    WorkDiscipline,
+    WorkTag,
+)
+
+FILTER_SETS = [
+    {},
+    {"authority": ["ISO"]},
+    {"status": ["in_force", "draft"]},
+    {"discipline_ids": ["D1"]},
+    {"tag_ids": ["T1", "T2"]},
+    {"authority": ["ISO", "EU"], "tag_ids": ["T2"], "has_official_link": True},
+    {"only_latest_in_force": True},
+    {"has_attachment": True, "status": ["in_force"]},
+    {"publication_date_from": "2015-01-01", "discipline_ids": ["D2"]},
+    {"publication_date_to": "2016-06-30", "status": ["withdrawn", "in_force"]},
+    {"publication_date_from": "2014-06-01", "publication_date_to": "2018-12-31"},
+    {"publication_date_from": "2016-01-01", "publication_date_to": "2016-06-30"},
+    {"publication_date_from": "2017-02-01", "authority": ["ISO"]},
+    {"publication_date_from": "2016-09-01", "publication_date_to": "2017-03-31"},
+    {"publication_date_from": "2008-09-01", "publication_date_to": "2016-08-31"},
+    {"publication_date_to": "2020-08-01", "tag_ids": ["T2"]},
+    {"publication_date_from": "2020-03-01"},
+    {"query": "ISO", "tag_ids": ["T1"]},
+    {"query": "EU IT", "only_latest_in_force": True},
+]
+
+
+@pytest.fixture
+def catalogue(client):
+    disciplines = {
+        code: client.post("/api/disciplines", json={"code": code, "name": code}).json()["id"]
+        for code in ("D1", "D2", "D3")
+    }
+    tags = {
+        name: client.post("/api/tags", json={"name": name}).json()["id"]
+        for name in ("T1", "T2")
+    }
+    works = [
+        ("ISO", "ISO 1", "D1", ["D2"], ["T1"]),
+        ("ISO", "ISO 2", "D2", [], ["T1", "T2"]),
+        ("EU", "EU 1", "D3", ["D1", "D2"], []),
+        ("IT", "IT 1", None, [], ["T2"]),
+    ]
+    editions = []
+    for index, (authority, identifier, primary, secondary, work_tags) in enumerate(works):
+        work = client.post(
+            "/api/works",
+            json={
+                "authority": authority,
+                "identifier": identifier,
+                "title": identifier,
+                "primary_discipline_id": disciplines.get(primary),
+                "secondary_discipline_ids": [disciplines[code] for code in secondary],
+                "tag_ids": [tags[name] for name in work_tags],
+            },
+        ).json()
+        for year, status in ((2008, "withdrawn"), (2015 + index, "in_force"), (2020, "draft")):
+            editions.append(
+                client.post(
+                    "/api/editions",
+                    json={
+                        "work_id": work["id"],
+                        "edition_label": str(year),
+                        "publication_date": f"{year}-{1 + index * 3:02d}-01",
+                        "status": status,
+                        "source_canonical_url": f"https://example.org/{work['id']}"
+                        if year % 2 == 0
+                        else None,
+                    },
+                ).json()
+            )
+    client.post(
+        f"/api/editions/{editions[1]['id']}/attachments",
+        files={"file": ("a.pdf", b"%PDF facet test", "application/pdf")},
+    )
+    return {"disciplines": disciplines, "tags": tags, "editions": editions}
+
+
+def _params(filters: dict, catalogue: dict) -> dict:
+    params = dict(filters)
+    if "discipline_ids" in params:
+        params["discipline_ids"] = [catalogue["disciplines"][c] for c in params["discipline_ids"]]
+    if "tag_ids" in params:
+        params["tag_ids"] = [catalogue["tags"][name] for name in params["tag_ids"]]
+    return params
+
+
+def _expected_facets(app_main, db, params: dict) -> dict:
+    """Facet counts computed edition by edition from the catalogue tables."""
+    text_matches = None
+    if params.get("query"):
+        tsquery = app_main.build_search_query(params["query"])
+        text_matches = set(
+            db.scalars(select(DocumentWork.id).where(DocumentWork.search_vector.op("@@")(tsquery)))
+        )
+    secondary: dict[int, set[int]] = {}
+    for work_id, discipline_id in db.execute(
+        select(WorkDiscipline.work_id, WorkDiscipline.discipline_id)
+    ):
+        secondary.setdefault(work_id, set()).add(discipline_id)
+    tags: dict[int, set[int]] = {}
+    for work_id, tag_id in db.execute(select(WorkTag.work_id, WorkTag.tag_id)):
+        tags.setdefault(work_id, set()).add(tag_id)
+    attached = set(db.scalars(select(LocalAttachment.edition_id)))
+    rows = db.execute(select(DocumentEdition, DocumentWork).join(DocumentEdition.work)).all()
+
+    date_from = params.get("publication_date_from")
+    date_to = params.get("publication_date_to")
+    checks = {
+        "authority": lambda e, w: w.authority in params["authority"],
+        "status": lambda e, w: e.status in params["status"],
+        "discipline": lambda e, w: w.primary_discipline_id in params["discipline_ids"]
+        or bool(secondary.get(w.id, set()) & set(params["discipline_ids"])),
+        "tag": lambda e, w: bool(tags.get(w.id, set()) & set(params["tag_ids"])),
+        "has_attachment": lambda e, w: (e.id in attached) == params["has_attachment"],
+        "has_official_link": lambda e, w: (e.source_canonical_url is not None)
+        == params["has_official_link"],
+    }
+    active = {
+        name: check
+        for name, check in checks.items()
+        if params.get({"discipline": "discipline_ids", "tag": "tag_ids"}.get(name, name))
+        is not None
+    }
+
+    def base(edition, work) -> bool:
+        if params.get("only_latest_in_force") and edition.id != work.latest_in_force_edition_id:
+            return False
+        if date_from and (
+            edition.publication_date is None
+            or edition.publication_date < date.fromisoformat(date_from)
+        ):
+            return False
+        if date_to and (
+            edition.publication_date is None
+            or edition.publication_date > date.fromisoformat(date_to)
+        ):
+            return False
+        return text_matches is None or work.id in text_matches
+
+    def counts(ignored: str | None, values) -> Counter:
+        counter: Counter = Counter()
+        for edition, work in rows:
+            if base(edition, work) and all(
+                check(edition, work) for name, check in active.items() if name != ignored
+            ):
+                counter.update(values(edition, work))
+        return counter
+
+    expected = {
+        "total": sum(counts(None, lambda e, w: [None]).values()),
+        "authority": counts("authority", lambda e, w: [w.authority]),
+        "status": counts("status", lambda e, w: [e.status]),
+        "primary_discipline": counts("discipline", lambda e, w: [w.primary_discipline_id]),
+        "secondary_discipline": counts("discipline", lambda e, w: secondary.get(w.id, ())),
+        "tag": counts("tag", lambda e, w: tags.get(w.id, ())),
+        "has_attachment": counts("has_attachment", lambda e, w: [e.id in attached]),
+        "has_official_link": counts(
+            "has_official_link", lambda e, w: [e.source_canonical_url is not None]
+        ),
+    }
+    return expected
+
+
+def _assert_facets_match(app_main, client, db, catalogue):
+    db.expire_all()
+    for filters in FILTER_SETS:
+        params = _params(filters, catalogue)
+        response = client.get("/api/search/facets", params=params)
+        assert response.status_code == 200, response.text
+        facets = response.json()
+        expected = _expected_facets(app_main, db, params)
+        assert facets["total"] == expected.pop("total"), filters
+        for facet, counter in expected.items():
+            actual = {bucket["value"]: bucket["count"] for bucket in facets[facet]}
+            assert actual == dict(counter), (filters, facet)
+
+
+def _aggregate(db) -> tuple[dict, set, set]:
+    cells = {
+        cell_key: editions
+        for cell_key, editions in db.execute(
+            select(SearchFacetCell.cell_key, SearchFacetCell.editions)
+        )
+        if editions
+    }
+    entries = set(
+        db.execute(
+            select(
+                EditionFacet.edition_id,
+                SearchFacetCell.cell_key,
+                EditionFacet.work_id,
+                EditionFacet.publication_date,
+                EditionFacet.updated_at,
+            ).join(SearchFacetCell, SearchFacetCell.id == EditionFacet.cell_id)
+        ).all()
+    )
+    years = set(
+        db.execute(
+            select(
+                SearchFacetCell.cell_key,
+                SearchFacetCellYear.publication_year,
+                SearchFacetCellYear.editions,
+            )
+            .join(SearchFacetCell, SearchFacetCell.id == SearchFacetCellYear.cell_id)
+            .where(SearchFacetCellYear.editions > 0)
+        ).all()
+    )
+    return cells, entries, years
+
+
+def test_facets_follow_catalogue_changes(app_main, client, db, catalogue):
+    editions = catalogue["editions"]
+    _assert_facets_match(app_main, client, db, catalogue)
+
+    client.patch(f"/api/editions/{editions[0]['id']}", json={"status": "in_force"})
+    client.patch(f"/api/editions/{editions[2]['id']}", json={"publication_date": "2017-03-01"})
+    client.patch(
+        f"/api/works/{editions[3]['work_id']}",
+        json={"tag_ids": [catalogue["tags"]["T1"]], "secondary_discipline_ids": []},
+    )
+    client.delete(f"/api/editions/{editions[4]['id']}")
+    client.delete(f"/api/works/{editions[6]['work_id']}")
+    _assert_facets_match(app_main, client, db, catalogue)
+
+    maintained = _aggregate(db)
+    db.rollback()
+    with db.get_bind().begin() as connection:
+        rebuild_edition_facets(connection)
+    assert _aggregate(db) == maintained
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from app.db import SessionLocal
+from app.ingestion import queue
+from app.ingestion.queue import claim_next_run, recover_expired_runs
+from app.models import IngestionRun
+
+
+def _queue_runs(db, *providers: str) -> list[int]:
+    runs = [IngestionRun(provider=provider, status=queue.QUEUED) for provider in providers]
+    db.add_all(runs)
+    db.commit()
+    return [run.id for run in runs]
+
+
+def _running_run(db, provider: str, heartbeat_age: timedelta, attempts: int) -> int:
+    run = IngestionRun(
+        provider=provider,
+        status=queue.RUNNING,
+        worker_id="gone",
+        heartbeat_at=datetime.utcnow() - heartbeat_age,
+        attempts=attempts,
+    )
+    db.add(run)
+    db.commit()
+    return run.id
+
+
+def test_claim_skips_runs_locked_by_another_worker(db):
+    first, second = _queue_runs(db, "eurlex", "iso")
+    with closing(SessionLocal()) as other:
+        # Another worker is in the middle of claiming the oldest run.
+        other.execute(
+            select(IngestionRun).where(IngestionRun.id == first).with_for_update()
+        )
+        # Without SKIP LOCKED the claim would wait here instead.
+        db.execute(text("SET LOCAL lock_timeout = '2s'"))
+
+        assert claim_next_run(db, "worker-b") == second
+        other.rollback()
+
+    assert claim_next_run(db, "worker-a") == first
+
+
+def test_claim_allows_one_running_run_per_provider(db):
+    first, second, iso = _queue_runs(db, "eurlex", "eurlex", "iso")
+
+    assert claim_next_run(db, "worker-a") == first
+    assert claim_next_run(db, "worker-b") == iso
+    assert claim_next_run(db, "worker-c") is None
+
+    run = db.get(IngestionRun, first)
+    assert (run.status, run.worker_id, run.attempts) == (queue.RUNNING, "worker-a", 1)
+    run.status = "completed"
+    db.commit()
+
+    assert claim_next_run(db, "worker-c") == second
+
+
+def test_concurrent_claims_of_one_provider_start_one_run(db):
+    first, second = _queue_runs(db, "eurlex", "eurlex")
+    with closing(SessionLocal()) as other:
+        # Worker A has claimed the first run but not committed yet.
+        run = other.scalars(
+            select(IngestionRun).where(IngestionRun.id == first).with_for_update()
+        ).one()
+        run.status = queue.RUNNING
+        other.flush()
+        with ThreadPoolExecutor(1) as pool:
+            claimed = pool.submit(claim_next_run, db, "worker-b")
+            other.commit()
+            # Worker B either sees the running run or loses on the unique index.
+            assert claimed.result(timeout=10) is None
+
+    assert db.get(IngestionRun, second).status == queue.QUEUED
+
+
+def test_expired_leases_are_requeued_until_attempts_run_out(db):
+    expired = timedelta(seconds=queue.INGESTION_LEASE_SECONDS + 60)
+    requeued = _running_run(db, "eurlex", expired, attempts=1)
+    exhausted = _running_run(db, "iso", expired, attempts=queue.INGESTION_MAX_ATTEMPTS)
+    alive = _running_run(db, "normattiva", timedelta(seconds=1), attempts=1)
+    since = datetime(2024, 1, 1)
+    db.get(IngestionRun, requeued).since = since
+    db.commit()
+
+    assert recover_expired_runs(db) == 2
+
+    db.expire_all()
+    run = db.get(IngestionRun, requeued)
+    assert (run.status, run.worker_id, run.finished_at) == (queue.QUEUED, None, None)
+    assert run.error_message == "Worker lease expired; requeued"
+    run = db.get(IngestionRun, exhausted)
+    assert (run.status, run.worker_id) == (queue.FAILED, None)
+    assert run.finished_at is not None
+    assert run.error_message == "Worker lease expired too many times"
+    run = db.get(IngestionRun, alive)
+    assert (run.status, run.worker_id) == (queue.RUNNING, "gone")
+
+    # The requeued run is claimed again with the same change window.
+    assert claim_next_run(db, "worker-a") == requeued
+    run = db.get(IngestionRun, requeued)
+    assert (run.status, run.attempts, run.since) == (queue.RUNNING, 2, since)
+    assert recover_expired_runs(db) == 0
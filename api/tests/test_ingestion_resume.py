@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from sqlalchemy import func, select
+
+from app.ingestion import jobs
+from app.ingestion.queue import claim_next_run
+from app.models import DocumentEdition, IngestionRun, SourceRecord
+
+WORKER = "test-worker"
+
+
+def _process_next_run(db) -> int:
+    run_id = claim_next_run(db, WORKER)
+    assert run_id is not None
+    jobs.run_ingestion_job(run_id, worker_id=WORKER)
+    db.expire_all()
+    return run_id
+
+
+def test_resumed_run_picks_up_after_the_last_committed_chunk(
+    client, db, stub_feed, monkeypatch
+):
+    monkeypatch.setattr(jobs, "INGESTION_COMMIT_SIZE", 4)
+    run_id = client.post("/api/ingestion/run", params={"provider": "eurlex"}).json()["run_id"]
+    # Page 1 (change list and 10 details) and page 2's change list are
+    # served; every later request fails, so page 2 never arrives.
+    stub_feed.fail_requests(10**6, after=12)
+
+    assert _process_next_run(db) == run_id
+
+    run = db.get(IngestionRun, run_id)
+    assert run.status == "failed"
+    assert "eurlex" in run.error_message
+    # Page 1 went in as chunks of 4, 4 and 2; the last one was never committed.
+    assert (run.checkpoint_cursor, run.checkpoint_external_id) == ("1", "eurlex:stub-000007")
+    assert (run.records_imported, run.records_created) == (8, 8)
+    assert db.scalar(select(func.count()).select_from(SourceRecord)) == 8
+
+    stub_feed.fail_requests(0)
+    requests = stub_feed.requests
+    resumed = client.post(f"/api/ingestion/runs/{run_id}/resume")
+    assert resumed.status_code == 200
+    assert (resumed.json()["status"], resumed.json()["error_message"]) == ("queued", None)
+
+    assert _process_next_run(db) == run_id
+
+    run = db.get(IngestionRun, run_id)
+    assert (run.status, run.attempts, run.error_message) == ("completed", 2, None)
+    assert (run.checkpoint_cursor, run.checkpoint_external_id) == (None, None)
+    # The counters continue from the first attempt's 8 records.
+    assert (
+        run.records_imported,
+        run.records_created,
+        run.records_updated,
+        run.records_skipped,
+    ) == (25, 25, 0, 0)
+    # Three change lists, and details only for the 17 records not yet committed.
+    assert stub_feed.requests - requests == 3 + 17
+    external_ids = db.scalars(select(SourceRecord.external_id).order_by(SourceRecord.external_id))
+    assert list(external_ids) == sorted(stub_feed.records)
+    assert db.scalar(select(func.count()).select_from(DocumentEdition)) == 25
+
+    assert client.post(f"/api/ingestion/runs/{run_id}/resume").status_code == 409
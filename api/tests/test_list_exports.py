@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+
+def test_export_conditional_requests_follow_the_etag(client):
+    work = client.post(
+        "/api/works", json={"authority": "ISO", "identifier": "ISO 1", "title": "Export"}
+    ).json()
+    client.post(
+        "/api/editions", json={"work_id": work["id"], "edition_label": "1", "status": "in_force"}
+    )
+    other = client.post(
+        "/api/editions", json={"work_id": work["id"], "edition_label": "2", "status": "draft"}
+    ).json()
+    normative_list = client.post(
+        "/api/lists", json={"name": "Export", "filters": {"status": ["in_force"]}}
+    ).json()
+    url = f"/api/lists/{normative_list['id']}/export/txt"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    last_modified = parsedate_to_datetime(first.headers["Last-Modified"])
+    assert abs(datetime.now(timezone.utc) - last_modified) < timedelta(minutes=1)
+    assert client.get(url, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    # A change within the same second keeps Last-Modified but not the ETag.
+    client.post(
+        f"/api/lists/{normative_list['id']}/items/manual-add", json={"edition_id": other["id"]}
+    )
+    stale = {
+        "If-None-Match": first.headers["ETag"],
+        "If-Modified-Since": first.headers["Last-Modified"],
+    }
+    changed = client.get(url, headers=stale)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != first.headers["ETag"]
+    assert client.get(
+        url, headers={"If-Modified-Since": changed.headers["Last-Modified"]}
+    ).status_code == 200
+    assert client.get(url, headers={"If-None-Match": changed.headers["ETag"]}).status_code == 304
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.mark.parametrize("works", [2, 20])
+def test_list_paths_issue_a_fixed_number_of_queries(client, count_queries, works):
+    primary = client.post("/api/disciplines", json={"code": "Q", "name": "Q"}).json()
+    secondary = client.post("/api/disciplines", json={"code": "Q2", "name": "Q2"}).json()
+    edition_ids = []
+    for index in range(works):
+        work = client.post(
+            "/api/works",
+            json={
+                "authority": "QC",
+                "identifier": f"QC {index}",
+                "title": "Query count",
+                "primary_discipline_id": primary["id"],
+                "secondary_discipline_ids": [secondary["id"]],
+            },
+        ).json()
+        edition = client.post(
+            "/api/editions",
+            json={"work_id": work["id"], "edition_label": "1", "status": "in_force"},
+        ).json()
+        edition_ids.append(edition["id"])
+    extra = client.post(
+        "/api/works", json={"authority": "XX", "identifier": "XX 1", "title": "Extra"}
+    ).json()
+    extra_edition = client.post(
+        "/api/editions", json={"work_id": extra["id"], "edition_label": "1"}
+    ).json()
+
+    with count_queries() as queries:
+        response = client.post("/api/lists", json={"name": "q", "filters": {"authority": ["QC"]}})
+    assert response.status_code == 200, response.text
+    assert queries.count == 6, queries.statements
+    list_id = response.json()["id"]
+
+    paths = [
+        ("items", lambda: client.get(f"/api/lists/{list_id}/items"), 2),
+        ("export", lambda: client.get(f"/api/lists/{list_id}/export/txt"), 3),
+        ("regenerate", lambda: client.post(f"/api/lists/{list_id}/regenerate"), 5),
+        (
+            "manual add",
+            lambda: client.post(
+                f"/api/lists/{list_id}/items/manual-add",
+                json={"edition_id": extra_edition["id"]},
+            ),
+            5,
+        ),
+    ]
+    for name, request, expected in paths:
+        with count_queries() as queries:
+            response = request()
+        assert response.status_code == 200, (name, response.text)
+        assert queries.count == expected, (name, queries.statements)
+
+    items = client.get(f"/api/lists/{list_id}/items").json()
+    assert sorted(item["edition_id"] for item in items) == sorted(
+        [*edition_ids, extra_edition["id"]]
+    )
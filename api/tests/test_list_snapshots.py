@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from app.schemas import ListItemOut
+
+
+def test_frozen_list_items_come_from_the_snapshot(client):
+    work = client.post(
+        "/api/works", json={"authority": "ISO", "identifier": "ISO 2", "title": "Before"}
+    ).json()
+    client.post(
+        "/api/editions", json={"work_id": work["id"], "edition_label": "1", "status": "in_force"}
+    )
+    normative_list = client.post(
+        "/api/lists", json={"name": "Frozen", "filters": {"authority": ["ISO"]}}
+    ).json()
+    url = f"/api/lists/{normative_list['id']}/items"
+    live = client.get(url).json()
+
+    client.patch(f"/api/lists/{normative_list['id']}", json={"status": "final"})
+    client.patch(f"/api/works/{work['id']}", json={"title": "After"})
+
+    frozen = client.get(url).json()
+    assert frozen == live
+    assert [ListItemOut.model_validate(item).model_dump(mode="json") for item in frozen] == frozen
+    assert frozen[0]["edition"]["work"]["title"] == "Before"
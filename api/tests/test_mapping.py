@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from app.ingestion.mapping import KeywordMatcher, _match_rules, normalize_text
+
+
+def test_keywords_match_whole_words_only():
+    matcher = KeywordMatcher({"qms": ["qms"], "quality": ["quality management"]})
+    assert matcher.labels(["ISO QMS audit"]) == {"qms"}
+    assert matcher.labels(["QMS"]) == {"qms"}
+    assert matcher.labels(["qms-based (QMS)"]) == {"qms"}
+    assert matcher.labels(["qmsx"]) == set()
+    assert matcher.labels(["xqms", "aqmsb"]) == set()
+    assert matcher.labels(["quality managements"]) == set()
+    assert matcher.labels(["Quality   management\tsystems"]) == {"quality"}
+
+
+def test_keywords_inside_other_keywords():
+    matcher = KeywordMatcher({"he": ["he"], "she": ["she"], "hers": ["hers"]})
+    assert matcher.labels(["ushers"]) == set()
+    assert matcher.labels(["she said hers"]) == {"she", "hers"}
+    assert matcher.labels(["he", "nothing"]) == {"he"}
+
+
+def test_matching_folds_case_and_accents():
+    matcher = KeywordMatcher({"coffee": ["caffè"], "quality": ["qualita"]})
+    assert normalize_text("  Qualità  TOTALE ") == "qualita totale"
+    assert matcher.labels(["IL CAFFE È PRONTO"]) == {"coffee"}
+    assert matcher.labels(["Gestione della Qualità"]) == {"quality"}
+    assert matcher.labels(["CAFFÈ"]) == {"coffee"}
+    assert matcher.labels(["caffeina"]) == set()
+
+
+def test_rules_map_terms_to_disciplines_and_tags():
+    assert _match_rules(["General Data Protection Regulation"]) == (["PRIV"], ["gdpr"])
+    assert _match_rules(["Quality management systems", "QMS"]) == (
+        ["QUAL"],
+        ["quality-management"],
+    )
+    assert _match_rules(["PROCEDIMENTO   Amministrativo"]) == (
+        ["ADM"],
+        ["procedimento-amministrativo"],
+    )
+    assert _match_rules(["qualityx qmsx"]) == ([], [])
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import httpx
+import pytest
+
+from app.providers import client, eurlex
+from app.providers.client import ProviderHTTPError, fetch_pages
+
+LAST_MODIFIED = datetime(2024, 1, 1, 0, 0, 24)
+
+
+def _ids(pages) -> list[str]:
+    return [record["external_id"] for page in pages for record in page.items]
+
+
+def test_pages_follow_the_feed_with_details(stub_feed):
+    pages = list(fetch_pages(eurlex, since=None))
+
+    assert [page.cursor for page in pages] == ["1", "2", "3"]
+    assert _ids(pages) == sorted(stub_feed.records)
+    assert pages[0].items[0] == stub_feed.records["eurlex:stub-000000"]
+    assert all(page.high_water_mark == LAST_MODIFIED for page in pages)
+    # One changes request per page, one details request per record.
+    assert stub_feed.requests == 3 + 25
+
+
+def test_since_and_cursor_narrow_the_pages(stub_feed):
+    changed = list(fetch_pages(eurlex, since=datetime(2024, 1, 1, 0, 0, 20)))
+    assert [page.cursor for page in changed] == ["1"]
+    assert _ids(changed) == [f"eurlex:stub-{index:06d}" for index in range(20, 25)]
+
+    resumed = list(fetch_pages(eurlex, since=None, cursor="2"))
+    assert [page.cursor for page in resumed] == ["2", "3"]
+    assert _ids(resumed) == [f"eurlex:stub-{index:06d}" for index in range(10, 25)]
+
+
+def test_after_resumes_inside_the_first_page_only(stub_feed):
+    pages = list(fetch_pages(eurlex, since=None, cursor="2", after="eurlex:stub-000013"))
+
+    assert [page.cursor for page in pages] == ["2", "3"]
+    assert _ids(pages) == [f"eurlex:stub-{index:06d}" for index in range(14, 25)]
+    # The skipped entries' details are never fetched.
+    assert stub_feed.requests == 2 + 11
+
+
+def test_after_outside_the_first_page_skips_nothing(stub_feed):
+    pages = list(fetch_pages(eurlex, since=None, after="eurlex:stub-000013"))
+
+    assert _ids(pages) == sorted(stub_feed.records)
+
+
+def test_server_errors_are_retried_with_backoff(stub_feed, monkeypatch):
+    delays = []
+    retry_delay = client._retry_delay
+
+    def recorded(attempt, response):
+        delays.append((attempt, response.status_code))
+        return retry_delay(attempt, response)
+
+    monkeypatch.setattr(client, "_retry_delay", recorded)
+    stub_feed.fail_requests(2)
+
+    pages = list(fetch_pages(eurlex, since=None))
+
+    assert _ids(pages) == sorted(stub_feed.records)
+    assert delays == [(0, 503), (1, 503)]
+    assert stub_feed.requests == 2 + 3 + 25
+
+
+def test_retries_give_up_after_the_configured_attempts(stub_feed, monkeypatch):
+    monkeypatch.setattr(client, "HTTP_RETRIES", 2)
+    stub_feed.fail_requests(3)
+
+    with pytest.raises(ProviderHTTPError, match=r"after 3 attempts \(status 503\)"):
+        list(fetch_pages(eurlex, since=None))
+    assert stub_feed.requests == 3
+
+
+def test_client_errors_are_not_retried(stub_feed):
+    with pytest.raises(ProviderHTTPError, match="returned 404"):
+        client.run(client.feed_record("eurlex", stub_feed.url, "eurlex:missing"))
+    assert stub_feed.requests == 1
+
+
+def test_retry_delay_grows_exponentially_and_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(client, "HTTP_BACKOFF", 0.5)
+
+    assert 0.25 <= client._retry_delay(0, None) <= 0.5
+    assert 2.0 <= client._retry_delay(3, None) <= 4.0
+    assert client._retry_delay(20, None) <= client.HTTP_MAX_BACKOFF
+    retry_after = httpx.Response(503, headers={"Retry-After": "7"})
+    assert client._retry_delay(0, retry_after) == 7.0
+
+
+def test_slow_responses_time_out(stub_feed, monkeypatch):
+    monkeypatch.setattr(client, "HTTP_TIMEOUT", 0.1)
+    monkeypatch.setattr(client, "HTTP_RETRIES", 1)
+    # A client of its own, built with the short timeout.
+    monkeypatch.setattr(client, "_client", None)
+    stub_feed.latency = 0.5
+    try:
+        with pytest.raises(ProviderHTTPError, match=r"after 2 attempts \(ReadTimeout"):
+            list(fetch_pages(eurlex, since=None))
+    finally:
+        client.run(client._client.aclose())
+    assert stub_feed.requests == 2
+
+
+@pytest.mark.parametrize("limit", [3, 8])
+def test_concurrency_is_limited_per_provider(stub_feed, monkeypatch, limit):
+    monkeypatch.setenv("EURLEX_CONCURRENCY", str(limit))
+    stub_feed.latency = 0.05
+
+    pages = list(fetch_pages(eurlex, since=None))
+
+    assert len(_ids(pages)) == 25
+    assert stub_feed.max_in_flight == limit